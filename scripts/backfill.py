@@ -0,0 +1,58 @@
+# scripts/backfill.py
+# usage: python -m scripts.backfill posts --since 2023-01-01 --until 2025-01-01 [--sub LocalLLaMA ...]
+#        python -m scripts.backfill comments --since 2024-01-01 --until 2024-07-01 --dump "dumps/RC_2024-*.zst"
+# loads subreddit history from a Pushshift-style archive (ARCHIVE_URL), in time slices
+# crawled in parallel, or from local NDJSON dumps, each read once; progress is
+# checkpointed and skipped on the next run (see src/reddit_ai/pipelines/backfill.py)
+import argparse
+from datetime import datetime, timezone
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.collectors.archive import ArchiveSource, DumpSource
+from src.reddit_ai.collectors.dedup import NearDuplicates
+from src.reddit_ai.config import ARCHIVE_URL
+from src.reddit_ai.db.mongo import ensure_indexes, get_db
+from src.reddit_ai.db.repositories.posts_repo import warm_near_duplicates
+from src.reddit_ai.pipelines.backfill import backfill
+from src.reddit_ai.pipelines.orchestrator import HOURLY
+
+
+def _date(value: str) -> datetime:
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def run(args, db=None):
+    db = get_db("ingest") if db is None else db   # slices are re-run until checkpointed
+    ensure_indexes(db)
+    subs = args.sub or [sub for group in HOURLY["groups"].values() for sub in group]
+    source = DumpSource(args.dump, time_sorted=args.time_sorted) if args.dump else ArchiveSource(ARCHIVE_URL)
+    dedup = None
+    if args.kind == "posts" and args.dedup:
+        dedup = NearDuplicates()
+        warm_near_duplicates(db, dedup, subs, window_days=(datetime.now(timezone.utc) - args.since).days + 1)
+    stats = backfill(db, source, args.kind, subs, args.since, args.until,
+                     slice_days=args.slice_days, max_workers=args.workers,
+                     transform_workers=args.transform_workers, dedup=dedup)
+    print(stats)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill subreddit history from an archive or dump files.")
+    parser.add_argument("kind", choices=("posts", "comments"))
+    parser.add_argument("--since", type=_date, required=True)
+    parser.add_argument("--until", type=_date, default=datetime.now(timezone.utc))
+    parser.add_argument("--sub", nargs="+", help="subreddits (default: every HOURLY group)")
+    parser.add_argument("--dump", nargs="+", help="NDJSON dump files or globs (.zst, .gz, plain) instead of the API")
+    parser.add_argument("--time-sorted", action="store_true", help="dump files are sorted by created_utc")
+    parser.add_argument("--slice-days", type=float, default=7.0, help="slice length of an archive crawl")
+    parser.add_argument("--workers", type=int, default=4, help="slices (or dump files) loaded concurrently")
+    parser.add_argument("--transform-workers", type=int, default=0, help="normalize processes per slice")
+    parser.add_argument("--dedup", action="store_true", help="cluster near-duplicate posts")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# scripts/bench.py
+# usage: python -m scripts.bench [--latency 0.05] [--fixture DIR] [--mongo-uri URI] [--out after.json --compare before.json]
+from src.reddit_ai.bench.runner import main
+
+if __name__ == "__main__":
+    main()
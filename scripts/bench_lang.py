@@ -0,0 +1,65 @@
+# scripts/bench_lang.py
+# usage: python -m scripts.bench_lang [captures/comments/*.jsonl.gz ...]
+import sys
+import time
+from src.reddit_ai.bench.fake_reddit import Fixture
+from src.reddit_ai.db.repositories.sinks import read_docs
+from src.reddit_ai.utils.common import is_englishish
+from src.reddit_ai.utils.lang import LanguageFilter
+
+SUBS = ["LocalLLaMA", "ChatGPT", "MachineLearning", "StableDiffusion"]
+ROUNDS = 3
+
+
+def is_englishish_loop(text: str, min_len: int = 10, min_ascii_ratio: float = 0.6) -> bool:
+    """The former per-character implementation, kept as the reference."""
+    if not text:
+        return False
+    t = text.strip()
+    if len(t) < min_len:
+        return False
+    letters = sum(ch.isascii() and ch.isalpha() for ch in t)
+    return (letters / max(1, len(t))) >= min_ascii_ratio
+
+
+def load_texts(paths):
+    if paths:
+        texts = []
+        for path in paths:
+            for doc in read_docs(path):
+                texts.append(doc.get("body") or (doc.get("title") or "") + " " + (doc.get("selftext") or ""))
+        return texts
+    fixture = Fixture.synthetic_data(comments_per_post=500)
+    return [c["body"] for sub in SUBS for p in fixture.posts_for(sub) for c in fixture.comments_for(p["_id"])]
+
+
+def timed(label: str, fn, texts, mb: float, base: float | None = None):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        before = time.perf_counter()
+        out = fn(texts)
+        best = min(best, time.perf_counter() - before)
+    speedup = f" x{base / best:.1f}" if base else ""
+    print(f"{label:<22} {len(texts) / best:>12,.0f} texts/s {mb / best:>8.1f} MB/s{speedup}")
+    return out, best
+
+
+def run(paths):
+    texts = load_texts(paths)
+    mb = sum(len(t) for t in texts) / 1e6
+    print(f"{len(texts)} texts, {mb:.1f}M chars")
+
+    ref, base = timed("per-char loop", lambda ts: [is_englishish_loop(t) for t in ts], texts, mb)
+    single, _ = timed("is_englishish", lambda ts: [is_englishish(t) for t in ts], texts, mb, base)
+    heuristic, _ = timed("heuristic mask", LanguageFilter("heuristic").mask, texts, mb, base)
+    ngram, _ = timed("ngram mask", LanguageFilter("ngram").mask, texts, mb, base)
+
+    assert single == ref and heuristic == ref, "heuristic mode must match the per-character loop"
+    dropped = sum(h and not n for h, n in zip(heuristic, ngram))
+    print(f"heuristic identical: yes | kept {sum(ref)}/{len(texts)} | ngram drops {dropped} more")
+    if not paths:
+        print("(synthetic bodies are keyword salad without function words; pass captures for a meaningful ngram count)")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
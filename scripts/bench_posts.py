@@ -0,0 +1,37 @@
+# scripts/bench_posts.py
+import time
+from src.reddit_ai.bench.fake_reddit import FakeReddit
+from src.reddit_ai.collectors.posts import fetch_posts_details, fetch_posts_concurrent
+from src.reddit_ai.utils.ratelimit import RateLimiter
+
+SUBS = [
+    "DeepSeek", "ChatGPT", "claude", "Copilot",
+    "artificial", "MachineLearning", "deeplearning",
+    "LocalLLaMA", "StableDiffusion", "generativeAI",
+]
+LIMIT = 250
+LATENCY = 0.2   # seconds per simulated API call
+
+
+def timed(label: str, reddit: FakeReddit, gen) -> float:
+    before = time.perf_counter()
+    n = sum(1 for _ in gen)
+    took = time.perf_counter() - before
+    print(f"{label:<14} docs={n:<5} api_calls={reddit.api_calls:<4} took={took:6.2f}s")
+    return took
+
+
+def run():
+    reddit = FakeReddit(latency=LATENCY)
+    base = timed("serial", reddit, fetch_posts_details(reddit, SUBS, listing="new", limit=LIMIT))
+
+    for workers in (2, 4, 8):
+        reddit = FakeReddit(latency=LATENCY)
+        limiter = RateLimiter(rate=1000, burst=100)   # not the bottleneck here
+        gen = fetch_posts_concurrent(reddit, SUBS, LIMIT, listing="new", max_workers=workers, limiter=limiter)
+        took = timed(f"workers={workers}", reddit, gen)
+        print(f"{'':<14} speedup x{base / took:.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -6,8 +6,11 @@ import praw
 from datetime import datetime, timezone, timedelta
 from src.reddit_ai.config import REDDIT
 from src.reddit_ai.db.mongo import get_db, ensure_indexes
-from src.reddit_ai.collectors.comments import fetch_comments_details
-from src.reddit_ai.db.repositories.comments_repo import upsert_comments
+from src.reddit_ai.collectors.comments import SeenComments
+from src.reddit_ai.db.repositories.comments_repo import comments_delta_filter
+from src.reddit_ai.db.repositories.posts_repo import one_per_cluster, select_targets
+from src.reddit_ai.pipelines.harvest import harvest_comments
+from src.reddit_ai.utils.ratelimit import RateLimiter
 
 FAST    = ["DeepSeek", "ChatGPT","claude","Copilot"] 
 CORE    = ["artificial", "MachineLearning", "deeplearning"]
@@ -20,40 +23,37 @@ PER_SUB = {
     "CREATOR": 40,
 }
 
+WORKERS = 4   # posts fetched concurrently
 
-def iter_post_ids(db, subreddit: str, per_sub: int):
-    cur = (db.posts.find(
-                {
-                    "subreddit": subreddit,
-                    "seen_in": "top",
-                },
-                {"post_id": 1, "score_max": 1, "num_comments_max": 1}
-           )
-           .sort([("score_max", -1), ("num_comments_max", -1)])
-           .limit(per_sub))
-    for doc in cur:
-        yield doc["post_id"]
-
-def collect_for_group(db, reddit, subs: list[str], per_sub: int):
-    for sub in subs:
-        for pid in iter_post_ids(db, sub, per_sub):
-            gen = fetch_comments_details(
-                reddit, pid,
-                sort="top",            # best signal
-                cap=500, limit=200,    # scan 500, keep 200
-                top_level_only=True,   # cleaner dataset
-                skip_bots=True, english_only=True, debug_samples=2
-            )
-            upsert_comments(db, gen, batch_size=500)
-
-def run():
-    reddit = praw.Reddit(**REDDIT)
-    db = get_db()
-    ensure_indexes(db)
 
-    collect_for_group(db, reddit, FAST,    PER_SUB["FAST"])
-    collect_for_group(db, reddit, CORE,    PER_SUB["CORE"])
-    collect_for_group(db, reddit, CREATOR, PER_SUB["CREATOR"])
+def post_ids_for_group(db, subs: list[str], per_sub: int) -> list[str]:
+    # one aggregation for the whole group, ranked by the targets_by_listing index order
+    targets = select_targets(db, subs, "top", per_sub)
+    return [pid for sub in subs for pid in targets[sub]]
+
+def run(reddit=None, db=None):
+    reddit = reddit or praw.Reddit(**REDDIT)
+    db = get_db() if db is None else db
+    ensure_indexes(db)
+    limiter = RateLimiter.from_reddit(reddit)   # follows Reddit's rate-limit headers
+
+    post_ids = (post_ids_for_group(db, FAST,    PER_SUB["FAST"])
+                + post_ids_for_group(db, CORE,    PER_SUB["CORE"])
+                + post_ids_for_group(db, CREATOR, PER_SUB["CREATOR"]))
+    # one post per near-duplicate cluster: a crossposted announcement is scraped once
+    post_ids = one_per_cluster(db, post_ids)
+
+    # one pool of fetch workers feeding one batched writer
+    harvest_comments(
+        db, reddit, post_ids,
+        max_workers=WORKERS, limiter=limiter, batch_size=500,
+        delta=comments_delta_filter(db), seen=SeenComments(),
+        sort="top",            # best signal
+        cap=500, limit=200,    # scan 500, keep 200
+        top_level_only=True,   # cleaner dataset
+        skip_bots=True, english_only=True, debug_samples=2
+    )
+    limiter.report()
 
 if __name__ == "__main__":
     run()
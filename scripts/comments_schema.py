@@ -0,0 +1,89 @@
+# scripts/comments_schema.py
+# usage: python -m scripts.comments_schema [--to compact|full] [--dry-run] [--compact-storage]
+# rewrites db.comments in the compact (or back in the full) layout, swaps the comment
+# indexes and prints the collection / index sizes before and after
+# (see comments_repo.COMPACT_FIELDS). Stop the collectors while it runs.
+import argparse
+from bson import encode
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.db.indexes import comment_index_keys
+from src.reddit_ai.db.mongo import ensure_indexes, get_db
+from src.reddit_ai.db.repositories.comments_repo import (
+    comments_schema, compact_comment, expand_comment, migrate_comments,
+)
+
+SAMPLE = 5000
+SIZE_FIELDS = ("count", "size", "avgObjSize", "storageSize", "totalIndexSize")
+
+
+def sizes(db) -> dict:
+    stats = db.command("collStats", "comments")
+    return {**{f: stats.get(f, 0) for f in SIZE_FIELDS}, "indexSizes": stats.get("indexSizes", {})}
+
+
+def estimate(db, sample: int = SAMPLE) -> dict:
+    """BSON bytes of `sample` stored comments in both layouts, without writing anything."""
+    full = compact = n = 0
+    for doc in db.comments.find({}).limit(sample):
+        expanded = expand_comment(doc)
+        full += len(encode(expanded))
+        compact += len(encode(compact_comment(expanded)))
+        n += 1
+    return {"sampled": n, "full_avg": full // max(n, 1), "compact_avg": compact // max(n, 1),
+            "ratio": round(compact / full, 3) if full else None}
+
+
+def swap_indexes(db, old: str, new: str) -> list:
+    """Drop the comment indexes keyed for the `old` layout, then create the `new` ones."""
+    stale = [list(keys) for keys in comment_index_keys(old) if keys not in comment_index_keys(new)]
+    dropped = []
+    for name, info in db.comments.index_information().items():
+        if [(f, int(d)) for f, d in info["key"]] in stale:
+            db.comments.drop_index(name)
+            dropped.append(name)
+    ensure_indexes(db)
+    return dropped
+
+
+def _print(label: str, stats: dict) -> None:
+    print(f"--- {label} ---")
+    for f in SIZE_FIELDS:
+        print(f"{f:<16} {stats[f]:>14,}")
+    for name, size in stats["indexSizes"].items():
+        print(f"  index {name:<30} {size:>12,}")
+
+
+def run(schema: str = "compact", dry_run: bool = False, compact_storage: bool = False, db=None):
+    db = get_db() if db is None else db
+    current = comments_schema(db)
+    before = sizes(db)
+    _print(f"before ({current})", before)
+    est = estimate(db)
+    print(f"sample of {est['sampled']}: {est['full_avg']} B/doc full, {est['compact_avg']} B/doc compact "
+          f"(x{est['ratio']})")
+    if dry_run:
+        return {"before": before, "estimate": est}
+
+    stats = migrate_comments(db, schema)
+    dropped = swap_indexes(db, current, schema)
+    if compact_storage:
+        # WiredTiger keeps freed pages for reuse; `compact` hands them back to the disk
+        db.command("compact", "comments")
+    after = sizes(db)
+    _print(f"after ({schema}, dropped {dropped or 'no'} indexes)", after)
+    for f in ("size", "totalIndexSize"):
+        if before[f]:
+            print(f"{f}: {after[f] / before[f]:.1%} of before")
+    return {"before": before, "after": after, "estimate": est, "migration": stats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate db.comments between the full and compact layouts.")
+    parser.add_argument("--to", dest="schema", choices=("compact", "full"), default="compact")
+    parser.add_argument("--dry-run", action="store_true", help="only print the sizes and the sampled estimate")
+    parser.add_argument("--compact-storage", action="store_true",
+                        help="run the `compact` command afterwards (blocks the collection on older servers)")
+    args = parser.parse_args()
+    run(args.schema, dry_run=args.dry_run, compact_storage=args.compact_storage)
@@ -0,0 +1,43 @@
+# scripts/embed.py
+# usage: python -m scripts.embed [--encoder hashing|st:<model>] [--dtype float16|int8] [--similar posts:<id>]
+# embeds what was ingested into Mongo since the previous pass (src/reddit_ai/embeddings/),
+# then optionally prints the nearest posts/comments of one document
+import argparse
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.config import EMBEDDINGS_DIR
+from src.reddit_ai.embeddings.encoders import get_encoder
+from src.reddit_ai.embeddings.pipeline import open_store, update_embeddings
+from src.reddit_ai.embeddings.store import split_key
+
+
+def run(args, db=None):
+    encoder = get_encoder(args.encoder)
+    root = args.root or f"{EMBEDDINGS_DIR}/{encoder.name}"
+    store = open_store(root, encoder, args.dtype)
+    if not args.no_update:
+        from src.reddit_ai.db.mongo import ensure_indexes, get_db
+
+        db = get_db() if db is None else db
+        ensure_indexes(db)
+        update_embeddings(db, store, encoder)
+    if args.similar:
+        kind, _, _id = args.similar.partition(":")
+        for key, score in store.similar(f"{kind}\t{_id}", k=args.k):
+            print(f"{score:.3f}  {':'.join(split_key(key))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed collected posts and comments; find similar ones.")
+    parser.add_argument("--encoder", default="hashing")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="float16")
+    parser.add_argument("--root", help=f"store directory (default {EMBEDDINGS_DIR}/<encoder>)")
+    parser.add_argument("--similar", metavar="KIND:ID")
+    parser.add_argument("--no-update", action="store_true")
+    parser.add_argument("-k", type=int, default=10)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,18 @@
-from .top_day import run as collect_top_day
-from .new import run as collect_new
-from .hot import run as collect_hot
+# scripts/fin_test.py
+# one hourly cycle: post listings run concurrently, each comment harvest starts
+# as soon as its listing is upserted (see src/reddit_ai/pipelines/orchestrator.py)
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.pipelines.orchestrator import HOURLY, run_cycle
+
+
+def run(reddit=None, db=None):
+    return run_cycle(HOURLY, reddit=reddit, db=db)
 
-from .c_top import run as collect_c_top
-from .c_new import run as collect_c_new 
-from .c_hot import run as collect_c_hot
 
 def run_all():
-    collect_top_day()
-    collect_new()
-    collect_hot()
-    collect_c_top()
-    collect_c_new()
-    collect_c_hot()
+    run()
 
 if __name__ == "__main__":
-    run_all()
\ No newline at end of file
+    run_all()
@@ -5,8 +5,10 @@ setup_logging()
 import praw
 from src.reddit_ai.config import REDDIT
 from src.reddit_ai.db.mongo import get_db, ensure_indexes
-from src.reddit_ai.collectors.posts import fetch_posts_details
-from src.reddit_ai.db.repositories.posts_repo import upsert_posts
+from src.reddit_ai.collectors.dedup import NearDuplicates
+from src.reddit_ai.collectors.posts import fetch_posts_concurrent
+from src.reddit_ai.db.repositories.posts_repo import upsert_posts, posts_delta_filter, warm_near_duplicates
+from src.reddit_ai.utils.ratelimit import RateLimiter
 
 FAST    = ["DeepSeek", "ChatGPT","claude","Copilot"] 
 CORE    = ["artificial", "MachineLearning", "deeplearning"]
@@ -17,23 +19,34 @@ LIMITS = {
     "CREATOR": 60,
 }
 
-def run():
-    reddit = praw.Reddit(**REDDIT)
-    db = get_db()
+WORKERS = 4   # subreddits fetched concurrently
+
+def run(reddit=None, db=None):
+    reddit = reddit or praw.Reddit(**REDDIT)
+    db = get_db() if db is None else db
     ensure_indexes(db)
+    limiter = RateLimiter.from_reddit(reddit)   # follows Reddit's rate-limit headers
+
+    limits = {}
+    for subs, limit in ((FAST, LIMITS["FAST"]), (CORE, LIMITS["CORE"]), (CREATOR, LIMITS["CREATOR"])):
+        limits.update({sub: limit for sub in subs})
+
+    # crossposts and reposted announcements get the cluster id of the copy already stored
+    dedup = NearDuplicates()
+    warm_near_duplicates(db, dedup, list(limits))
 
-    def collect_for(subs: list[str], limit: int):
-            gen = fetch_posts_details(
-                reddit, subs,
-                listing="hot",
-                limit=limit, window_days=14,
-                english_only=True, skip_bots=True, include_nsfw=False
-            )
-            upsert_posts(db, gen, batch_size=500)
-
-    collect_for(FAST,    LIMITS["FAST"])
-    collect_for(CORE,    LIMITS["CORE"])
-    collect_for(CREATOR, LIMITS["CREATOR"])
+    # all groups share one worker pool and one rate-limit budget
+    gen = fetch_posts_concurrent(
+        reddit, list(limits), limits,
+        max_workers=WORKERS, limiter=limiter,
+        listing="hot", window_days=14,
+        english_only=True, skip_bots=True, include_nsfw=False, dedup=dedup
+    )
+    # Mongo writes overlap the fetch; unchanged posts only get a last_seen_at touch,
+    # changed ones also get a point in their score/comment history
+    upsert_posts(db, gen, batch_size=500, background=True,
+                 delta=posts_delta_filter(db), snapshots="bucket")
+    limiter.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+# scripts/load_captures.py
+# usage: python -m scripts.load_captures posts captures/posts/*.jsonl.gz
+import sys
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.db.mongo import get_db, ensure_indexes
+from src.reddit_ai.db.repositories.sinks import load_into_mongo
+
+
+def run(kind: str, paths: list[str]):
+    db = get_db("ingest")   # re-running the load rewrites the same docs
+    ensure_indexes(db)
+    return load_into_mongo(db, kind, sorted(paths), batch_size=5000)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m scripts.load_captures {posts|comments} FILE...")
+    run(sys.argv[1], sys.argv[2:])
@@ -2,11 +2,15 @@
 from src.reddit_ai.utils.logging_setup import setup_logging
 setup_logging()
 
+import logging
 import praw
 from src.reddit_ai.config import REDDIT
 from src.reddit_ai.db.mongo import get_db, ensure_indexes
-from src.reddit_ai.collectors.posts import fetch_posts_details
-from src.reddit_ai.db.repositories.posts_repo import upsert_posts
+from src.reddit_ai.collectors.dedup import NearDuplicates
+from src.reddit_ai.collectors.posts import fetch_posts_concurrent
+from src.reddit_ai.db.repositories.posts_repo import upsert_posts, posts_delta_filter, warm_near_duplicates
+from src.reddit_ai.db.repositories.state_repo import HighWaterMarks
+from src.reddit_ai.utils.ratelimit import RateLimiter
 
 FAST    = ["DeepSeek", "ChatGPT","claude","Copilot"] 
 CORE    = ["artificial", "MachineLearning", "deeplearning"]
@@ -18,24 +22,44 @@ LIMITS = {
     "CREATOR": 200,
 }
 
-def run():
-    reddit = praw.Reddit(**REDDIT)
-    db = get_db()
+WORKERS = 4   # subreddits fetched concurrently
+
+logger = logging.getLogger(__name__)
+
+def run(reddit=None, db=None):
+    reddit = reddit or praw.Reddit(**REDDIT)
+    db = get_db() if db is None else db
     ensure_indexes(db)
+    limiter = RateLimiter.from_reddit(reddit)   # follows Reddit's rate-limit headers
+
+    limits = {}
+    for subs, limit in ((FAST, LIMITS["FAST"]), (CORE, LIMITS["CORE"]), (CREATOR, LIMITS["CREATOR"])):
+        limits.update({sub: limit for sub in subs})
 
-    def collect_for(subs: list[str], limit: int):
+    # stop paging each subreddit at the newest post stored by the previous run
+    marks = HighWaterMarks.load(db, "new")
 
-            gen = fetch_posts_details(
-                reddit, subs,
-                listing="new",
-                limit=limit, window_days=14,
-                english_only=True, skip_bots=True, include_nsfw=False
-            )
-            upsert_posts(db, gen, batch_size=500)
+    # crossposts and reposted announcements get the cluster id of the copy already stored
+    dedup = NearDuplicates()
+    warm_near_duplicates(db, dedup, list(limits))
 
-    collect_for(FAST,    LIMITS["FAST"])
-    collect_for(CORE,    LIMITS["CORE"])
-    collect_for(CREATOR, LIMITS["CREATOR"])
+    # all groups share one worker pool and one rate-limit budget
+    gen = fetch_posts_concurrent(
+        reddit, list(limits), limits,
+        max_workers=WORKERS, limiter=limiter,
+        listing="new", window_days=14, since=marks,
+        english_only=True, skip_bots=True, include_nsfw=False, dedup=dedup
+    )
+    # Mongo writes overlap the fetch; unchanged posts only get a last_seen_at touch,
+    # changed ones also get a point in their score/comment history
+    stats = upsert_posts(db, gen, batch_size=500, background=True,
+                         delta=posts_delta_filter(db), snapshots="bucket", on_written=marks.observe)
+    # marks only move to written posts; a dropped batch would leave a gap behind them
+    if stats["dropped"]:
+        logger.warning("%d post batches dropped; high-water marks not saved", stats["dropped"])
+    else:
+        marks.save(db)
+    limiter.report()
 
 
 if __name__ == "__main__":
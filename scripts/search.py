@@ -0,0 +1,51 @@
+# scripts/search.py
+# usage: python -m scripts.search [--update] [--sub LocalLLaMA ...] [--since 2025-01-01] [--until ...] [--kind posts] "qwen 3"
+# keyword search over the local index (src/reddit_ai/search/index.py); --update first
+# indexes what was ingested into Mongo since the previous update
+import argparse
+from datetime import datetime, timezone
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.config import SEARCH_INDEX
+from src.reddit_ai.search.index import SearchIndex
+
+
+def _date(value: str) -> datetime:
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def run(args, db=None):
+    index = SearchIndex(args.index)
+    try:
+        if args.update:
+            from src.reddit_ai.db.mongo import ensure_indexes, get_db
+
+            db = get_db() if db is None else db
+            ensure_indexes(db)
+            index.update(db)
+        if args.query:
+            hits = index.search(args.query, subreddits=args.sub, since=args.since, until=args.until,
+                                kind=args.kind, k=args.k)
+            for hit in hits:
+                print(f"{hit['score']:>8.2f}  r/{hit['subreddit']:<18} {hit['kind'][:-1]:<8} {hit['_id']:<12} {hit['snippet']}")
+    finally:
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search collected posts and comments.")
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--update", action="store_true", help="index new Mongo docs first")
+    parser.add_argument("--sub", nargs="+")
+    parser.add_argument("--since", type=_date)
+    parser.add_argument("--until", type=_date)
+    parser.add_argument("--kind", choices=["posts", "comments"])
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("--index", default=SEARCH_INDEX)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
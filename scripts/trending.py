@@ -0,0 +1,27 @@
+# scripts/trending.py
+# usage: python -m scripts.trending [SUBREDDIT ...]
+# adds the posts/comments ingested since the last run to the term rollups, then
+# prints the precomputed rising terms (see src/reddit_ai/analytics/rollups.py)
+import sys
+from src.reddit_ai.utils.logging_setup import setup_logging
+setup_logging()
+
+from src.reddit_ai.analytics.rollups import top_trending, update_rollups
+from src.reddit_ai.db.mongo import ensure_indexes, get_db
+
+K = 20
+
+
+def run(subreddits: list[str], db=None):
+    db = get_db() if db is None else db
+    ensure_indexes(db)
+    stats = update_rollups(db)
+    for sub in subreddits or [None]:
+        print(f"--- {sub or 'all subreddits'} ---")
+        for t in top_trending(db, sub, k=K):
+            print(f"{t['term']:<32} {t['count']:>7} (baseline {t['baseline']}, expected {t['expected']}) score {t['score']}")
+    return stats
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -0,0 +1,295 @@
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from pymongo import UpdateMany, UpdateOne
+from ..db.repositories.bulk_writer import bulk_write_with_retry
+from ..db.repositories.comments_repo import find_comments
+from ..db.repositories.state_repo import load_checkpoint, save_checkpoint
+from ..utils.common import ts_now
+from .terms import doc_terms
+
+logger = logging.getLogger(__name__)
+
+# one document per subreddit per hour (and per day): {docs, terms: {term: documents containing it}}
+ROLLUP_COLLECTION = "term_rollups"
+# latest trending ranking per subreddit ("*" = all subreddits), rebuilt after each update
+TRENDING_COLLECTION = "term_trending"
+ALL = "*"
+
+# text fields analysed per source collection
+SOURCES: Dict[str, Tuple[str, ...]] = {"posts": ("title", "selftext"), "comments": ("body",)}
+# set on a source doc once counted, so re-ingested (edited, re-scored) docs are not counted twice
+MARK_FIELD = "analyzed_at"
+
+GRAINS = {"hour": "%Y%m%d%H", "day": "%Y%m%d"}
+
+# distinct terms kept per rollup document; beyond that the least frequent are pruned,
+# so a busy subreddit's documents stay far below the 16MB BSON limit
+MAX_TERMS = {"hour": 20_000, "day": 50_000}
+# terms per `$inc` op: a large batch is written as several bounded updates of a rollup
+INC_CHUNK = 5_000
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _created(doc: Dict[str, Any]) -> datetime:
+    """Bucket time of a doc: when it was posted, else when it was ingested."""
+    if doc.get("created_utc"):
+        return datetime.fromtimestamp(float(doc["created_utc"]), tz=timezone.utc)
+    return _aware(doc.get("ingested_at") or ts_now())
+
+
+def _rollup_id(sub: str, grain: str, start: datetime) -> str:
+    return f"{sub}:{grain}:{start.strftime(GRAINS[grain])}"
+
+
+def _rollup_ops(counts: Dict[Tuple[str, str, datetime], Counter], docs: Dict[Tuple[str, str, datetime], int]) -> List[UpdateOne]:
+    ops = []
+    for (sub, grain, start), terms in counts.items():
+        items = list(terms.items())
+        for i in range(0, max(len(items), 1), INC_CHUNK):
+            inc = {f"terms.{term}": n for term, n in items[i:i + INC_CHUNK]}
+            if i == 0:
+                inc["docs"] = docs[(sub, grain, start)]
+            ops.append(UpdateOne(
+                {"_id": _rollup_id(sub, grain, start)},
+                {"$setOnInsert": {"subreddit": sub, "grain": grain, "start": start}, "$inc": inc},
+                upsert=True,
+            ))
+    return ops
+
+
+def prune_rollups(db, ids: Iterable[str], max_terms: Optional[Dict[str, int]] = None, chunk: int = 500) -> int:
+    """
+    Keep the `max_terms[grain]` most frequent terms of each rollup in `ids`.
+
+    A pruned term that shows up again restarts from its new count, so rare terms
+    are undercounted; the ranking only reads frequent ones (`trending(min_count=...)`).
+    The number of terms dropped is kept in `pruned_terms`.
+
+    Returns:
+        Rollup documents rewritten.
+    """
+    max_terms = MAX_TERMS if max_terms is None else max_terms
+    ids = list(ids)
+    rewritten = 0
+    for start in range(0, len(ids), chunk):
+        ops = []
+        for row in db[ROLLUP_COLLECTION].find({"_id": {"$in": ids[start:start + chunk]}}, {"grain": 1, "terms": 1}):
+            terms = row.get("terms") or {}
+            cap = max_terms.get(row.get("grain"))
+            if cap is None or len(terms) <= cap:
+                continue
+            keep = dict(heapq.nlargest(cap, terms.items(), key=lambda kv: (kv[1], kv[0])))
+            ops.append(UpdateOne({"_id": row["_id"]},
+                                 {"$set": {"terms": keep}, "$inc": {"pruned_terms": len(terms) - len(keep)}}))
+        if ops and bulk_write_with_retry(db[ROLLUP_COLLECTION], ops, "rollups prune") is not None:
+            rewritten += len(ops)
+    if rewritten:
+        logger.info("Pruned %d rollup documents to their most frequent terms", rewritten)
+    return rewritten
+
+
+def _apply_batch(db, source: str, batch: List[Dict[str, Any]], ngram: int, touched: Set[str],
+                 rollup_ids: Set[str]) -> int:
+    """
+    Mark a batch of source docs, then add them to the rollups; returns the rollup writes.
+
+    The mark goes first: if it is lost, nothing was counted and the batch is read
+    again; if the rollup write fails, the mark is removed so the next run counts it.
+    A batch is thus never counted twice by a failed mark.
+    """
+    counts: Dict[Tuple[str, str, datetime], Counter] = defaultdict(Counter)
+    docs: Counter = Counter()
+    batch_ids: Set[str] = set()
+    for doc in batch:
+        terms: Set[str] = set()
+        for field in SOURCES[source]:
+            if doc.get(field):
+                terms |= doc_terms(doc[field], ngram)
+        sub = doc.get("subreddit") or "?"
+        created = _created(doc)
+        for key in ((sub, "hour", _hour(created)), (sub, "day", _day(created))):
+            counts[key].update(terms)
+            docs[key] += 1
+            batch_ids.add(_rollup_id(*key))
+    ids = [d["_id"] for d in batch]
+    mark = [UpdateMany({"_id": {"$in": ids}}, {"$set": {MARK_FIELD: ts_now()}})]
+    if bulk_write_with_retry(db[source], mark, f"rollups mark {source}") is None:
+        raise RuntimeError(f"could not mark a batch of {len(batch)} {source} as analyzed")
+    ops = _rollup_ops(counts, docs)
+    if ops and bulk_write_with_retry(db[ROLLUP_COLLECTION], ops, "rollups") is None:
+        unmark = [UpdateMany({"_id": {"$in": ids}}, {"$unset": {MARK_FIELD: ""}})]
+        if bulk_write_with_retry(db[source], unmark, f"rollups unmark {source}") is None:
+            logger.error("%d %s marked as analyzed but not counted", len(batch), source)
+        raise RuntimeError(f"rollup write failed for a batch of {len(batch)} {source}")
+    touched.update(sub for sub, _, _ in counts)
+    rollup_ids |= batch_ids
+    return len(ops)
+
+
+def update_rollups(
+    db,
+    sources: Iterable[str] = ("posts", "comments"),
+    *,
+    batch_size: int = 5000,
+    ngram: int = 2,
+    overlap_s: float = 900,
+    refresh: bool = True,
+    max_terms: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Add the documents ingested since the last run to the term rollups.
+
+    Per source collection, only docs with `ingested_at` after the saved checkpoint
+    (minus `overlap_s`, for batches written late by a background writer) and not yet
+    marked `analyzed_at` are read. Their distinct terms (see `terms.doc_terms`) are
+    `$inc`-ed into one hourly and one daily rollup per subreddit, keyed by post/comment
+    creation time. The work is proportional to new data, not to the corpus. The
+    rollups written are then pruned to their most frequent terms (`prune_rollups`).
+
+    Args:
+        db: Mongo database handle.
+        sources: Collections to read, among `SOURCES`.
+        batch_size: Docs aggregated in memory per rollup write.
+        ngram: Longest word n-gram counted.
+        overlap_s: Seconds re-scanned before the checkpoint.
+        refresh: Rebuild the `term_trending` rankings of the touched subreddits.
+        max_terms: Terms kept per rollup document, per grain (default: `MAX_TERMS`).
+
+    Returns:
+        Stats: docs read per source, rollup writes, rollups pruned, subreddits touched.
+    """
+    stats: Dict[str, Any] = {"rollup_writes": 0}
+    touched: Set[str] = set()
+    rollup_ids: Set[str] = set()
+    for source in sources:
+        fields = SOURCES[source]
+        since = load_checkpoint(db, f"rollups:{source}")
+        flt: Dict[str, Any] = {MARK_FIELD: {"$exists": False}}
+        if since is not None:
+            flt["ingested_at"] = {"$gt": _aware(since) - timedelta(seconds=overlap_s)}
+        projection = {f: 1 for f in ("subreddit", "created_utc", "ingested_at", *fields)}
+
+        newest = _aware(since) if since is not None else None
+        batch: List[Dict[str, Any]] = []
+        n = 0
+        cursor = find_comments(db, flt, projection) if source == "comments" else db[source].find(flt, projection)
+        for doc in cursor:
+            batch.append(doc)
+            n += 1
+            if doc.get("ingested_at") and (newest is None or _aware(doc["ingested_at"]) > newest):
+                newest = _aware(doc["ingested_at"])
+            if len(batch) >= batch_size:
+                stats["rollup_writes"] += _apply_batch(db, source, batch, ngram, touched, rollup_ids)
+                batch = []
+        if batch:
+            stats["rollup_writes"] += _apply_batch(db, source, batch, ngram, touched, rollup_ids)
+        if newest is not None:
+            save_checkpoint(db, f"rollups:{source}", newest)
+        stats[source] = n
+
+    stats["pruned"] = prune_rollups(db, sorted(rollup_ids), max_terms)
+    stats["subreddits"] = len(touched)
+    if refresh and touched:
+        refresh_trending(db, sorted(touched))
+    logger.info("Rollups updated: %s", stats)
+    return stats
+
+
+def _sum_rollups(db, grain: str, start: datetime, end: datetime,
+                 subreddits: Optional[Sequence[str]]) -> Tuple[Counter, int]:
+    flt: Dict[str, Any] = {"grain": grain, "start": {"$gte": start, "$lt": end}}
+    if subreddits is not None:
+        flt["subreddit"] = {"$in": list(subreddits)}
+    terms: Counter = Counter()
+    docs = 0
+    for row in db[ROLLUP_COLLECTION].find(flt, {"docs": 1, "terms": 1}):
+        terms.update(row.get("terms") or {})
+        docs += row.get("docs", 0)
+    return terms, docs
+
+
+def trending(
+    db,
+    subreddits: Optional[Sequence[str]] = None,
+    *,
+    hours: int = 24,
+    baseline_days: int = 7,
+    k: int = 20,
+    min_count: int = 3,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Top-k rising terms, computed from the rollups only.
+
+    The last `hours` hourly rollups are compared with the `baseline_days` daily
+    rollups before them. A term's expected count is its baseline share of documents
+    times the recent document count; the rising score is the Poisson z-score
+    (count - expected) / sqrt(expected + 1), so new and fast-growing terms rank
+    above terms that are merely frequent.
+
+    Args:
+        db: Mongo database handle.
+        subreddits: Restrict to these subreddits (all if None).
+        hours: Recent window.
+        baseline_days: Days before the recent window used as the baseline.
+        k: Number of terms returned.
+        min_count: Ignore terms found in fewer recent documents.
+        now: End of the recent window (default: current time).
+
+    Returns:
+        Terms by decreasing `score`, with `count`, `baseline` and `expected`.
+    """
+    end = _hour(_aware(now or ts_now())) + timedelta(hours=1)
+    start = end - timedelta(hours=hours)
+    recent, n_recent = _sum_rollups(db, "hour", start, end, subreddits)
+    base, n_base = _sum_rollups(db, "day", _day(start) - timedelta(days=baseline_days), _day(start), subreddits)
+
+    ranked = []
+    for term, count in recent.items():
+        if count < min_count:
+            continue
+        expected = n_recent * base.get(term, 0) / max(n_base, 1)
+        ranked.append({
+            "term": term,
+            "count": count,
+            "baseline": base.get(term, 0),
+            "expected": round(expected, 2),
+            "score": round((count - expected) / math.sqrt(expected + 1), 3),
+        })
+    ranked.sort(key=lambda t: (-t["score"], t["term"]))
+    return ranked[:k]
+
+
+def refresh_trending(db, subreddits: Sequence[str], k: int = 100, **kwargs) -> int:
+    """Store the ranking of each subreddit, and of all subreddits, for `top_trending`."""
+    now = ts_now()
+    ops = []
+    for key, subs in [*((sub, [sub]) for sub in subreddits), (ALL, None)]:
+        ops.append(UpdateOne(
+            {"_id": key},
+            {"$set": {"computed_at": now, "params": kwargs, "terms": trending(db, subs, k=k, **kwargs)}},
+            upsert=True,
+        ))
+    db[TRENDING_COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def top_trending(db, subreddit: Optional[str] = None, k: int = 20) -> List[Dict[str, Any]]:
+    """Precomputed ranking of a subreddit (all subreddits if None): one document read."""
+    row = db[TRENDING_COLLECTION].find_one({"_id": subreddit or ALL}, {"terms": 1})
+    return (row or {}).get("terms", [])[:k]
@@ -0,0 +1,54 @@
+import re
+from typing import List, Set
+
+# words, keeping model names such as "gpt-4o" or "llama-3" whole; no dots, so
+# every term is usable as a Mongo field name
+_TOKEN = re.compile(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)*")
+_URL = re.compile(r"https?://\S+|www\.\S+|/?[ru]/\w+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren as at be because been before being
+below between both but by can cannot could couldn did didn do does doesn doing don down during each
+even ever few for from further get gets got had hadn has hasn have haven having he her here hers
+herself him himself his how however i if in into is isn it its itself just let like ll made make
+many may me might more most much must mustn my myself need no nor not now of off on once one only
+or other our ours ourselves out over own re really same see she should shouldn so some still such
+than that the their theirs them themselves then there these they thing things think this those
+through to too under until up us use used using ve very via want was wasn way we well were weren
+what when where which while who whom why will with without won would wouldn yes yet you your yours
+yourself yourselves s t d m
+amp com deleted removed edit gt http https lol www
+""".split())
+
+
+def tokens(text: str, max_chars: int = 5000) -> List[str]:
+    """Lowercased word tokens of `text`, URLs and r/ u/ mentions removed."""
+    return _TOKEN.findall(_URL.sub(" ", text[:max_chars].lower()))
+
+
+def doc_terms(text: str, ngram: int = 2, min_len: int = 2, max_chars: int = 5000) -> Set[str]:
+    """
+    Distinct terms of one document: unigrams and word n-grams up to `ngram`.
+
+    Stopwords and tokens shorter than `min_len` are dropped and break n-grams, so
+    "the new claude model" gives "new", "claude", "model", "new claude" and
+    "claude model".
+    """
+    terms: Set[str] = set()
+    run: List[str] = []
+
+    def close_run() -> None:
+        for n in range(2, ngram + 1):
+            for i in range(len(run) - n + 1):
+                terms.add(" ".join(run[i:i + n]))
+        run.clear()
+
+    for tok in tokens(text, max_chars):
+        if tok in STOPWORDS or len(tok) < min_len:
+            close_run()
+            continue
+        terms.add(tok)
+        run.append(tok)
+    close_run()
+    return terms
+
@@ -0,0 +1,407 @@
+import copy
+import pickle
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+from bson import encode
+
+
+def _get(doc: Dict[str, Any], path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _cmp_ok(value, op: str, arg) -> bool:
+    if op == "$exists":
+        return (value is not None) == bool(arg)
+    if op == "$in":
+        if isinstance(value, list):
+            return any(v in arg for v in value)
+        return value in arg
+    if op == "$nin":
+        return not _cmp_ok(value, "$in", arg)
+    if op == "$ne":
+        if isinstance(value, list):
+            return arg not in value
+        return value != arg
+    if value is None:
+        return False
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    if op == "$lt":
+        return value < arg
+    if op == "$lte":
+        return value <= arg
+    raise NotImplementedError(f"FakeCollection does not support {op}")
+
+
+def matches(doc: Dict[str, Any], flt: Dict[str, Any]) -> bool:
+    """Subset of the Mongo query language: equality, array membership, comparison ops, $and/$or."""
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches(doc, c) for c in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(doc, c) for c in cond):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            if not all(_cmp_ok(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(cond, list):
+            if cond not in value:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1):
+            out["_id"] = doc["_id"]
+        return out
+    exclude = {k for k, v in projection.items() if not v}
+    return {k: copy.deepcopy(v) for k, v in doc.items() if k not in exclude}
+
+
+def _eval(expr, doc: Dict[str, Any]):
+    """Field paths ("$a.b"), documents of expressions, or literals."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get(doc, expr[1:])
+    if isinstance(expr, dict):
+        return {k: _eval(v, doc) for k, v in expr.items()}
+    return expr
+
+
+def _sorted(docs: List[Dict[str, Any]], spec: Dict[str, int]) -> List[Dict[str, Any]]:
+    return FakeCursor(list(docs)).sort(list(spec.items()))._docs
+
+
+def _group(docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """$group with $sum, $min, $max, $first, $last, $push, $addToSet, $topN and $firstN."""
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    keys: Dict[Any, Any] = {}
+    for doc in docs:
+        key = _eval(spec["_id"], doc)
+        frozen = repr(key)
+        keys[frozen] = key
+        groups.setdefault(frozen, []).append(doc)
+    out = []
+    for frozen, members in groups.items():
+        row = {"_id": keys[frozen]}
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = acc.items()
+            if op == "$topN":
+                top = _sorted(members, arg["sortBy"])[: arg["n"]]
+                row[field] = [_eval(arg["output"], d) for d in top]
+                continue
+            if op == "$firstN":
+                row[field] = [_eval(arg["input"], d) for d in members[: arg["n"]]]
+                continue
+            values = [_eval(arg, d) for d in members]
+            present = [v for v in values if v is not None]
+            if op == "$sum":
+                row[field] = sum(v for v in values if isinstance(v, (int, float)))
+            elif op == "$max":
+                row[field] = max(present) if present else None
+            elif op == "$min":
+                row[field] = min(present) if present else None
+            elif op == "$first":
+                row[field] = values[0]
+            elif op == "$last":
+                row[field] = values[-1]
+            elif op == "$push":
+                row[field] = values
+            elif op == "$addToSet":
+                row[field] = [v for i, v in enumerate(values) if v not in values[:i]]
+            else:
+                raise NotImplementedError(f"FakeCollection does not support {op} in $group")
+        out.append(row)
+    return out
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self._docs = docs
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None) -> "FakeCursor":
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction or 1)]
+        for key, direction in reversed(keys):
+            present = [d for d in self._docs if _get(d, key) is not None]
+            missing = [d for d in self._docs if _get(d, key) is None]
+            present.sort(key=lambda d: _get(d, key), reverse=direction < 0)
+            # nulls sort first ascending, last descending
+            self._docs = missing + present if direction > 0 else present + missing
+        return self
+
+    def limit(self, n: int) -> "FakeCursor":
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        docs = self._docs[: self._limit] if self._limit else self._docs
+        return iter(docs)
+
+
+class FakeCollection:
+    """
+    In-process stand-in for a pymongo Collection, covering what the repos use.
+
+    Applies `UpdateOne`/`UpdateMany`/`ReplaceOne`/`InsertOne` batches with `$set`, `$setOnInsert`, `$max`,
+    `$inc`, `$addToSet` and `$push`, and counts write ops and the BSON bytes sent.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.docs: Dict[Any, Dict[str, Any]] = {}
+        self.indexes: List[Any] = []
+        self.write_ops = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # --- writes ---
+    def _apply(self, doc: Dict[str, Any], update: Dict[str, Any], inserting: bool) -> bool:
+        before = copy.deepcopy(doc)
+        for op, fields in update.items():
+            for path, value in fields.items():
+                # dotted paths ("terms.gpt") address embedded documents
+                *parents, key = path.split(".")
+                target = doc
+                for part in parents:
+                    target = target.setdefault(part, {})
+                if op == "$set":
+                    target[key] = value
+                elif op == "$unset":
+                    target.pop(key, None)
+                elif op == "$setOnInsert":
+                    if inserting:
+                        target[key] = value
+                elif op == "$max":
+                    if target.get(key) is None or value > target[key]:
+                        target[key] = value
+                elif op == "$min":
+                    if target.get(key) is None or value < target[key]:
+                        target[key] = value
+                elif op == "$inc":
+                    target[key] = target.get(key, 0) + value
+                elif op == "$addToSet":
+                    values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                    arr = target.setdefault(key, [])
+                    arr.extend(v for v in values if v not in arr)
+                elif op == "$push":
+                    values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                    target.setdefault(key, []).extend(values)
+                else:
+                    raise NotImplementedError(f"FakeCollection does not support {op}")
+        return doc != before
+
+    def _update_one(self, flt, update, upsert: bool, res) -> None:
+        _id = flt.get("_id") if len(flt) == 1 else None
+        if _id is not None and not isinstance(_id, dict):
+            target = self.docs.get(_id)
+        else:
+            target = next((d for d in self.docs.values() if matches(d, flt)), None)
+        if target is not None:
+            res.matched_count += 1
+            if self._apply(target, update, inserting=False):
+                res.modified_count += 1
+        elif upsert:
+            doc = {k: v for k, v in flt.items() if not k.startswith("$") and not isinstance(v, dict)}
+            self._apply(doc, update, inserting=True)
+            self.docs[doc["_id"]] = doc
+            res.upserted_ids[len(res.upserted_ids)] = doc["_id"]
+
+    def bulk_write(self, ops: Iterable[Any], ordered: bool = True):
+        res = SimpleNamespace(matched_count=0, modified_count=0, inserted_count=0, upserted_ids={})
+        with self._lock:
+            for op in ops:
+                self.write_ops += 1
+                kind = type(op).__name__
+                if kind == "InsertOne":
+                    doc = copy.deepcopy(op._doc)
+                    doc.setdefault("_id", f"fake{len(self.docs)}")
+                    self.bytes_written += len(encode(doc))
+                    self.docs[doc["_id"]] = doc
+                    res.inserted_count += 1
+                elif kind == "UpdateOne":
+                    self.bytes_written += len(encode(op._filter)) + len(encode(op._doc))
+                    self._update_one(op._filter, op._doc, bool(op._upsert), res)
+                elif kind == "ReplaceOne":
+                    self.bytes_written += len(encode(op._filter)) + len(encode(op._doc))
+                    _id = op._filter.get("_id")
+                    target = (self.docs.get(_id) if len(op._filter) == 1 and not isinstance(_id, dict)
+                              else next((d for d in self.docs.values() if matches(d, op._filter)), None))
+                    if target is not None:
+                        res.matched_count += 1
+                        doc = {"_id": target["_id"], **copy.deepcopy(op._doc)}
+                        if doc != target:
+                            res.modified_count += 1
+                        self.docs[doc["_id"]] = doc
+                    elif op._upsert:
+                        doc = copy.deepcopy(op._doc)
+                        self.docs[doc["_id"]] = doc
+                        res.upserted_ids[len(res.upserted_ids)] = doc["_id"]
+                elif kind == "UpdateMany":
+                    self.bytes_written += len(encode(op._filter)) + len(encode(op._doc))
+                    _id = op._filter.get("_id") if len(op._filter) == 1 else None
+                    ids = _id.get("$in") if isinstance(_id, dict) else None
+                    targets = ([self.docs[i] for i in ids if i in self.docs] if isinstance(ids, list)
+                               else [d for d in self.docs.values() if matches(d, op._filter)])
+                    for doc in targets:
+                        res.matched_count += 1
+                        if self._apply(doc, op._doc, inserting=False):
+                            res.modified_count += 1
+                else:
+                    raise NotImplementedError(f"FakeCollection does not support {kind}")
+        return res
+
+    def update_one(self, flt, update, upsert: bool = False):
+        from pymongo import UpdateOne
+
+        return self.bulk_write([UpdateOne(flt, update, upsert=upsert)])
+
+    def update_many(self, flt, update):
+        from pymongo import UpdateMany
+
+        return self.bulk_write([UpdateMany(flt, update)])
+
+    def insert_one(self, doc):
+        from pymongo import InsertOne
+
+        doc.setdefault("_id", f"fake{len(self.docs)}")
+        self.bulk_write([InsertOne(doc)])
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    # --- reads ---
+    def find(self, flt: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        with self._lock:
+            docs = [_project(d, projection) for d in self.docs.values() if matches(d, flt or {})]
+        return FakeCursor(docs)
+
+    def find_one(self, flt: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        return next(iter(self.find(flt, projection)), None)
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> FakeCursor:
+        """$match, $sort, $limit, $project (inclusion) and `_group` stages."""
+        pipeline = list(pipeline)
+        first = pipeline.pop(0) if pipeline and "$match" in pipeline[0] else {"$match": {}}
+        with self._lock:
+            docs = [copy.deepcopy(d) for d in self.docs.values() if matches(d, first["$match"])]
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                docs = [d for d in docs if matches(d, arg)]
+            elif op == "$sort":
+                docs = _sorted(docs, arg)
+            elif op == "$limit":
+                docs = docs[:arg]
+            elif op == "$project":
+                docs = [_project(d, arg) for d in docs]
+            elif op == "$group":
+                docs = _group(docs, arg)
+            else:
+                raise NotImplementedError(f"FakeCollection does not support {op}")
+        return FakeCursor(docs)
+
+    def count_documents(self, flt: Dict[str, Any]) -> int:
+        with self._lock:
+            return sum(1 for d in self.docs.values() if matches(d, flt))
+
+    def create_index(self, keys, **kwargs) -> str:
+        if keys not in self.indexes:
+            self.indexes.append(keys)
+        return kwargs.get("name") or "_".join(f"{k}_{v}" for k, v in keys)
+
+    def index_information(self) -> Dict[str, Dict[str, Any]]:
+        info = {"_id_": {"key": [("_id", 1)]}}
+        info.update({"_".join(f"{k}_{v}" for k, v in keys): {"key": list(keys)} for keys in self.indexes})
+        return info
+
+    def drop_index(self, name: str) -> None:
+        self.indexes = [k for k in self.indexes if "_".join(f"{f}_{v}" for f, v in k) != name]
+
+    def stats(self) -> Dict[str, Any]:
+        """`collStats`-like sizes: BSON bytes of the docs, index sizes estimated from their key values."""
+        with self._lock:
+            docs = list(self.docs.values())
+        size = sum(len(encode(d)) for d in docs)
+        index_sizes = {}
+        for name, info in self.index_information().items():
+            fields = [f for f, _ in info["key"]]
+            # index entries hold the key values (no field names) plus a record id
+            index_sizes[name] = sum(len(encode({"": [_get(d, f) for f in fields]})) + 8 for d in docs)
+        return {"ns": self.name, "count": len(docs), "size": size, "storageSize": size,
+                "avgObjSize": size // len(docs) if docs else 0, "nindexes": len(index_sizes),
+                "totalIndexSize": sum(index_sizes.values()), "indexSizes": index_sizes}
+
+
+class FakeDatabase:
+    """Attribute/item access creates collections on demand, like a pymongo Database."""
+
+    def __init__(self, name: str = "bench"):
+        self.name = name
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_") or name in ("collections", "name"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self.collections)
+
+    def create_collection(self, name: str, **options) -> FakeCollection:
+        # options such as `timeseries` only change the storage layout, not the results
+        return self[name]
+
+    def command(self, name: str, value: Any = None, **kwargs) -> Dict[str, Any]:
+        if name == "collStats":
+            return self[value].stats()
+        raise NotImplementedError(f"FakeDatabase does not support the {name} command")
+
+    def totals(self) -> Dict[str, int]:
+        return {
+            "docs": sum(len(c.docs) for c in self.collections.values()),
+            "write_ops": sum(c.write_ops for c in self.collections.values()),
+            "bytes_written": sum(c.bytes_written for c in self.collections.values()),
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as fh:
+            pickle.dump(self.collections, fh)
+
+    @classmethod
+    def load(cls, path: str, name: str = "bench") -> "FakeDatabase":
+        db = cls(name)
+        with open(path, "rb") as fh:
+            db.collections = pickle.load(fh)
+        return db
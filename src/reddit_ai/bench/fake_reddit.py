@@ -0,0 +1,478 @@
+import glob
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# Reddit listings are served 100 items per request.
+PAGE_SIZE = 100
+# A submission fetch loads ~200 comments; "load more" stubs hold up to 100 ids,
+# and threads deeper than 10 levels end in a "continue this thread" stub.
+INITIAL_COMMENTS = 200
+MORE_CHILDREN = 100
+MAX_DEPTH = 10
+
+_WORDS = (
+    "model release local inference weights benchmark prompt context tokens agent "
+    "fine tune dataset gpu quantized open source paper training eval latency "
+    "reasoning vision diffusion llama chat assistant api pricing update"
+).split()
+
+
+class Fixture:
+    """
+    Submissions and comments served by `FakeReddit`, keyed like Reddit's data.
+
+    Either replayed from a recorded capture directory (`load`, the layout written
+    by `sinks.JsonlSink`/`capture_path`: `<dir>/posts/*` and `<dir>/comments/*`),
+    or generated on demand per subreddit (`synthetic_data`, deterministic per seed).
+    Synthetic data includes bots, removed, NSFW and non-English items so every
+    collector filter is exercised, plus `reply_ratio` replies per top-level comment
+    in nested threads.
+    """
+
+    def __init__(
+        self,
+        posts: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        comments: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        synthetic: bool = False,
+        posts_per_sub: int = 250,
+        comments_per_post: int = 150,
+        seed: int = 0,
+        subreddits: Optional[List[str]] = None,
+        reply_ratio: float = 1.0,
+    ):
+        self.posts = posts or {}
+        self.comments = comments or {}
+        self.synthetic = synthetic
+        self.posts_per_sub = posts_per_sub
+        self.comments_per_post = comments_per_post
+        self.seed = seed
+        self.reply_ratio = reply_ratio
+        # canonical names, so a subreddit reached through a (lowercase) post id keeps its casing
+        self.names = {name.lower(): name for name in subreddits or []}
+        self._by_id = {p["_id"]: p for items in self.posts.values() for p in items}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, root: str) -> "Fixture":
+        from ..db.repositories.sinks import read_docs
+
+        posts: Dict[str, List[Dict[str, Any]]] = {}
+        comments: Dict[str, List[Dict[str, Any]]] = {}
+        for path in sorted(glob.glob(os.path.join(root, "posts", "*"))):
+            for doc in read_docs(path):
+                posts.setdefault(doc["subreddit"].lower(), []).append(doc)
+        for path in sorted(glob.glob(os.path.join(root, "comments", "*"))):
+            for doc in read_docs(path):
+                comments.setdefault(doc["post_id"], []).append(doc)
+        for items in posts.values():
+            # later captures of the same post win
+            dedup = {p["_id"]: p for p in items}
+            items[:] = sorted(dedup.values(), key=lambda p: p.get("created_utc", 0), reverse=True)
+        return cls(posts, comments)
+
+    @classmethod
+    def synthetic_data(
+        cls,
+        posts_per_sub: int = 250,
+        comments_per_post: int = 150,
+        seed: int = 0,
+        subreddits: Optional[List[str]] = None,
+        reply_ratio: float = 1.0,
+    ) -> "Fixture":
+        return cls(synthetic=True, posts_per_sub=posts_per_sub, comments_per_post=comments_per_post,
+                   seed=seed, subreddits=subreddits, reply_ratio=reply_ratio)
+
+    def _rng(self, key: str) -> random.Random:
+        return random.Random(zlib.crc32(f"{self.seed}:{key}".encode("utf-8")))
+
+    def _text(self, rng: random.Random, n: int) -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+    def _generate_posts(self, name: str) -> List[Dict[str, Any]]:
+        rng = self._rng(name.lower())
+        now = int(time.time())
+        posts = []
+        for i in range(self.posts_per_sub):
+            roll = rng.random()
+            title = self._text(rng, rng.randint(5, 14)).capitalize()
+            selftext = self._text(rng, rng.randint(0, 120))
+            if roll < 0.05:
+                title, selftext = "这是一个关于大模型的帖子", "本地推理 " * rng.randint(3, 30)
+            posts.append({
+                "_id": f"{name.lower()}_{i}",
+                "subreddit": name,
+                "title": title,
+                "selftext": selftext,
+                "author": None if 0.05 <= roll < 0.07 else ("AutoModeratorBot" if 0.07 <= roll < 0.09 else f"user_{rng.randint(1, 400)}"),
+                "score": max(0, int(rng.paretovariate(1.2) * 10) - i // 10),
+                "upvote_ratio": round(rng.uniform(0.5, 1.0), 2),
+                "num_comments": rng.choice((0, 3, 12, 40, 150)),
+                "permalink": f"https://reddit.com/r/{name}/comments/{name.lower()}_{i}/",
+                "created_utc": now - i * rng.randint(120, 1800),
+                "over_18": 0.09 <= roll < 0.10,
+            })
+        return posts
+
+    def _generate_comments(self, post: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rng = self._rng(post["_id"])
+        name = post["subreddit"]
+        now = int(time.time())
+        out = []
+        for i in range(min(self.comments_per_post, max(post.get("num_comments", 0), 0))):
+            roll = rng.random()
+            body = self._text(rng, rng.randint(3, 200))
+            if roll < 0.05:
+                body = "Это комментарий на другом языке " * rng.randint(1, 5)
+            elif roll < 0.08:
+                body = "[deleted]"
+            out.append({
+                "_id": f"{post['_id']}_c{i}",
+                "post_id": post["_id"],
+                "subreddit": name,
+                "author": "[deleted]" if body == "[deleted]" else f"commenter_{rng.randint(1, 900)}",
+                "body": body,
+                "score": int(rng.paretovariate(1.5)) - 1,
+                "is_top_level": True,
+                "permalink": f"https://reddit.com/r/{name}/comments/{post['_id']}/_/{post['_id']}_c{i}/",
+                "created_utc": now - i * 60,
+                "parent_id": f"t3_{post['_id']}",
+            })
+        return out + self._generate_replies(post, out)
+
+    def _generate_replies(self, post: Dict[str, Any], top: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # own stream, so top-level comments are the same whatever the reply ratio
+        rng = self._rng(post["_id"] + ":replies")
+        name = post["subreddit"]
+        now = int(time.time())
+        replies: List[Dict[str, Any]] = []
+        for i in range(int(len(top) * self.reply_ratio)):
+            roll = rng.random()
+            # mostly answers to a few popular threads, some long back-and-forth chains
+            if roll < 0.3 and replies:
+                parent = replies[-1]
+            elif roll < 0.6 or not replies:
+                parent = top[min(int(rng.paretovariate(1.2)) - 1, len(top) - 1)]
+            else:
+                parent = rng.choice(replies)
+            cid = f"{post['_id']}_r{i}"
+            replies.append({
+                "_id": cid,
+                "post_id": post["_id"],
+                "subreddit": name,
+                "author": f"commenter_{rng.randint(1, 900)}",
+                "body": self._text(rng, rng.randint(3, 80)),
+                "score": int(rng.paretovariate(2.0)) - 1,
+                "is_top_level": False,
+                "permalink": f"https://reddit.com/r/{name}/comments/{post['_id']}/_/{cid}/",
+                "created_utc": now - i * 30,
+                "parent_id": f"t1_{parent['_id']}",
+            })
+        return replies
+
+    def posts_for(self, subreddit: str) -> List[Dict[str, Any]]:
+        key = subreddit.lower()
+        with self._lock:
+            if key not in self.posts and self.synthetic:
+                self.posts[key] = self._generate_posts(self.names.get(key, subreddit))
+                self._by_id.update((p["_id"], p) for p in self.posts[key])
+            return self.posts.get(key, [])
+
+    def post(self, post_id: str) -> Optional[Dict[str, Any]]:
+        if post_id not in self._by_id and self.synthetic and "_" in post_id:
+            self.posts_for(post_id.rsplit("_", 1)[0])
+        return self._by_id.get(post_id)
+
+    def comments_for(self, post_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            if post_id in self.comments or not self.synthetic:
+                return self.comments.get(post_id, [])
+        post = self.post(post_id)
+        if post is None:
+            return []
+        with self._lock:
+            return self.comments.setdefault(post_id, self._generate_comments(post))
+
+
+def _strip_host(permalink: str) -> str:
+    return permalink.replace("https://reddit.com", "", 1) if permalink else permalink
+
+
+class FakeReddit:
+    """
+    Offline stand-in for `praw.Reddit` that replays a `Fixture` with simulated latency.
+
+    Only the surface the collectors touch is implemented. Every listing page,
+    submission fetch and `info` batch counts as one API call, sleeps `latency`
+    seconds, and is reported through `auth.limits` like Reddit's X-Ratelimit headers.
+
+    Args:
+        latency: Seconds slept per simulated API call.
+        posts_per_sub: Number of posts each synthetic subreddit holds.
+        comments_per_post: Max top-level comments per synthetic submission (replies
+            come on top, see `Fixture.reply_ratio`).
+        page_size: Items served per listing page.
+        ratelimit: Calls allowed per `window` seconds.
+        window: Length of the rate-limit window in seconds.
+        fixture: Data to serve; synthetic data is generated if None.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        posts_per_sub: int = 250,
+        comments_per_post: int = 150,
+        page_size: int = PAGE_SIZE,
+        ratelimit: int = 1000,
+        window: float = 600.0,
+        fixture: Optional[Fixture] = None,
+    ):
+        self.latency = latency
+        self.page_size = page_size
+        self.ratelimit = ratelimit
+        self.window = window
+        self.fixture = fixture or Fixture.synthetic_data(posts_per_sub, comments_per_post)
+        self.api_calls = 0
+        self.calls: Dict[str, int] = {}
+        self._window_start = time.time()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint: str = "other") -> None:
+        with self._lock:
+            self.api_calls += 1
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            if time.time() - self._window_start >= self.window:
+                self._window_start, self._used = time.time(), 0
+            self._used += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def auth(self) -> SimpleNamespace:
+        with self._lock:
+            if not self._used:
+                limits = {"remaining": None, "reset_timestamp": None, "used": None}
+            else:
+                limits = {
+                    "remaining": float(max(self.ratelimit - self._used, 0)),
+                    "reset_timestamp": self._window_start + self.window,
+                    "used": self._used,
+                }
+        return SimpleNamespace(limits=limits)
+
+    def subreddit(self, name: str) -> "FakeSubreddit":
+        return FakeSubreddit(self, name)
+
+    def submission(self, id: str) -> "FakeSubmission":
+        return FakeSubmission(self, id)
+
+    def info(self, fullnames=None):
+        """Resolve submissions by fullname, one API call per 100 like Reddit's /api/info."""
+        fullnames = list(fullnames or [])
+        for start in range(0, len(fullnames), 100):
+            self._call("info")
+            for name in fullnames[start:start + 100]:
+                submission = FakeSubmission(self, name.split("_", 1)[1])
+                if submission._load_meta():
+                    yield submission
+
+
+class FakeSubreddit:
+    def __init__(self, reddit: FakeReddit, name: str):
+        self._reddit = reddit
+        self.display_name = name
+
+    def __str__(self) -> str:
+        return self.display_name
+
+    def _listing(self, items: List[Dict[str, Any]], limit: int):
+        for i, post in enumerate(items[:limit]):
+            if i % self._reddit.page_size == 0:
+                self._reddit._call("listing")
+            yield SimpleNamespace(
+                id=post["_id"],
+                title=post.get("title", ""),
+                selftext=post.get("selftext", ""),
+                author=post.get("author"),
+                subreddit=FakeSubreddit(self._reddit, post.get("subreddit", self.display_name)),
+                score=post.get("score", 0),
+                upvote_ratio=post.get("upvote_ratio", 0.0),
+                num_comments=post.get("num_comments", 0),
+                permalink=_strip_host(post.get("permalink", "")),
+                created_utc=post.get("created_utc", 0),
+                over_18=post.get("over_18", False),
+                removed_by_category=post.get("removed_by_category"),
+            )
+
+    def new(self, limit: int = 100):
+        return self._listing(self._reddit.fixture.posts_for(self.display_name), limit)
+
+    def hot(self, limit: int = 100):
+        now = time.time()
+        items = sorted(
+            self._reddit.fixture.posts_for(self.display_name),
+            key=lambda p: p.get("score", 0) / (2 + (now - p.get("created_utc", now)) / 3600) ** 1.5,
+            reverse=True,
+        )
+        return self._listing(items, limit)
+
+    def top(self, time_filter: str = "day", limit: int = 100):
+        spans = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400, "year": 365 * 86400}
+        floor = time.time() - spans.get(time_filter, float("inf"))
+        items = [p for p in self._reddit.fixture.posts_for(self.display_name) if p.get("created_utc", 0) >= floor]
+        items.sort(key=lambda p: p.get("score", 0), reverse=True)
+        return self._listing(items, limit)
+
+
+class FakeCommentForest(list):
+    def replace_more(self, limit: int = 32):
+        # like PRAW with limit=0: drop every stub, expand none
+        queue = deque([self])
+        while queue:
+            forest = queue.popleft()
+            forest[:] = [c for c in forest if not isinstance(c, FakeMoreComments)]
+            queue.extend(c.replies for c in forest)
+        return []
+
+    def list(self):
+        out, queue = [], deque(self)
+        while queue:
+            item = queue.popleft()
+            out.append(item)
+            queue.extend(getattr(item, "replies", ()))
+        return out
+
+
+class FakeMoreComments:
+    """A "load more comments" stub; `count == 0` is a "continue this thread" link."""
+
+    def __init__(self, submission: "FakeSubmission", parent_id: str, children: List[str], depth: int):
+        self.submission = submission
+        self.parent_id = parent_id
+        self.children = children
+        self.count = len(children)
+        self.depth = depth
+
+    def comments(self, update: bool = True) -> "FakeCommentForest":
+        """One API call (/api/morechildren, or the thread page for a continue link)."""
+        submission = self.submission
+        submission._reddit._call("morechildren")
+        if self.children:
+            roots = [submission._docs[cid] for cid in self.children]
+            chosen = submission._select(roots, MORE_CHILDREN)
+            return FakeCommentForest(
+                submission._comment(doc, self.depth, submission._forest(f"t1_{doc['_id']}", self.depth + 1, 1, chosen))
+                for doc in roots
+            )
+        kids = submission._kids.get(self.parent_id, [])
+        chosen = submission._select(kids, INITIAL_COMMENTS)
+        return submission._forest(self.parent_id, self.depth, 0, chosen)
+
+
+class FakeSubmission:
+    """
+    Lazy like PRAW: the first access to comments (or to metadata, unless the
+    submission came from `info`) costs one API call.
+
+    The comment forest is shaped like Reddit's: about `INITIAL_COMMENTS` comments
+    breadth-first, the rest behind `FakeMoreComments` stubs.
+    """
+
+    def __init__(self, reddit: FakeReddit, id: str):
+        self._reddit = reddit
+        self.id = id
+        self.comment_sort = "confidence"
+        self._comments = None
+        self._subreddit = None
+
+    def _load_meta(self) -> bool:
+        post = self._reddit.fixture.post(self.id)
+        if post is None:
+            return False
+        self._subreddit = FakeSubreddit(self._reddit, post.get("subreddit", "unknown"))
+        self.num_comments = post.get("num_comments", 0)
+        self.removed_by_category = post.get("removed_by_category")
+        return True
+
+    def _comment(self, c: Dict[str, Any], depth: int, replies: FakeCommentForest) -> SimpleNamespace:
+        return SimpleNamespace(
+            id=c["_id"],
+            author=c.get("author"),
+            body=c.get("body", ""),
+            score=c.get("score", 0),
+            is_root=depth == 0,
+            depth=depth,
+            permalink=_strip_host(c.get("permalink", "")),
+            created_utc=c.get("created_utc", 0),
+            parent_id=c.get("parent_id"),
+            link_id=f"t3_{self.id}",
+            replies=replies,
+        )
+
+    def _select(self, roots: List[Dict[str, Any]], budget: int) -> set:
+        """Ids of the first `budget` comments breadth-first under `roots`, within MAX_DEPTH levels."""
+        chosen: set = set()
+        queue = deque((doc, 1) for doc in roots)
+        while queue and len(chosen) < budget:
+            doc, level = queue.popleft()
+            chosen.add(doc["_id"])
+            if level < MAX_DEPTH:
+                queue.extend((kid, level + 1) for kid in self._kids.get(f"t1_{doc['_id']}", []))
+        return chosen
+
+    def _forest(self, parent_id: str, depth: int, level: int, chosen: set) -> FakeCommentForest:
+        """Children of `parent_id` that are in `chosen`, the others behind stubs."""
+        forest, rest = FakeCommentForest(), []
+        for doc in self._kids.get(parent_id, []):
+            if doc["_id"] in chosen:
+                forest.append(self._comment(doc, depth, self._forest(f"t1_{doc['_id']}", depth + 1, level + 1, chosen)))
+            else:
+                rest.append(doc["_id"])
+        if rest and level >= MAX_DEPTH:
+            forest.append(FakeMoreComments(self, parent_id, [], depth))
+        elif rest:
+            forest.extend(FakeMoreComments(self, parent_id, rest[i:i + MORE_CHILDREN], depth)
+                          for i in range(0, len(rest), MORE_CHILDREN))
+        return forest
+
+    def _fetch(self) -> None:
+        if self._comments is not None:
+            return
+        self._reddit._call("submission")
+        if not self._load_meta():
+            self._subreddit = FakeSubreddit(self._reddit, "unknown")
+        items = self._reddit.fixture.comments_for(self.id)
+        if self.comment_sort in ("top", "confidence", "hot"):
+            items = sorted(items, key=lambda c: c.get("score", 0), reverse=True)
+        elif self.comment_sort == "new":
+            items = sorted(items, key=lambda c: c.get("created_utc", 0), reverse=True)
+        self._docs = {c["_id"]: c for c in items}
+        self._kids: Dict[str, List[Dict[str, Any]]] = {}
+        for c in items:
+            parent = c.get("parent_id") or ""
+            if not (parent.startswith("t1_") and parent[3:] in self._docs):
+                parent = f"t3_{self.id}"   # parent missing from a capture: hang it at the top
+            self._kids.setdefault(parent, []).append(c)
+        top = self._kids.get(f"t3_{self.id}", [])
+        self._comments = self._forest(f"t3_{self.id}", 0, 0, self._select(top, INITIAL_COMMENTS))
+
+    @property
+    def _fetched(self) -> bool:
+        return self._comments is not None
+
+    @property
+    def comments(self) -> FakeCommentForest:
+        self._fetch()
+        return self._comments
+
+    @property
+    def subreddit(self) -> FakeSubreddit:
+        if self._subreddit is None:
+            self._fetch()
+        return self._subreddit
@@ -0,0 +1,224 @@
+import argparse
+import importlib
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from ..db.repositories.posts_repo import target_pipeline
+from .fake_mongo import FakeDatabase
+from .fake_reddit import FakeReddit, Fixture
+
+logger = logging.getLogger(__name__)
+
+# run order matters: the c_* scripts read the posts written by the first three
+SCRIPTS = ("new", "hot", "top_day", "c_new", "c_hot", "c_top")
+
+BENCH_DB = "reddit_ai_bench"
+
+
+def _mongo_totals(db) -> Dict[str, int]:
+    ops = db.client.admin.command("serverStatus")["opcounters"]
+    size = 0
+    docs = 0
+    for name in db.list_collection_names():
+        stats = db.command("collStats", name)
+        size += stats.get("size", 0)
+        docs += stats.get("count", 0)
+    return {"docs": docs, "write_ops": ops["insert"] + ops["update"], "bytes_written": size}
+
+
+def run_child(
+    script: str,
+    *,
+    state_path: str,
+    latency: float,
+    ratelimit: int,
+    fixture_dir: Optional[str] = None,
+    mongo_uri: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run one collection script against FakeReddit and a Mongo stand-in; return its metrics."""
+    module = importlib.import_module(f"scripts.{script}")
+    subreddits = [s for group in ("FAST", "CORE", "CREATOR") for s in getattr(module, group, [])]
+    if not subreddits and hasattr(module, "HOURLY"):   # cycle scripts: every group of the config
+        subreddits = [s for group in module.HOURLY["groups"].values() for s in group]
+    fixture = Fixture.load(fixture_dir) if fixture_dir else Fixture.synthetic_data(subreddits=subreddits)
+    reddit = FakeReddit(latency=latency, ratelimit=ratelimit, fixture=fixture)
+
+    if mongo_uri:
+        from pymongo import MongoClient
+
+        db = MongoClient(mongo_uri)[BENCH_DB]
+        totals = lambda: _mongo_totals(db)
+    else:
+        db = FakeDatabase.load(state_path) if os.path.exists(state_path) else FakeDatabase()
+        totals = db.totals
+    before = totals()
+
+    start = time.perf_counter()
+    module.run(reddit=reddit, db=db)
+    wall = time.perf_counter() - start
+
+    after = totals()
+    if not mongo_uri:
+        db.save(state_path)
+    write_ops = after["write_ops"] - before["write_ops"]
+    return {
+        "script": script,
+        "wall_s": round(wall, 3),
+        "write_ops": write_ops,
+        "docs_per_s": round(write_ops / wall, 1) if wall else 0.0,
+        "docs_total": after["docs"],
+        "api_calls": reddit.api_calls,
+        "api_calls_by_endpoint": dict(reddit.calls),
+        "bytes_written": after["bytes_written"] - before["bytes_written"],
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _plan_stages(node) -> set:
+    """
+    Every `stage` name in an explain document (classic or SBE plans, any nesting).
+    A `$sort` left in the aggregation pipeline counts as a blocking SORT; the echoed
+    `command` is not walked.
+    """
+    stages = set()
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            stages.add(node["stage"])
+        if "$sort" in node:
+            stages.add("SORT")
+        for key, value in node.items():
+            if key != "command":
+                stages |= _plan_stages(value)
+    elif isinstance(node, list):
+        for value in node:
+            stages |= _plan_stages(value)
+    return stages
+
+
+def target_plan_commands(config: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    `(task, command)` to explain for each comment-target selection of a cycle config:
+    the ranked aggregation of `per_sub` specs, the `plan_refresh` posts query of
+    `budget` specs.
+    """
+    from ..pipelines.refresh import refresh_query
+
+    subs = [sub for group in config["groups"].values() for sub in group]
+    commands = []
+    for name, spec in config.get("comments", {}).items():
+        if "per_sub" in spec:
+            pipeline = target_pipeline(subs, spec["seen_in"], max(spec["per_sub"].values()))
+            commands.append((name, {"aggregate": "posts", "pipeline": pipeline, "cursor": {}}))
+        else:
+            flt, projection = refresh_query(subs, seen_in=spec.get("seen_in"))
+            commands.append((name, {"find": "posts", "filter": flt, "projection": projection}))
+    return commands
+
+
+def check_target_plans(db, config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Explain each comment-target selection of the hourly cycle. A good plan scans an
+    index (IXSCAN) and has no blocking SORT: for the `per_sub` aggregation, whose
+    `$sort` must then have been served by the `targets_by_listing` index order.
+    """
+    from ..pipelines.orchestrator import HOURLY
+
+    rows = []
+    for name, command in target_plan_commands(config or HOURLY):
+        stages = _plan_stages(db.command("explain", command))
+        rows.append({"target": name, "index_scan": "IXSCAN" in stages, "blocking_sort": "SORT" in stages,
+                     "stages": sorted(stages)})
+        print(f"target plan {name:<6} index_scan={'IXSCAN' in stages} blocking_sort={'SORT' in stages} "
+              f"stages={','.join(sorted(stages))}")
+    return rows
+
+
+def _print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    cols = ("wall_s", "docs_per_s", "write_ops", "api_calls", "bytes_written", "peak_rss_mb")
+    print(f"{'script':<9}" + "".join(f"{c:>16}" for c in cols))
+    for row in results:
+        line = f"{row['script']:<9}"
+        for c in cols:
+            cell = f"{row[c]}"
+            before = (baseline or {}).get(row["script"], {}).get(c)
+            if before:
+                cell += f" ({row[c] / before:.2f}x)"
+            line += f"{cell:>16}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the collection scripts.")
+    parser.add_argument("--scripts", default=",".join(SCRIPTS), help="comma-separated, run in this order")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per simulated API call")
+    parser.add_argument("--ratelimit", type=int, default=1000, help="API calls allowed per 600s window (raise it to take the limiter out of the measurement)")
+    parser.add_argument("--fixture", help="recorded capture dir (posts/, comments/); synthetic data if omitted")
+    parser.add_argument("--mongo-uri", help="local mongod to write to instead of the in-process fake")
+    parser.add_argument("--workdir", default="bench_runs", help="fake Mongo state and child logs")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="results JSON of a previous run to show ratios against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    state_path = os.path.join(args.workdir, "fake_mongo.pkl")
+
+    if args.child:
+        # one script per process, so peak RSS is per script
+        result = run_child(args.child, state_path=state_path, latency=args.latency, ratelimit=args.ratelimit,
+                           fixture_dir=args.fixture, mongo_uri=args.mongo_uri)
+        print(json.dumps(result))
+        return [result]
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    if args.mongo_uri:
+        from pymongo import MongoClient
+
+        MongoClient(args.mongo_uri).drop_database(BENCH_DB)
+
+    results = []
+    for script in args.scripts.split(","):
+        cmd = [sys.executable, "-m", "scripts.bench", "--child", script,
+               "--latency", str(args.latency), "--ratelimit", str(args.ratelimit), "--workdir", args.workdir]
+        if args.fixture:
+            cmd += ["--fixture", args.fixture]
+        if args.mongo_uri:
+            cmd += ["--mongo-uri", args.mongo_uri]
+        with open(os.path.join(args.workdir, f"{script}.log"), "w") as log:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=log, text=True)
+        if proc.returncode != 0:
+            logger.error("bench of %s failed (exit %d); see %s/%s.log", script, proc.returncode, args.workdir, script)
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = {row["script"]: row for row in json.load(fh)}
+    _print_table(results, baseline)
+    if args.mongo_uri:
+        from pymongo import MongoClient
+
+        from ..db.indexes import create_indexes
+
+        db = MongoClient(args.mongo_uri)[BENCH_DB]
+        create_indexes(db)
+        plans = check_target_plans(db)
+        if any(row["blocking_sort"] for row in plans):
+            logger.error("comment-target selection plans contain a blocking SORT stage")
+    else:
+        # still build every selection query, so a config-shape change fails here
+        from ..pipelines.orchestrator import HOURLY
+
+        names = [name for name, _ in target_plan_commands(HOURLY)]
+        print(f"target plans: {len(names)} queries built ({','.join(names)}), not explained (needs --mongo-uri)")
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=2)
+    return results
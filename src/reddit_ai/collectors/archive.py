@@ -0,0 +1,244 @@
+import glob
+import gzip
+import io
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import requests
+from ..utils.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Historical posts and comments, read from Pushshift-style archives instead of the
+# Reddit listings (capped at ~1000 items). The HTTP archive is queried per time
+# slice; dump files are read once each, front to back. `post_record`/`comment_record`
+# turn the archive's raw objects into the records of the normalize stage
+# (collectors/normalize.py).
+
+KINDS = ("posts", "comments")
+
+# the archive marks removed authors and texts with these placeholders
+_DELETED = ("[deleted]", "[removed]")
+
+# "RS_2023-01.zst", "RC_2023-01.zst": monthly dumps
+_MONTH = re.compile(r"(\d{4})-(\d{2})")
+# "LocalLLaMA_submissions.zst", "LocalLLaMA_comments.zst": per-subreddit dumps
+_PER_SUB = re.compile(r"^(\w+?)_(submissions|comments)\.")
+# file-name markers of each kind: monthly prefix, per-subreddit suffix
+_KIND_NAMES = {"posts": ("RS_", "submissions"), "comments": ("RC_", "comments")}
+
+
+def post_record(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize-stage record (see `normalize.post_record`) of an archived submission."""
+    author = obj.get("author")
+    return {
+        "id": obj["id"],
+        "subreddit": obj.get("subreddit") or "",
+        "title": obj.get("title") or "",
+        "selftext": "" if obj.get("selftext") in _DELETED else (obj.get("selftext") or ""),
+        "author": None if author in _DELETED else author,
+        "removed": obj.get("removed_by_category") is not None or obj.get("selftext") == "[removed]",
+        "over_18": bool(obj.get("over_18", False)),
+        "score": int(obj.get("score") or 0),
+        "upvote_ratio": float(obj.get("upvote_ratio") or 0.0),
+        "num_comments": int(obj.get("num_comments") or 0),
+        "permalink": obj.get("permalink") or f"/r/{obj.get('subreddit')}/comments/{obj['id']}/",
+        "created_utc": int(float(obj.get("created_utc") or 0)),
+        "listing": "archive",
+        "time_filter": None,
+    }
+
+
+def comment_record(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize-stage record (see `normalize.comment_record`) of an archived comment."""
+    post_id = (obj.get("link_id") or "").removeprefix("t3_")
+    parent = obj.get("parent_id")
+    return {
+        "id": obj["id"],
+        "post_id": post_id,
+        "subreddit": obj.get("subreddit") or "",
+        "author": obj.get("author"),
+        "body": obj.get("body") or "",
+        "score": int(obj.get("score") or 0),
+        "is_top_level": bool(parent and parent.startswith("t3_")),
+        "permalink": obj.get("permalink") or f"/r/{obj.get('subreddit')}/comments/{post_id}/_/{obj['id']}/",
+        "created_utc": int(float(obj.get("created_utc") or 0)),
+        "parent_id": parent,
+        "sort": "archive",
+    }
+
+
+RECORDS = {"posts": post_record, "comments": comment_record}
+
+
+def _check_kind(kind: str) -> None:
+    if kind not in KINDS:
+        raise ValueError(f"Invalid kind '{kind}'. Expected one of {list(KINDS)}.")
+
+
+def read_ndjson(path: str, skip: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    `(line number, object)` of a newline-delimited JSON file: plain, `.gz` or `.zst`
+    (needs `zstandard`). The first `skip` lines are passed over without being parsed
+    (compressed streams cannot seek: they are still decompressed).
+    """
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("reading .zst dumps needs zstandard (pip install zstandard)") from e
+        raw = open(path, "rb")
+        # Pushshift dumps are compressed with a 2 GiB window
+        stream = zstandard.ZstdDecompressor(max_window_size=2 ** 31).stream_reader(raw)
+        fh = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    elif path.endswith(".gz"):
+        raw = fh = gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    else:
+        raw = fh = open(path, encoding="utf-8", errors="replace")
+    try:
+        for n, line in enumerate(fh, 1):
+            if n <= skip or not line.strip():
+                continue
+            try:
+                yield n, json.loads(line)
+            except ValueError:
+                logger.warning("corrupt line %d in %s skipped", n, path)
+    finally:
+        fh.close()
+        raw.close()
+
+
+def _month_bounds(path: str) -> Optional[tuple]:
+    m = _MONTH.search(os.path.basename(path))
+    if not m:
+        return None
+    year, month = int(m.group(1)), int(m.group(2))
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def dump_subreddit(path: str) -> Optional[str]:
+    """Subreddit (lowercased) of a per-subreddit dump ("LocalLLaMA_comments.zst"), else None."""
+    m = _PER_SUB.match(os.path.basename(path))
+    return m.group(1).lower() if m else None
+
+
+class DumpSource:
+    """
+    Local dump files (Pushshift / Arctic Shift NDJSON, optionally zstd-compressed).
+
+    Dumps are read file by file, each in a single pass (`iter_file`): a monthly
+    dump ("RS_2023-01.zst") or a per-subreddit one ("LocalLLaMA_submissions.zst")
+    is decompressed once for the whole date range, not once per time slice. Files
+    named by month outside the range are not opened. With `time_sorted=True`
+    (per-subreddit dumps are sorted by `created_utc`), a file is left as soon as the
+    range end is passed.
+
+    Args:
+        paths: Dump files or glob patterns.
+        time_sorted: Objects of each file come in `created_utc` order.
+    """
+
+    def __init__(self, paths: Iterable[str], time_sorted: bool = False):
+        self.paths: List[str] = sorted({p for pattern in paths for p in (glob.glob(pattern) or [pattern])})
+        self.time_sorted = time_sorted
+
+    def files(self, kind: str, subreddits: Sequence[str], start: int, end: int) -> List[str]:
+        """
+        Files that may hold `kind` objects of `subreddits` created in `[start, end)`,
+        judged from their names (month, "RS_"/"RC_", "<subreddit>_submissions").
+        """
+        _check_kind(kind)
+        wanted = {s.lower() for s in subreddits}
+        prefix, suffix = _KIND_NAMES[kind]
+        keep = []
+        for path in self.paths:
+            name = os.path.basename(path)
+            bounds = _month_bounds(path)
+            if bounds is not None and (bounds[1] <= start or bounds[0] >= end):
+                continue
+            per_sub = _PER_SUB.match(name)
+            if per_sub and (dump_subreddit(path) not in wanted or per_sub.group(2) != suffix):
+                continue
+            if name[:3] in ("RS_", "RC_") and name[:3] != prefix:
+                continue
+            keep.append(path)
+        return keep
+
+    def iter_file(self, path: str, kind: str, subreddits: Sequence[str], start: int, end: int,
+                  skip: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """`(line number, object)` of the requested subreddits created in `[start, end)`, after line `skip`."""
+        _check_kind(kind)
+        wanted: Set[str] = {s.lower() for s in subreddits}
+        for n, obj in read_ndjson(path, skip):
+            created = int(float(obj.get("created_utc") or 0))
+            if created >= end and self.time_sorted:
+                break
+            if start <= created < end and (obj.get("subreddit") or "").lower() in wanted:
+                yield n, obj
+
+
+class ArchiveSource:
+    """
+    Pushshift-compatible HTTP archive (default: the Arctic Shift API, `ARCHIVE_URL`).
+
+    Each subreddit of a slice is paged in ascending `created_utc` order, `page_size`
+    objects per call, with `after` set to the last timestamp seen; objects sharing
+    that second are de-duplicated by id.
+
+    Args:
+        base_url: API root.
+        endpoints: Search path per kind.
+        page_size: Objects per call (the API maximum is usually 100).
+        limiter: Shared rate budget; one token per call (default: 1 call/s, bursts of 5).
+        timeout: Seconds per HTTP call.
+        session: `requests.Session` to reuse (one is created if None).
+    """
+
+    ENDPOINTS = {"posts": "/posts/search", "comments": "/comments/search"}
+
+    def __init__(self, base_url: str, endpoints: Optional[Dict[str, str]] = None, page_size: int = 100,
+                 limiter: Optional[RateLimiter] = None, timeout: float = 30.0, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = endpoints or self.ENDPOINTS
+        self.page_size = page_size
+        self.limiter = limiter or RateLimiter(rate=1.0, burst=5)
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.stats = {"calls": 0, "objects": 0}
+
+    def _page(self, kind: str, subreddit: str, after: int, before: int) -> List[Dict[str, Any]]:
+        params = {"subreddit": subreddit, "after": after, "before": before,
+                  "limit": self.page_size, "sort": "asc"}
+        self.limiter.acquire()
+        resp = self.session.get(self.base_url + self.endpoints[kind], params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        self.stats["calls"] += 1
+        return resp.json().get("data") or []
+
+    def iter_slice(self, kind: str, subreddits: Sequence[str], start: int, end: int) -> Iterator[Dict[str, Any]]:
+        _check_kind(kind)
+        for subreddit in subreddits:
+            cursor = start
+            boundary: Set[str] = set()   # ids already yielded at second `cursor`
+            while True:
+                # `after` is exclusive: ask from one second early and drop the ids already seen
+                page = self._page(kind, subreddit, cursor - 1, end)
+                fresh = [obj for obj in page if obj.get("id") not in boundary]
+                if not fresh:
+                    if len(page) >= self.page_size:
+                        logger.warning("r/%s: more than %d %s in second %d; the rest is skipped",
+                                       subreddit, self.page_size, kind, cursor)
+                    break
+                yield from fresh
+                self.stats["objects"] += len(fresh)
+                last = int(float(page[-1].get("created_utc") or cursor))
+                at_last = {obj.get("id") for obj in page if int(float(obj.get("created_utc") or 0)) == last}
+                boundary = boundary | at_last if last == cursor else at_last
+                cursor = last
+                if len(page) < self.page_size:
+                    break
@@ -1,10 +1,46 @@
+import heapq
 import logging
-import time
-from typing import Iterator, Dict, Any
-from ..utils.common import ts_now, is_englishish
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import count, islice
+from typing import Iterable, Iterator, Dict, Any
+from ..utils.cache import LRUCache
+from ..utils.common import is_englishish
+from ..utils.lang import LanguageFilter
+from .normalize import comment_record, normalize_comment
+from ..utils.ratelimit import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+class SeenComments:
+    """
+    Bounded, LRU-evicted set of `(comment_id, score)` pairs already stored.
+
+    A comment whose id and score are both known is skipped by the collector
+    before any doc is built. Body edits that leave the score unchanged are not
+    detected. Fill it per post with `comments_repo.warm_seen_comments`; pass it to
+    `upsert_comments` to add comments once they are written.
+    """
+
+    def __init__(self, maxsize: int = 500_000):
+        self._scores: LRUCache[int] = LRUCache(maxsize)
+        self._warmed: LRUCache[bool] = LRUCache(max(1, maxsize // 100))
+
+    def is_known(self, comment_id: str, score: int) -> bool:
+        return self._scores.get(comment_id) == score
+
+    def add(self, comment_id: str, score: int) -> None:
+        self._scores.put(comment_id, score)
+
+    def is_warmed(self, post_id: str) -> bool:
+        return post_id in self._warmed
+
+    def mark_warmed(self, post_id: str) -> None:
+        self._warmed.put(post_id, True)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
 def is_top_level_comment(c) -> bool:
     v = getattr(c, "is_root", None)       # works if your PRAW has it
     if v is not None:
@@ -15,6 +51,102 @@ def is_top_level_comment(c) -> bool:
     lid = (getattr(c, "link_id", "") or "")
     return pid.startswith("t3_") or (pid == lid)
 
+def is_more_comments(item) -> bool:
+    # MoreComments stubs carry `children`; checked on the instance dict so a lazy Comment is never fetched
+    return "children" in vars(item)
+
+def iter_comment_tree(
+    submission,
+    *,
+    budget: int = 32,
+    max_workers: int = 4,
+    limiter: RateLimiter | None = None,
+    stats: Dict[str, int] | None = None,
+) -> Iterator[Any]:
+    """
+    Yield every comment of a submission breadth-first, expanding MoreComments stubs.
+
+    Unlike `replace_more(limit=0)` + `comments.list()`, stubs are expanded instead of
+    dropped, and comments are yielded as soon as they are loaded: only the pending
+    frontier is held in memory. Shallow, large stubs are expanded first; up to
+    `max_workers` expansions run concurrently.
+
+    Args:
+        submission: PRAW Submission whose comment forest has not been `replace_more`d.
+        budget: Max stub expansions (API calls) for this submission.
+        max_workers: Concurrent stub expansions.
+        limiter: Shared rate budget; one token is drawn per expansion.
+        stats: Updated with `more_calls` and `more_left` (stubs left unexpanded).
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("more_calls", 0)
+    pending = deque(submission.comments)
+    stubs: list = []           # (depth, -count, seq, stub): shallow and large first
+    seq = count()
+    emitted = set()
+
+    def expand(more):
+        if limiter is not None:
+            limiter.acquire()
+        return more.comments()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = set()
+        while True:
+            while pending:
+                item = pending.popleft()
+                if is_more_comments(item):
+                    heapq.heappush(stubs, (getattr(item, "depth", 0) or 0, -(item.count or 0), next(seq), item))
+                    continue
+                if item.id in emitted:
+                    continue
+                emitted.add(item.id)
+                yield item
+                pending.extend(getattr(item, "replies", None) or ())
+            while stubs and len(running) < max_workers and stats["more_calls"] < budget:
+                stats["more_calls"] += 1
+                running.add(pool.submit(expand, heapq.heappop(stubs)[-1]))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    pending.extend(fut.result())
+                except Exception:
+                    logger.exception("MoreComments expansion failed for post %s", submission.id)
+    stats["more_left"] = len(stubs)
+    if stubs:
+        logger.debug("Post %s: comment budget spent, %d stubs left", submission.id, len(stubs))
+
+def prefetch_submissions(
+    reddit,
+    post_ids: Iterable[str],
+    *,
+    limiter: RateLimiter | None = None,
+    chunk_size: int = 100,
+) -> Dict[str, Any]:
+    """
+    Resolve many submissions through `reddit.info`, `chunk_size` fullnames per API call.
+
+    Returns a mapping post_id -> Submission with its metadata (subreddit, num_comments,
+    removed_by_category, ...) loaded; its comment tree is still fetched lazily.
+    Post IDs Reddit does not return (deleted, private) are missing from the result.
+    """
+    post_ids = list(post_ids)
+    found: Dict[str, Any] = {}
+    for start in range(0, len(post_ids), chunk_size):
+        chunk = post_ids[start:start + chunk_size]
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            for submission in reddit.info(fullnames=[f"t3_{pid}" for pid in chunk]):
+                found[submission.id] = submission
+        except Exception:
+            logger.exception("Prefetch failed for %d posts; they will be fetched one by one", len(chunk))
+    logger.info("Prefetched %d/%d submissions in %d calls", len(found), len(post_ids),
+                (len(post_ids) + chunk_size - 1) // chunk_size)
+    return found
+
 def fetch_comments_details(
     reddit,
     post_id: str,
@@ -26,6 +158,14 @@ def fetch_comments_details(
     skip_bots: bool = True,
     english_only: bool = True,
     debug_samples: int = 3,
+    limiter: RateLimiter | None = None,
+    seen: SeenComments | None = None,
+    submission=None,
+    lang_filter: LanguageFilter | None = None,
+    tree: bool = False,
+    more_budget: int = 32,
+    more_workers: int = 4,
+    raw: bool = False,
 ) -> Iterator[Dict[str, Any]]:
     """
     Yield comment docs for a given Reddit post.
@@ -40,6 +180,22 @@ def fetch_comments_details(
         skip_bots: Skip authors whose username contains 'bot'.
         english_only: Keep only English-like comments via is_englishish(comment.body).
         debug_samples: Number of sample bodies to log.
+        limiter: Shared rate budget; one token is drawn for the comment-tree fetch
+            (none if `submission` already has its comments loaded).
+        seen: Known `(comment_id, score)` pairs; matching comments are skipped
+            before doc construction and do not count towards `limit`. Only read here:
+            `upsert_comments` adds comments once their batch is written.
+        submission: Submission already resolved by `prefetch_submissions`; its metadata
+            is reused instead of lazily loading it again.
+        lang_filter: Filter used when english_only is set (default: the `is_englishish` heuristic).
+        tree: Walk the whole comment tree with `iter_comment_tree`, expanding "load more"
+            stubs instead of dropping them; `cap` bounds the comments scanned while streaming.
+            Overrides top_level_only.
+        more_budget: Max stub expansions (API calls) per post in tree mode.
+        more_workers: Concurrent stub expansions per post in tree mode.
+        raw: Fetch stage only: yield raw records (`normalize.comment_record`), unfiltered;
+            skip_bots, english_only and lang_filter are left to the normalize stage, and
+            `limit` counts records.
     """
     if sort == "best":
         sort = "confidence"
@@ -50,20 +206,30 @@ def fetch_comments_details(
         raise ValueError(f"Invalid sort '{sort}'. Expected one of {valid_sorts}.")
     
 
-    stats = dict(seen=0, yielded=0, skipped_removed=0, skipped_bots=0, skipped_lang=0)
+    keep_lang = lang_filter.keep if lang_filter is not None else is_englishish
+    stats = dict(seen=0, yielded=0, skipped_known=0, skipped_removed=0, skipped_bots=0, skipped_lang=0, more_calls=0)
     sample_left = debug_samples
 
-    # Fetch submission once
-    submission = reddit.submission(id=post_id)
+    # Fetch submission once. A prefetched submission only carries its metadata: the
+    # comment tree is still one API call, unless it was already loaded (PRAW `_fetched`)
+    if submission is None:
+        submission = reddit.submission(id=post_id)
+    if limiter is not None and not getattr(submission, "_fetched", False):
+        limiter.acquire()
     submission.comment_sort = sort
-    if not top_level_only:
+    if not top_level_only and not tree:
         submission.comments.replace_more(limit=0)
+    subreddit_name = submission.subreddit.display_name   # read once, reused for every doc
     logger.info("Fetching comments for post %s | subreddit=%s | sort=%s | cap=%d | limit=%d | top_level_only=%s | skip_bots=%s | english_only=%s | debug_samples=%d",
-            post_id, submission.subreddit.display_name, sort, cap, limit, top_level_only, skip_bots, english_only, debug_samples
+            post_id, subreddit_name, sort, cap, limit, top_level_only, skip_bots, english_only, debug_samples
     )
     # Build the iterable of comments
-    if top_level_only:
-        pool = submission.comments[:cap]
+    if tree:
+        pool = islice(iter_comment_tree(submission, budget=more_budget, max_workers=more_workers,
+                                        limiter=limiter, stats=stats), cap)
+    elif top_level_only:
+        # the top-level forest may end with a "load more" stub
+        pool = [c for c in submission.comments[:cap] if not is_more_comments(c)]
     else:
         all_comments = submission.comments.list()
         pool = all_comments[:cap] if cap is not None else all_comments
@@ -75,56 +241,32 @@ def fetch_comments_details(
         stats["seen"] += 1
         
         try:
-            # removed / deleted
-            if  comment.author is None:
-                stats["skipped_removed"] += 1
-                continue
-            if str(comment.author).lower() in ["[deleted]", "[removed]"] or comment.body in ["[deleted]", "[removed]"]:
-                stats["skipped_removed"] += 1
+            # already stored with the same score
+            if seen is not None and seen.is_known(comment.id, int(getattr(comment, "score", 0))):
+                stats["skipped_known"] += 1
                 continue
 
-            # bot filter
-            author_str = str(comment.author)
-            low = author_str.lower()
-            if skip_bots and ("bot" in low or low == "automoderator"):
-                stats["skipped_bots"] += 1
-                continue
-
-            # language filter
-            body = getattr(comment, "body", "") or ""
-            if english_only and not is_englishish(body):
-                stats["skipped_lang"] += 1
-                continue
+            rec = comment_record(comment, post_id, subreddit_name, sort, is_top_level_comment(comment))
+            if raw:
+                doc = rec
+            else:
+                # removed / deleted, bots, language; then the doc
+                doc = normalize_comment(rec, stats, skip_bots=skip_bots, english_only=english_only,
+                                        keep_lang=keep_lang)
+                if doc is None:
+                    continue
 
-            doc = {
-                "_id": comment.id,
-                "comment_id": comment.id,
-                "post_id": post_id,
-                "subreddit": submission.subreddit.display_name,
-                "author": author_str,
-                "body": body,
-                "score": int(getattr(comment, "score", 0)),
-                "is_top_level": is_top_level_comment(comment),
-                "permalink": f"https://reddit.com{comment.permalink}",
-                "created_utc": int(getattr(comment, "created_utc", 0)),
-                "parent_id": getattr(comment, "parent_id", None),
-                "ingested_at": ts_now(),  # ingestion timestamp
-                "sort": sort,
-            }
-
-            if sample_left > 0:
-                sample_left -= 1
-                logger.debug("Sample comment: %s", body[:200].replace("\n", " "))
+                if sample_left > 0:
+                    sample_left -= 1
+                    logger.debug("Sample comment: %s", doc["body"][:200].replace("\n", " "))
 
             yield doc
             stats["yielded"] += 1
-            
-            if stats["seen"] % 50 == 0:
-                    time.sleep(0.2)
         except Exception as e:
             logger.exception("Error processing comment in post %s : %s", post_id, e)
 
-    logger.info("Finished post %s (r/%s) | seen=%d yielded=%d skipped(removed=%d, bots=%d, lang=%d)",
-            post_id, submission.subreddit.display_name,
+    logger.info("Finished post %s (r/%s) | seen=%d yielded=%d skipped(known=%d, removed=%d, bots=%d, lang=%d) more_calls=%d",
+            post_id, subreddit_name,
             stats["seen"], stats["yielded"],
-            stats["skipped_removed"], stats["skipped_bots"], stats["skipped_lang"])
+            stats["skipped_known"], stats["skipped_removed"], stats["skipped_bots"], stats["skipped_lang"],
+            stats["more_calls"])
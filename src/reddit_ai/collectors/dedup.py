@@ -0,0 +1,80 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+from ..utils.minhash import NUM_PERM, band_keys, pack, shingles, signature, similarity
+
+logger = logging.getLogger(__name__)
+
+
+class NearDuplicates:
+    """
+    In-memory LSH index clustering near-identical posts (crossposts, reposted announcements).
+
+    `assign` computes the MinHash signature of a post's title + selftext and looks
+    it up in `bands` LSH buckets of `NUM_PERM // bands` rows. A candidate whose
+    estimated Jaccard similarity reaches `threshold` gives its `cluster_id`;
+    otherwise the post starts its own cluster (`cluster_id` = its `_id`). The doc
+    gets `cluster_id`, `minhash` (packed signature) and `lsh` (bucket keys) so the
+    index can be rebuilt from Mongo with `posts_repo.warm_near_duplicates`.
+    Thread-safe: one instance can be shared by concurrent subreddit fetches.
+
+    Args:
+        threshold: Minimal estimated Jaccard similarity to join a cluster.
+        bands: LSH bands; 8 bands of 8 rows find pairs above ~0.77 similarity.
+        min_shingles: Posts with fewer word 3-grams (e.g. a bare "Help?") are not clustered.
+    """
+
+    def __init__(self, threshold: float = 0.8, bands: int = 8, min_shingles: int = 5):
+        self.threshold = threshold
+        self.bands = bands
+        self.min_shingles = min_shingles
+        self._buckets: Dict[int, List[str]] = {}
+        self._sigs: Dict[str, List[int]] = {}
+        self._clusters: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"seen": 0, "duplicates": 0, "too_short": 0}
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    def add(self, post_id: str, sig: Sequence[int], cluster_id: str, keys: Optional[Sequence[int]] = None) -> None:
+        """Index a post already clustered (e.g. loaded from Mongo)."""
+        with self._lock:
+            self._add(post_id, list(sig), cluster_id, keys or band_keys(sig, self.bands))
+
+    def _add(self, post_id: str, sig: List[int], cluster_id: str, keys: Sequence[int]) -> None:
+        if post_id in self._sigs:
+            return
+        self._sigs[post_id] = sig
+        self._clusters[post_id] = cluster_id
+        for key in keys:
+            self._buckets.setdefault(key, []).append(post_id)
+
+    def assign(self, doc: Dict[str, Any]) -> Optional[str]:
+        """Set `cluster_id`, `minhash` and `lsh` on a post doc; returns the cluster id (None if too short)."""
+        items = shingles(f"{doc.get('title') or ''}\n{doc.get('selftext') or ''}")
+        with self._lock:
+            self.stats["seen"] += 1
+        if len(items) < self.min_shingles:
+            with self._lock:
+                self.stats["too_short"] += 1
+            return None
+        sig = signature(items, NUM_PERM)
+        keys = band_keys(sig, self.bands)
+        post_id = doc["_id"]
+        with self._lock:
+            cluster_id = self._clusters.get(post_id)
+            if cluster_id is None:
+                best, best_sim = None, self.threshold
+                for candidate in {c for key in keys for c in self._buckets.get(key, ())}:
+                    sim = similarity(sig, self._sigs[candidate])
+                    if sim >= best_sim:
+                        best, best_sim = candidate, sim
+                cluster_id = self._clusters[best] if best is not None else post_id
+                if best is not None:
+                    self.stats["duplicates"] += 1
+                self._add(post_id, sig, cluster_id, keys)
+        doc["cluster_id"] = cluster_id
+        doc["minhash"] = pack(sig)
+        doc["lsh"] = keys
+        return cluster_id
@@ -0,0 +1,261 @@
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from ..utils.common import ts_now, is_englishish
+from ..utils.concurrency import process_chunks
+from ..utils.lang import LanguageFilter
+
+logger = logging.getLogger(__name__)
+
+# Collection is split in two stages: the fetch stage reads PRAW objects into raw
+# records (plain picklable dicts, no filtering beyond what drives pagination), and
+# the normalize stage filters them and builds the stored docs. The second stage
+# runs inline or, through `normalize_stream`, on a process pool.
+
+Record = Dict[str, Any]
+Doc = Dict[str, Any]
+
+_DELETED = ("[deleted]", "[removed]")
+
+
+def post_record(sub, listing: str, time_filter: str) -> Record:
+    """Raw record of a PRAW Submission: its attributes read once, nothing filtered."""
+    return {
+        "id": sub.id,
+        "subreddit": str(sub.subreddit),
+        "title": sub.title or "",
+        "selftext": sub.selftext or "",
+        "author": str(sub.author) if sub.author else None,
+        "removed": getattr(sub, "removed_by_category", None) is not None,
+        "over_18": bool(getattr(sub, "over_18", False)),
+        "score": int(sub.score or 0),
+        "upvote_ratio": float(sub.upvote_ratio or 0.0),
+        "num_comments": int(sub.num_comments or 0),
+        "permalink": sub.permalink or "",
+        "created_utc": int(sub.created_utc or 0),
+        "listing": listing,
+        "time_filter": time_filter if listing == "top" else None,
+    }
+
+
+def comment_record(comment, post_id: str, subreddit: str, sort: str, is_top_level: bool) -> Record:
+    """Raw record of a PRAW Comment."""
+    return {
+        "id": comment.id,
+        "post_id": post_id,
+        "subreddit": subreddit,
+        "author": str(comment.author) if comment.author is not None else None,
+        "body": getattr(comment, "body", "") or "",
+        "score": int(getattr(comment, "score", 0)),
+        "is_top_level": is_top_level,
+        "permalink": comment.permalink,
+        "created_utc": int(getattr(comment, "created_utc", 0)),
+        "parent_id": getattr(comment, "parent_id", None),
+        "sort": sort,
+    }
+
+
+def normalize_post(
+    rec: Record,
+    stats: Dict[str, int],
+    *,
+    skip_bots: bool = True,
+    include_nsfw: bool = False,
+    english_only: bool = True,
+    keep_lang: Callable[[str], bool] = is_englishish,
+    now: Optional[datetime] = None,
+) -> Optional[Doc]:
+    """Post doc of a raw record, or None (counted in `stats["skipped_*"]`) if filtered out."""
+    if rec["removed"] or rec["author"] is None:
+        stats["skipped_removed"] += 1
+        return None
+    author = rec["author"]
+    if skip_bots and "bot" in author.lower():
+        stats["skipped_bots"] += 1
+        return None
+    if not include_nsfw and rec["over_18"]:
+        stats["skipped_nsfw"] += 1
+        return None
+    if english_only and not keep_lang(rec["title"] + " " + rec["selftext"]):
+        stats["skipped_lang"] += 1
+        return None
+    return {
+        "_id": rec["id"],                          # for idempotent upserts
+        "post_id": rec["id"],                      # optional alias
+        "subreddit": rec["subreddit"],
+        "title": rec["title"],
+        "selftext": rec["selftext"],
+        "author": author,
+        "score": rec["score"],
+        "upvote_ratio": rec["upvote_ratio"],
+        "num_comments": rec["num_comments"],
+        "permalink": f"https://reddit.com{rec['permalink']}" if rec["permalink"] else "",
+        "created_utc": rec["created_utc"],
+        "ingested_at": now or ts_now(),
+        "listing": rec["listing"],
+        "time_filter": rec["time_filter"],
+    }
+
+
+def normalize_comment(
+    rec: Record,
+    stats: Dict[str, int],
+    *,
+    skip_bots: bool = True,
+    english_only: bool = True,
+    keep_lang: Callable[[str], bool] = is_englishish,
+    now: Optional[datetime] = None,
+) -> Optional[Doc]:
+    """Comment doc of a raw record, or None (counted in `stats["skipped_*"]`) if filtered out."""
+    author, body = rec["author"], rec["body"]
+    if author is None or author.lower() in _DELETED or body in _DELETED:
+        stats["skipped_removed"] += 1
+        return None
+    low = author.lower()
+    if skip_bots and ("bot" in low or low == "automoderator"):
+        stats["skipped_bots"] += 1
+        return None
+    if english_only and not keep_lang(body):
+        stats["skipped_lang"] += 1
+        return None
+    return {
+        "_id": rec["id"],
+        "comment_id": rec["id"],
+        "post_id": rec["post_id"],
+        "subreddit": rec["subreddit"],
+        "author": author,
+        "body": body,
+        "score": rec["score"],
+        "is_top_level": rec["is_top_level"],
+        "permalink": f"https://reddit.com{rec['permalink']}",
+        "created_utc": rec["created_utc"],
+        "parent_id": rec["parent_id"],
+        "ingested_at": now or ts_now(),  # ingestion timestamp
+        "sort": rec["sort"],
+    }
+
+
+class PostNormalizer:
+    """
+    Chunk transform of the normalize stage for posts: raw records -> (docs, skip counts).
+
+    Picklable, so it can run in worker processes. Heavier enrichment plugs in by
+    subclassing and post-processing the docs of `__call__`.
+
+    Args:
+        skip_bots: Skip authors whose username contains 'bot'.
+        include_nsfw: Keep NSFW posts.
+        english_only: Keep English-like posts only.
+        lang_filter: Filter used when english_only is set (default: `is_englishish`).
+    """
+
+    STATS = ("skipped_removed", "skipped_bots", "skipped_nsfw", "skipped_lang")
+
+    def __init__(self, skip_bots: bool = True, include_nsfw: bool = False, english_only: bool = True,
+                 lang_filter: LanguageFilter | None = None):
+        self.skip_bots = skip_bots
+        self.include_nsfw = include_nsfw
+        self.english_only = english_only
+        self.lang_filter = lang_filter
+
+    def __call__(self, records: List[Record]) -> Tuple[List[Doc], Dict[str, int]]:
+        keep_lang = self.lang_filter.keep if self.lang_filter is not None else is_englishish
+        stats = dict.fromkeys(self.STATS, 0)
+        now = ts_now()   # one ingestion time per chunk
+        docs = []
+        for rec in records:
+            try:
+                doc = normalize_post(rec, stats, skip_bots=self.skip_bots, include_nsfw=self.include_nsfw,
+                                     english_only=self.english_only, keep_lang=keep_lang, now=now)
+            except Exception:
+                logger.exception("Failed to normalize submission id=%s", rec.get("id", "?"))
+                continue
+            if doc is not None:
+                docs.append(doc)
+        return docs, stats
+
+
+class CommentNormalizer:
+    """
+    Chunk transform of the normalize stage for comments: raw records -> (docs, skip counts).
+
+    Args:
+        skip_bots: Skip authors whose username contains 'bot' (and AutoModerator).
+        english_only: Keep English-like comments only.
+        lang_filter: Filter used when english_only is set (default: `is_englishish`).
+    """
+
+    STATS = ("skipped_removed", "skipped_bots", "skipped_lang")
+
+    def __init__(self, skip_bots: bool = True, english_only: bool = True, lang_filter: LanguageFilter | None = None):
+        self.skip_bots = skip_bots
+        self.english_only = english_only
+        self.lang_filter = lang_filter
+
+    def __call__(self, records: List[Record]) -> Tuple[List[Doc], Dict[str, int]]:
+        keep_lang = self.lang_filter.keep if self.lang_filter is not None else is_englishish
+        stats = dict.fromkeys(self.STATS, 0)
+        now = ts_now()
+        docs = []
+        for rec in records:
+            try:
+                doc = normalize_comment(rec, stats, skip_bots=self.skip_bots, english_only=self.english_only,
+                                        keep_lang=keep_lang, now=now)
+            except Exception:
+                logger.exception("Error processing comment %s of post %s", rec.get("id", "?"), rec.get("post_id"))
+                continue
+            if doc is not None:
+                docs.append(doc)
+        return docs, stats
+
+
+def normalize_stream(
+    records: Iterable[Record],
+    normalizer: Callable[[List[Record]], Tuple[List[Doc], Dict[str, int]]],
+    *,
+    workers: int = 0,
+    chunk_size: int = 200,
+    ordered: bool = False,
+    max_pending: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Doc]:
+    """
+    Run the normalize stage over a stream of raw records, yielding docs.
+
+    With `workers > 0`, chunks of `chunk_size` records go to a process pool (see
+    `utils.concurrency.process_chunks`): at most `max_pending` chunks are in flight,
+    so a slow stage holds back the fetchers through their bounded queues. With
+    `ordered=False`, chunks come out as soon as they are done. `workers=0` runs the
+    same normalizer on the calling thread.
+
+    Args:
+        records: Raw records from the fetch stage (`raw=True` fetchers).
+        normalizer: Picklable chunk transform (`PostNormalizer`, `CommentNormalizer` or a subclass).
+        workers: Worker processes (0 = inline).
+        chunk_size: Records per chunk.
+        ordered: Keep the input order of the chunks.
+        max_pending: Chunks in flight (default: 2 per worker).
+        stats: Updated with the summed skip counts and `normalized` (docs out).
+    """
+    stats = stats if stats is not None else {}
+    if workers > 0:
+        chunks = process_chunks(normalizer, records, workers=workers, chunk_size=chunk_size,
+                                ordered=ordered, max_pending=max_pending)
+    else:
+        chunks = (normalizer(chunk) for chunk in _chunked(records, chunk_size))
+    for docs, chunk_stats in chunks:
+        for key, n in chunk_stats.items():
+            stats[key] = stats.get(key, 0) + n
+        stats["normalized"] = stats.get("normalized", 0) + len(docs)
+        yield from docs
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
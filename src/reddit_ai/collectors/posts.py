@@ -1,10 +1,18 @@
-import time
 import logging
 from datetime import timedelta
+from functools import partial
 from ..utils.common import ts_now, is_englishish
+from ..utils.lang import LanguageFilter
+from .dedup import NearDuplicates
+from .normalize import PostNormalizer, normalize_post, normalize_stream, post_record
+from ..utils.concurrency import merge_generators
+from ..utils.ratelimit import RateLimiter, paced
 
 logger = logging.getLogger(__name__)
 
+# listings served newest-first: once past the window, nothing later can be in it
+TIME_ORDERED_LISTINGS = {"new"}
+
 def fetch_posts_details(
     reddit,
     subreddit: list[str] ,
@@ -16,6 +24,13 @@ def fetch_posts_details(
     skip_bots: bool = True,
     english_only: bool = True,
     debug_samples: int = 3,
+    limiter: RateLimiter | None = None,
+    since=None,
+    max_old_streak: int = 5,
+    on_stats=None,
+    lang_filter: LanguageFilter | None = None,
+    dedup: NearDuplicates | None = None,
+    raw: bool = False,
 ):
     """
     Fetch posts for a given Reddit subreddit.
@@ -31,12 +46,33 @@ def fetch_posts_details(
         skip_bots (bool): Whether to skip posts made by bots.
         english_only (bool): Whether to include only English-like posts.
         debug_samples (int): Number of sample posts to log for debugging.
+        limiter (RateLimiter | None): Shared rate budget; one token is drawn per listing page
+            (one synced from `reddit` is created for this call if None).
+        since (HighWaterMarks | None): Per-subreddit cursor for listing="new"; paging stops
+            at the newest post already ingested, and every subreddit whose listing was read
+            to the end is reported with `since.finish` (the cursor itself moves with the
+            written docs, see `upsert_posts(..., on_written=since.observe)`).
+        max_old_streak (int): On time-ordered listings, stop paging after this many
+            consecutive posts older than the window.
+        on_stats (callable | None): Called as `on_stats(subreddit, stats)` when a subreddit
+            is done; `stats["stop_reason"]` is one of limit, exhausted, window, high_water_mark.
+        lang_filter (LanguageFilter | None): Filter used when english_only is set
+            (default: the `is_englishish` heuristic).
+        dedup (NearDuplicates | None): Shared LSH index; each yielded doc gets the
+            `cluster_id` of the near-identical posts already seen (crossposts, reposts).
+        raw (bool): Fetch stage only: yield the raw records (`normalize.post_record`) of
+            the posts in the window, unfiltered; skip_bots, include_nsfw, english_only,
+            lang_filter and dedup are then left to the normalize stage.
     """   
+    keep_lang = lang_filter.keep if lang_filter is not None else is_englishish
     # 1) validate listing
     valid_listings = {"new", "hot", "top"}
     if listing not in valid_listings:
         logger.error("Failed to access subreddits r/%s | Invalid listing '%s'. Expected one of %s.", subreddit, listing, sorted(valid_listings))
         raise ValueError(f"Invalid listing '{listing}'. Expected one of {sorted(valid_listings)}.")
+    if limiter is None:
+        # never page unpaced: a run-wide limiter should be shared (`fetch_posts_concurrent`)
+        limiter = RateLimiter.from_reddit(reddit)
     for subs in subreddit:
         sr = reddit.subreddit(subs)
         if listing == "new":
@@ -45,6 +81,7 @@ def fetch_posts_details(
             gen = sr.hot(limit=limit)
         else:
             gen = sr.top(time_filter=time_filter, limit=limit)
+        gen = paced(gen, limiter)
 
         cutoff_ts = (ts_now() - timedelta(days=window_days)).timestamp()
         logger.info(
@@ -62,66 +99,128 @@ def fetch_posts_details(
             skipped_nsfw=0, skipped_lang=0
         )
         sample_left = debug_samples
+        mark = since.get(subs) if since is not None and listing == "new" else None
+        time_ordered = listing in TIME_ORDERED_LISTINGS
+        old_streak = 0
+        stop_reason = None
 
         for sub in gen:
             stats["seen"] += 1
+            # "new" is time-ordered: everything past the mark is already stored
+            if mark and (sub.id == mark["post_id"] or sub.created_utc < mark["created_utc"]):
+                stop_reason = "high_water_mark"
+                break
             try:
                 # 3) filters
                 if sub.created_utc  < cutoff_ts:
                     stats["skipped_old"] += 1
+                    old_streak += 1
+                    if time_ordered and old_streak >= max_old_streak:
+                        stop_reason = "window"
+                        break
                     continue
-                if getattr(sub, "removed_by_category", None) is not None or sub.author is None:
-                    stats["skipped_removed"] += 1
-                    continue
-                author_str = str(sub.author) if sub.author else None
-                if skip_bots and author_str and "bot" in author_str.lower():
-                    stats["skipped_bots"] += 1
-                    continue
-                if not include_nsfw and getattr(sub, "over_18", False):
-                    stats["skipped_nsfw"] += 1
-                    continue
-                text_for_lang = (sub.title or "") + " " + (sub.selftext or "")
-                if english_only and not is_englishish(text_for_lang):
-                    stats["skipped_lang"] += 1
-                    continue
+                old_streak = 0
+                rec = post_record(sub, listing, time_filter)
+                if raw:
+                    doc = rec
+                else:
+                    # 4) filter and normalize one document
+                    doc = normalize_post(rec, stats, skip_bots=skip_bots, include_nsfw=include_nsfw,
+                                         english_only=english_only, keep_lang=keep_lang)
+                    if doc is None:
+                        continue
+
+                    if dedup is not None:
+                        dedup.assign(doc)
 
-                # 4) normalize one document
-                doc = {
-                    "_id": sub.id,                             # for idempotent upserts
-                    "post_id": sub.id,                         # optional alias
-                    "subreddit": str(sub.subreddit),
-                    "title": sub.title or "",
-                    "selftext": sub.selftext or "",
-                    "author": author_str,
-                    "score": int(sub.score or 0),
-                    "upvote_ratio": float(sub.upvote_ratio or 0.0),
-                    "num_comments": int(sub.num_comments or 0),
-                    "permalink": f"https://reddit.com{sub.permalink}" if sub.permalink else "",
-                    "created_utc": int(sub.created_utc or 0),
-                    "ingested_at": ts_now(),
-                    "listing": listing,
-                    "time_filter": time_filter if listing == "top" else None,
-                }
-
-                if sample_left > 0:
-                    logger.debug("Sample post: %s", doc["title"])
-                    sample_left -= 1
+                    if sample_left > 0:
+                        logger.debug("Sample post: %s", doc["title"])
+                        sample_left -= 1
                 # 5) stream out (generator)
                 yield doc
                 stats["yielded"] += 1
 
-                # 6) gentle pacing (optional; PRAW self-throttles anyway)
-                if stats["seen"] % 50 == 0:
-                    time.sleep(0.2)
-
             except Exception:
                 # full traceback helps you debug rare payload issues
                 logger.exception("Failed to normalize submission id=%s", getattr(sub, "id", "?"))
 
+        if since is not None and listing == "new":
+            since.finish(subs)
+
+        stats["stop_reason"] = stop_reason or ("limit" if stats["seen"] >= limit else "exhausted")
         logger.info(
-            "Finished r/%s | seen=%d yielded=%d skipped(old=%d, removed=%d, bots=%d, nsfw=%d, lang=%d)",
+            "Finished r/%s | seen=%d yielded=%d skipped(old=%d, removed=%d, bots=%d, nsfw=%d, lang=%d) stop=%s",
             subs,
             stats["seen"], stats["yielded"],
             stats["skipped_old"], stats["skipped_removed"], stats["skipped_bots"],
-            stats["skipped_nsfw"], stats["skipped_lang"]
-        )
\ No newline at end of file
+            stats["skipped_nsfw"], stats["skipped_lang"], stats["stop_reason"]
+        )
+        if on_stats is not None:
+            on_stats(subs, stats)
+
+
+def fetch_posts_concurrent(
+    reddit,
+    subreddit: list[str],
+    limit: int | dict[str, int] = 100,
+    *,
+    max_workers: int = 4,
+    limiter: RateLimiter | None = None,
+    queue_size: int = 1000,
+    transform_workers: int = 0,
+    chunk_size: int = 200,
+    ordered: bool = False,
+    **kwargs,
+):
+    """
+    Fetch several subreddits' listings at once and merge their docs into one stream.
+
+    Each subreddit runs `fetch_posts_details` on a bounded thread pool; all workers
+    draw from the same `limiter`, so the run stays within one rate-limit budget.
+    The merged generator can be passed straight to `upsert_posts`.
+
+    With `transform_workers > 0` the fetch threads only read raw records, and
+    filtering/normalization runs on that many processes (`normalize.normalize_stream`),
+    so CPU-heavy doc building does not hold the GIL the fetchers need. Near-duplicate
+    assignment (`dedup`) stays in this process, on the normalized docs.
+
+    Args:
+        reddit: Authenticated PRAW Reddit instance.
+        subreddit (list[str]): Subreddits to fetch.
+        limit (int | dict[str, int]): Per-subreddit limit, or a mapping subreddit -> limit.
+        max_workers (int): Number of subreddits fetched concurrently.
+        limiter (RateLimiter | None): Shared rate budget (one synced from `reddit` is created if None).
+        queue_size (int): Max docs buffered between the workers and the consumer.
+        transform_workers (int): Processes of the normalize stage (0 = normalize in the fetch threads).
+        chunk_size (int): Records per normalize task.
+        ordered (bool): Keep the fetch order through the normalize stage.
+        **kwargs: Forwarded to `fetch_posts_details` (listing, window_days, ...).
+    """
+    if limiter is None:
+        limiter = RateLimiter.from_reddit(reddit)
+    limits = limit if isinstance(limit, dict) else {subs: limit for subs in subreddit}
+    logger.info("Concurrent fetch of %d subreddits | workers=%d | transform workers=%d",
+                len(subreddit), max_workers, transform_workers)
+    if transform_workers <= 0:
+        factories = [
+            partial(fetch_posts_details, reddit, [subs], limit=limits[subs], limiter=limiter, **kwargs)
+            for subs in subreddit
+        ]
+        yield from merge_generators(factories, max_workers=max_workers, maxsize=queue_size)
+        return
+
+    normalizer = PostNormalizer(**{k: kwargs.pop(k) for k in ("skip_bots", "include_nsfw", "english_only", "lang_filter")
+                                   if k in kwargs})
+    dedup = kwargs.pop("dedup", None)
+    factories = [
+        partial(fetch_posts_details, reddit, [subs], limit=limits[subs], limiter=limiter, raw=True, **kwargs)
+        for subs in subreddit
+    ]
+    records = merge_generators(factories, max_workers=max_workers, maxsize=queue_size)
+    stats: dict = {}
+    for doc in normalize_stream(records, normalizer, workers=transform_workers, chunk_size=chunk_size,
+                                ordered=ordered, stats=stats):
+        if dedup is not None:
+            dedup.assign(doc)
+        yield doc
+    logger.info("Normalize stage done | %s", stats)
@@ -6,8 +6,23 @@ MONGO_DB  = os.getenv("MONGO_DB")
 HOST = os.getenv("MONGO_HOST")
 USER = os.getenv("MONGO_USER")
 PW   = os.getenv("MONGO_PASS")
+# full connection string, overrides the mongodb+srv://MONGO_HOST default (e.g. a local mongod)
+MONGO_URI = os.getenv("MONGO_URI")
+# client tuning (db/mongo.py): connections per server, wire compressors, default write profile
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", "100"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+MONGO_WRITE_PROFILE = os.getenv("MONGO_WRITE_PROFILE", "durable")
 REDDIT = {
     "client_id": os.getenv("REDDIT_CLIENT_ID"),
     "client_secret": os.getenv("REDDIT_CLIENT_SECRET"),
     "user_agent": os.getenv("REDDIT_USER_AGENT", "RedditAITrend by u/unknown"),
-}
\ No newline at end of file
+}
+
+# Pushshift-compatible archive API of the historical backfill (collectors/archive.py)
+ARCHIVE_URL = os.getenv("ARCHIVE_URL", "https://arctic-shift.photon-reddit.com/api")
+
+# local full-text index (search/index.py)
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "data/search.sqlite")
+
+# vector store of the embedding pipeline (embeddings/)
+EMBEDDINGS_DIR = os.getenv("EMBEDDINGS_DIR", "data/embeddings")
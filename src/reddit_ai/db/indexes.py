@@ -1,4 +1,19 @@
 from pymongo import ASCENDING, DESCENDING
+from ..analytics.rollups import ROLLUP_COLLECTION
+from .repositories.comments_repo import COMPACT_FIELDS, comments_schema
+from .repositories.snapshots_repo import SNAPSHOT_COLLECTION
+
+# comment index keys, by long field name (renamed for the compact layout)
+COMMENT_INDEXES = (
+    [("post_id", ASCENDING), ("created_utc", DESCENDING)],
+    [("ingested_at", ASCENDING)],
+)
+
+
+def comment_index_keys(schema: str):
+    if schema == "compact":
+        return [[(COMPACT_FIELDS.get(f, f), d) for f, d in keys] for keys in COMMENT_INDEXES]
+    return [list(keys) for keys in COMMENT_INDEXES]
 
 def create_indexes(db):
     posts = db.posts
@@ -6,4 +21,23 @@ def create_indexes(db):
 
     # --- indexes (idempotent) ---
     posts.create_index([("subreddit", ASCENDING), ("created_utc", DESCENDING)])
-    comments.create_index([("post_id", ASCENDING), ("created_utc", DESCENDING)])
\ No newline at end of file
+    # comments by post, and (term rollups) by ingestion time; keys follow the stored layout
+    for keys in comment_index_keys(comments_schema(db)):
+        comments.create_index(keys)
+    # comment targets (posts_repo.select_targets): equality on subreddit/seen_in, then the ranking order
+    # the pipeline's $sort reads in index order
+    posts.create_index(
+        [("subreddit", ASCENDING), ("seen_in", ASCENDING),
+         ("score_max", DESCENDING), ("num_comments_max", DESCENDING), ("post_id", ASCENDING)],
+        name="targets_by_listing",
+    )
+    # near-duplicate clusters (collectors/dedup.py): deduplicated counts, one_per_cluster
+    posts.create_index([("cluster_id", ASCENDING)])
+
+    # snapshot buckets (snapshots_repo.post_histories): one entry per post per day
+    db[SNAPSHOT_COLLECTION].create_index([("post_id", ASCENDING), ("day", ASCENDING)])
+
+    # term rollups (analytics/rollups.update_rollups): docs ingested since the checkpoint,
+    # then the hourly/daily buckets of a window
+    posts.create_index([("ingested_at", ASCENDING)])
+    db[ROLLUP_COLLECTION].create_index([("grain", ASCENDING), ("subreddit", ASCENDING), ("start", ASCENDING)])
@@ -1,29 +1,119 @@
+import importlib.util
 import logging
-from ..config import USER, MONGO_DB,PW, HOST
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from ..config import USER, MONGO_DB, PW, HOST, MONGO_URI, MONGO_POOL_SIZE, MONGO_COMPRESSORS, MONGO_WRITE_PROFILE
 from pymongo import MongoClient
-from functools import lru_cache
+from pymongo.write_concern import WriteConcern
 from .indexes import create_indexes
 logger = logging.getLogger(__name__)
-@lru_cache()
-def get_client():
-    logger.debug("Creating new MongoDB client. (singleton)")
-    client = MongoClient(
-        f"mongodb+srv://{HOST}/",
-        username=USER,
-        password=PW,
-        retryWrites=True,
-        w="majority",
-    )
+
+# write-concern profiles for get_db(profile=...)
+#   durable: acknowledged by a majority of the replica set (default)
+#   ingest:  acknowledged by the primary only; for idempotent bulk upserts that can be re-run
+WRITE_PROFILES = {
+    "durable": {"w": "majority"},
+    "ingest": {"w": 1},
+}
+
+# wire compressor -> module it needs (zlib is in the standard library)
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+# one client per (process, options): a MongoClient must not cross a fork
+_clients: Dict[Tuple, MongoClient] = {}
+_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def _after_fork() -> None:
+    global _pid, _lock
+    # the parent's sockets and monitor threads are unusable here; drop them without closing
+    _clients.clear()
+    _pid = os.getpid()
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def available_compressors(names: str) -> str:
+    """Keep the compressors of `names` ("zstd,snappy,zlib") whose module is installed, in order."""
+    keep = []
+    for name in (n.strip() for n in names.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            keep.append(name)
+        elif name:
+            logger.debug("Mongo wire compressor %s unavailable (module %s missing)", name, module)
+    return ",".join(keep)
+
+
+def _uri() -> str:
+    return MONGO_URI or f"mongodb+srv://{HOST}/"
+
+
+def get_client(max_pool_size: Optional[int] = None, compressors: Optional[str] = None) -> MongoClient:
+    """
+    MongoClient of the current process, created on first use.
+
+    The client connects lazily: no server round-trip happens until the first
+    operation (see `check_connection`). After a fork (process pools), the child gets
+    a fresh client instead of the parent's sockets.
+
+    Args:
+        max_pool_size: Connections per server (`MONGO_POOL_SIZE` if None); size it to
+            the number of concurrent writer threads of the process.
+        compressors: Wire compressors by preference ("zstd,snappy,zlib", `MONGO_COMPRESSORS`
+            if None); those whose module is not installed are skipped.
+
+    Returns:
+        The cached client for these options.
+    """
+    global _pid
+    max_pool_size = max_pool_size or MONGO_POOL_SIZE
+    compressors = available_compressors(MONGO_COMPRESSORS if compressors is None else compressors)
+    key = (max_pool_size, compressors)
+    with _lock:
+        if _pid != os.getpid():   # forked without register_at_fork (or by a non-Python runtime)
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            logger.debug("Creating MongoDB client (pid=%d, pool=%d, compressors=%s)",
+                         _pid, max_pool_size, compressors or "none")
+            options = {"maxPoolSize": max_pool_size, "retryWrites": True, "connect": False}
+            if compressors:
+                options["compressors"] = compressors
+            if USER:
+                options.update(username=USER, password=PW)
+            client = _clients[key] = MongoClient(_uri(), **options)
+    return client
+
+
+def check_connection(client: Optional[MongoClient] = None) -> None:
+    """Round-trip to the server (`ping`); raises if it is unreachable."""
+    client = client or get_client()
     try:
-        client.admin.command('ping')
+        client.admin.command("ping")
         logger.debug("MongoDB connection successful.")
     except Exception as e:
         logger.error(f"MongoDB connection failed: {e}")
         raise
-    return client
-def get_db():
-    client = get_client()
-    db = client[MONGO_DB]
-    return db   
+
+
+def get_db(profile: Optional[str] = None, **client_options):
+    """
+    Database handle with the write concern of `profile` ('durable' | 'ingest',
+    `MONGO_WRITE_PROFILE` if None). Handles of every profile share the process client.
+    """
+    profile = profile or MONGO_WRITE_PROFILE
+    if profile not in WRITE_PROFILES:
+        raise ValueError(f"write profile must be one of {tuple(WRITE_PROFILES)}, got {profile!r}")
+    client = get_client(**client_options)
+    return client.get_database(MONGO_DB, write_concern=WriteConcern(**WRITE_PROFILES[profile]))
+
+
 def ensure_indexes(db):
-    create_indexes(db)
\ No newline at end of file
+    create_indexes(db)
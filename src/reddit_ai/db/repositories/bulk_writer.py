@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()
+
+
+def bulk_write_with_retry(coll: Collection, ops: List[Any], label: str):
+    """Unordered bulk_write, retried once after 0.5s; returns None if the batch is dropped."""
+    try:
+        return coll.bulk_write(ops, ordered=False)
+    except Exception:
+        logger.warning("%s bulk_write failed; retrying once after 0.5s (ops=%d)", label, len(ops))
+        time.sleep(0.5)
+        try:
+            return coll.bulk_write(ops, ordered=False)
+        except Exception:
+            logger.exception("retry failed; dropping batch (ops=%d)", len(ops))
+            return None
+
+
+class BulkWriter:
+    """
+    Sends batches of write ops to a collection, inline or from a background thread.
+
+    In background mode batches go onto a bounded queue drained by a flusher thread,
+    so the producer (the Reddit fetch) keeps running while Mongo writes. When the
+    queue is full, `submit` blocks: that is the backpressure on the producer.
+
+    Args:
+        coll: Target collection.
+        label: Name used in log lines ("posts", "comments", ...).
+        background: Write from a flusher thread instead of the caller's thread.
+        queue_size: Max batches waiting in the queue (background mode only).
+    """
+
+    def __init__(self, coll: Collection, label: str, background: bool = False, queue_size: int = 4):
+        self.coll = coll
+        self.label = label
+        self.background = background
+        self.stats: Dict[str, int] = {"batches": 0, "upserted": 0, "modified": 0, "matched": 0, "inserted": 0,
+                                      "dropped": 0}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = None
+        self._closed = False
+        if background:
+            self._thread = threading.Thread(target=self._run, name=f"{label}-writer", daemon=True)
+            self._thread.start()
+
+    def _write(self, ops: List[Any], on_written: Optional[Callable[[], None]] = None) -> None:
+        res = bulk_write_with_retry(self.coll, ops, self.label)
+        if res is None:
+            self.stats["dropped"] += 1
+            return
+        upserted = len(res.upserted_ids or {})
+        self.stats["batches"] += 1
+        self.stats["matched"] += res.matched_count
+        self.stats["modified"] += res.modified_count
+        self.stats["upserted"] += upserted
+        self.stats["inserted"] += res.inserted_count
+        logger.info("%s bulk_write: matched=%d modified=%d upserted=%d",
+                    self.label, res.matched_count, res.modified_count, upserted)
+        if on_written is not None:
+            try:
+                on_written()
+            except Exception:
+                logger.exception("%s post-write callback failed", self.label)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _CLOSE:
+                    return
+                self._write(*item)
+            except Exception:
+                self.stats["dropped"] += 1
+                logger.exception("%s writer failed on a batch (ops=%d)", self.label, len(item[0]))
+            finally:
+                self._queue.task_done()
+
+    def submit(self, ops: List[Any], on_written: Optional[Callable[[], None]] = None) -> None:
+        """
+        Write a batch (blocks while the background queue is full).
+
+        `on_written` is called once the batch is written (on the flusher thread in
+        background mode), never if it is dropped; at once for an empty batch.
+        """
+        if not ops:
+            if on_written is not None:
+                on_written()
+            return
+        if self._closed:
+            raise RuntimeError(f"{self.label} writer is closed")
+        if self.background:
+            self._queue.put((ops, on_written))
+        else:
+            self._write(ops, on_written)
+
+    def flush(self) -> None:
+        """Wait until every submitted batch has been written."""
+        if self.background:
+            self._queue.join()
+
+    def close(self) -> Dict[str, int]:
+        """Flush, stop the flusher thread and return the write stats."""
+        if not self._closed:
+            self._closed = True
+            if self._thread is not None:
+                self._queue.put(_CLOSE)
+                self._thread.join()
+        return self.stats
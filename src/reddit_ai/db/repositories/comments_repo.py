@@ -1,13 +1,53 @@
 import logging
-import time
-from typing import Iterable, Dict, Any, List
-from pymongo import UpdateOne
+from datetime import datetime, timezone
+from functools import partial
+from typing import Iterable, Dict, Any, Iterator, List, Optional, Tuple
+from pymongo import ReplaceOne, UpdateOne
 from pymongo.collection import Collection
 from ...utils.common import ts_now
+from .bulk_writer import BulkWriter, bulk_write_with_retry
+from .fingerprints import DeltaFilter, FP_FIELD
+from .state_repo import STATE_COLLECTION
 
 logger = logging.getLogger(__name__)
 
-def _build_update_comment(doc: Dict[str, Any]) -> UpdateOne:
+# fields whose change makes a re-collected comment worth a full rewrite
+COMMENT_FP_FIELDS = ("author", "body", "score")
+
+# storage layouts of `db.comments` (see `comments_schema`)
+SCHEMAS = ("full", "compact")
+SCHEMA_STATE_ID = "schema:comments"
+
+# compact layout: long name -> stored name. `comment_id` (= `_id`), `permalink` and
+# `is_top_level` are not stored but derived by `expand_comment`; datetimes are epoch seconds.
+COMPACT_FIELDS = {
+    "post_id": "p",
+    "subreddit": "s",
+    "author": "a",
+    "body": "b",
+    "score": "v",
+    "score_max": "m",
+    "created_utc": "t",
+    "parent_id": "r",       # bare comment id, absent for top-level comments
+    "sort": "o",
+    "ingested_at": "i",
+    "first_seen_at": "f",
+    "last_seen_at": "l",
+}
+_LONG_FIELDS = {short: name for name, short in COMPACT_FIELDS.items()}
+TIME_FIELDS = ("ingested_at", "first_seen_at", "last_seen_at")
+SORT_CODES = {"new": "n", "top": "t", "hot": "h", "confidence": "c", "old": "d",
+              "controversial": "x", "qa": "q"}
+_SORT_NAMES = {code: name for name, code in SORT_CODES.items()}
+# stored fields needed to rebuild a derived one
+_DERIVED_FROM = {
+    "comment_id": ("_id",),
+    "permalink": ("subreddit", "post_id"),
+    "is_top_level": ("post_id", "parent_id"),
+    "parent_id": ("post_id", "parent_id"),
+}
+
+def _build_update_comment(doc: Dict[str, Any], fp: str | None = None) -> UpdateOne:
     """
     Expects a doc shaped like the comments collector yields:
       _id (= comment_id), comment_id, post_id, subreddit, author, body,
@@ -42,46 +82,334 @@ def _build_update_comment(doc: Dict[str, Any]) -> UpdateOne:
             "score_max": int(doc.get("score", 0)),
         },
     }
+    if fp:
+        update["$set"][FP_FIELD] = fp
     return UpdateOne({"_id": _id}, update, upsert=True)
 
-def upsert_comments(db, docs_iter: Iterable[Dict[str, Any]], batch_size: int = 500) -> Dict[str, int]:
-    coll: Collection = db.comments
-    ops: List[UpdateOne] = []
-    stats = {"seen": 0, "batches": 0, "upserted": 0, "modified": 0, "matched": 0}
+def _build_touch_comment(doc: Dict[str, Any]) -> UpdateOne:
+    """Minimal update for a comment whose fingerprint did not change."""
+    update = {
+        "$set": {"last_seen_at": ts_now(), "sort": doc.get("sort")},
+        "$max": {"score_max": int(doc.get("score", 0))},
+    }
+    return UpdateOne({"_id": doc.get("_id")}, update)
 
-    def flush_ops():
-        nonlocal ops, stats
-        if not ops:
-            return
-        try:
-            res = coll.bulk_write(ops, ordered=False)
-        except Exception:
-            logger.warning("comments bulk_write failed; retrying once after 0.5s (ops=%d)", len(ops))
-            time.sleep(0.5)
-            try:
-                res = coll.bulk_write(ops, ordered=False)
-            except Exception:
-                logger.exception("retry failed; dropping batch (ops=%d)", len(ops))
-                ops = []
-                return
-        stats["batches"] += 1
-        stats["matched"] += res.matched_count
-        stats["modified"] += res.modified_count
-        stats["upserted"] += len(res.upserted_ids or {})
-        logger.info("comments bulk_write: matched=%d modified=%d upserted=%d",
-                    res.matched_count, res.modified_count, len(res.upserted_ids or {}))
-        ops = []
-
-    for doc in docs_iter:
-        stats["seen"] += 1
+def _epoch(value) -> Any:
+    """Datetimes as int epoch seconds (other values unchanged)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return value
+
+def _compact_parent(doc: Dict[str, Any]) -> Optional[str]:
+    parent = doc.get("parent_id")
+    if not parent or parent == f"t3_{doc.get('post_id')}":
+        return None
+    return parent[3:] if parent.startswith("t1_") else parent
+
+def _build_update_comment_compact(doc: Dict[str, Any], fp: str | None = None) -> UpdateOne:
+    """Same upsert as `_build_update_comment`, in the compact layout (`COMPACT_FIELDS`)."""
+    _id = doc.get("_id") or doc.get("comment_id")
+    if not _id:
+        raise ValueError("comment doc missing _id/comment_id")
+
+    now = _epoch(ts_now())
+    on_insert = {"p": doc.get("post_id"), "s": doc.get("subreddit"), "t": doc.get("created_utc"), "f": now}
+    parent = _compact_parent(doc)
+    if parent:
+        on_insert["r"] = parent
+    update = {
+        "$setOnInsert": on_insert,
+        "$set": {
+            "a": doc.get("author"),
+            "b": doc.get("body", ""),
+            "v": int(doc.get("score", 0)),
+            "o": SORT_CODES.get(doc.get("sort"), doc.get("sort")),
+            "i": _epoch(doc.get("ingested_at")) or now,
+            "l": now,
+        },
+        "$max": {"m": int(doc.get("score", 0))},
+    }
+    if fp:
+        update["$set"][FP_FIELD] = fp
+    return UpdateOne({"_id": _id}, update, upsert=True)
+
+def _build_touch_comment_compact(doc: Dict[str, Any]) -> UpdateOne:
+    update = {
+        "$set": {"l": _epoch(ts_now()), "o": SORT_CODES.get(doc.get("sort"), doc.get("sort"))},
+        "$max": {"m": int(doc.get("score", 0))},
+    }
+    return UpdateOne({"_id": doc.get("_id")}, update)
+
+_BUILDERS = {
+    "full": (_build_update_comment, _build_touch_comment),
+    "compact": (_build_update_comment_compact, _build_touch_comment_compact),
+}
+
+def comments_schema(db) -> str:
+    """Layout of `db.comments`: 'full' unless `migrate_comments` switched it to 'compact'."""
+    row = db[STATE_COLLECTION].find_one({"_id": SCHEMA_STATE_ID}, {"schema": 1})
+    return row["schema"] if row else "full"
+
+def expand_comment(doc: Dict[str, Any], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Read-side adapter: a stored comment (either layout) in the full shape.
+
+    Compact docs get their long field names back, aware UTC datetimes, `comment_id`,
+    `is_top_level`, `parent_id` ('t1_'/'t3_' prefixed) and a permalink rebuilt from
+    subreddit/post/comment ids (`/_/` in place of the title slug, which Reddit ignores).
+    For a projected doc, pass the requested long names as `fields`: derived fields
+    are then only rebuilt when asked for (their source fields must have been read).
+    """
+    if not any(short in doc for short in _LONG_FIELDS):
+        return doc
+    out: Dict[str, Any] = {}
+    for key, value in doc.items():
+        name = _LONG_FIELDS.get(key, key)
+        if name in TIME_FIELDS and isinstance(value, (int, float)):
+            value = datetime.fromtimestamp(value, tz=timezone.utc)
+        elif name == "sort":
+            value = _SORT_NAMES.get(value, value)
+        out[name] = value
+    wanted = set(fields) if fields is not None else None
+    _id, post_id = out.get("_id"), out.get("post_id")
+    if _id is not None and (wanted is None or "comment_id" in wanted):
+        out["comment_id"] = _id
+    if post_id is not None and (wanted is None or wanted & {"parent_id", "is_top_level"}):
+        parent = out.get("parent_id")
+        out["is_top_level"] = parent is None
+        out["parent_id"] = f"t1_{parent}" if parent else f"t3_{post_id}"
+    if (_id is not None and post_id is not None and out.get("subreddit")
+            and (wanted is None or "permalink" in wanted)):
+        out["permalink"] = f"https://reddit.com/r/{out['subreddit']}/comments/{post_id}/_/{_id}/"
+    if wanted is not None:
+        out = {k: v for k, v in out.items() if k == "_id" or k in wanted}
+    return out
+
+def compact_comment(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """A full-shape comment (stored or collected) as a compact stored doc."""
+    out: Dict[str, Any] = {}
+    for key, value in doc.items():
+        if key in ("comment_id", "permalink", "is_top_level"):
+            continue
+        if key == "parent_id":
+            value = _compact_parent(doc)
+            if value is None:
+                continue
+        elif key == "sort":
+            value = SORT_CODES.get(value, value)
+        elif key in TIME_FIELDS:
+            value = _epoch(value)
+        out[COMPACT_FIELDS.get(key, key)] = value
+    return out
+
+def comments_filter(flt: Dict[str, Any], schema: str) -> Dict[str, Any]:
+    """A filter written with long field names, for the stored `schema`."""
+    if schema == "full":
+        return flt
+    out: Dict[str, Any] = {}
+    for key, value in flt.items():
+        if key in ("$and", "$or", "$nor"):
+            out[key] = [comments_filter(f, schema) for f in value]
+            continue
+        if key in TIME_FIELDS:
+            value = ({op: _epoch(v) for op, v in value.items()} if isinstance(value, dict)
+                     else _epoch(value))
+        out[COMPACT_FIELDS.get(key, key)] = value
+    return out
+
+def _compact_expr(expr):
+    if isinstance(expr, str) and expr.startswith("$") and expr[1:] in COMPACT_FIELDS:
+        return "$" + COMPACT_FIELDS[expr[1:]]
+    if isinstance(expr, dict):
+        return {k: _compact_expr(v) for k, v in expr.items()}
+    if isinstance(expr, list):
+        return [_compact_expr(v) for v in expr]
+    return expr
+
+def find_comments(db, flt: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                  schema: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """`db.comments.find` with long field names in and out, whatever the stored layout."""
+    schema = schema or comments_schema(db)
+    if schema == "compact":
+        flt = comments_filter(flt or {}, schema)
+        fields = None
+        if projection:
+            fields = [k for k, v in projection.items() if v]
+            stored = set()
+            for name in fields:
+                stored.update(_DERIVED_FROM.get(name, (name,)))
+            projection = {COMPACT_FIELDS.get(name, name): 1 for name in stored if name != "comment_id"}
+        return (expand_comment(doc, fields) for doc in db.comments.find(flt, projection))
+    return iter(db.comments.find(flt or {}, projection))
+
+def aggregate_comments(db, pipeline: List[Dict[str, Any]], schema: Optional[str] = None):
+    """
+    `db.comments.aggregate` with long field names in `$match`, `$sort`, `$project`
+    and `$field` references. Output rows are not expanded: a `$group` over a
+    compact time field yields epoch seconds.
+    """
+    schema = schema or comments_schema(db)
+    if schema == "compact":
+        stages = []
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                arg = comments_filter(arg, schema)
+            elif op in ("$sort", "$project"):
+                arg = {COMPACT_FIELDS.get(k, k): _compact_expr(v) for k, v in arg.items()}
+            else:
+                arg = _compact_expr(arg)
+            stages.append({op: arg})
+        pipeline = stages
+    return db.comments.aggregate(pipeline)
+
+def comments_delta_filter(db, cache_size: int = 200_000, touch_unchanged: bool = True) -> DeltaFilter:
+    """DeltaFilter over `db.comments`; reuse one instance across runs to keep its cache warm."""
+    return DeltaFilter(db.comments, COMMENT_FP_FIELDS, cache_size=cache_size, touch_unchanged=touch_unchanged)
+
+def warm_seen_comments(db, seen, post_id: str, schema: Optional[str] = None) -> int:
+    """
+    Load the stored `(comment_id, score)` pairs of one post into a `SeenComments` cache.
+
+    Pass `schema` (`comments_schema(db)`, read once per harvest) to save its lookup.
+    """
+    if seen.is_warmed(post_id):
+        return 0
+    n = 0
+    for row in find_comments(db, {"post_id": post_id}, {"score": 1}, schema=schema):
+        seen.add(row["_id"], int(row.get("score", 0)))
+        n += 1
+    seen.mark_warmed(post_id)
+    return n
+
+def _delta_ops(delta: DeltaFilter, docs: List[Dict[str, Any]], schema: str = "full") -> Tuple[List[UpdateOne], List[Tuple[str, str]]]:
+    build, touch = _BUILDERS[schema]
+    changed, unchanged = delta.split(docs)
+    ops: List[UpdateOne] = []
+    fps: List[Tuple[str, str]] = []
+    for doc, fp in changed:
         try:
-            ops.append(_build_update_comment(doc))
+            ops.append(build(doc, fp))
         except Exception:
             logger.exception("invalid comment doc skipped: %r", doc)
             continue
-        if len(ops) >= batch_size:
-            flush_ops()
+        fps.append((doc["_id"], fp))
+    if delta.touch_unchanged:
+        ops.extend(touch(doc) for doc in unchanged)
+    return ops, fps
+
+def _after_write(delta: DeltaFilter | None, fps: List[Tuple[str, str]], seen, known: List[Tuple[str, int]]) -> None:
+    if fps:
+        delta.commit(fps)
+    if seen is not None:
+        for comment_id, score in known:
+            seen.add(comment_id, score)
+
+def upsert_comments(
+    db,
+    docs_iter: Iterable[Dict[str, Any]],
+    batch_size: int = 500,
+    background: bool = False,
+    queue_size: int = 4,
+    delta: DeltaFilter | None = None,
+    schema: str | None = None,
+    seen=None,
+) -> Dict[str, int]:
+    """
+    Upsert comment docs in batches of `batch_size`.
+
+    With `background=True` batches are handed to a flusher thread through a bounded
+    queue of `queue_size` batches, so fetching and writing overlap.
+    With a `delta` filter (see `comments_delta_filter`), comments whose mutable fields
+    are unchanged get a minimal `last_seen_at`/`$max` update or no write at all.
+    Docs are written in the stored layout (`comments_schema`) unless `schema` is given.
+    A `SeenComments` passed as `seen` gets each comment's `(id, score)` once its batch
+    is written; a dropped batch leaves its comments unknown, so they are fetched again.
+    """
+    schema = schema or comments_schema(db)
+    if schema not in SCHEMAS:
+        raise ValueError(f"schema must be one of {SCHEMAS}, got {schema!r}")
+    build = _BUILDERS[schema][0]
+    coll: Collection = db.comments
+    ops: List[UpdateOne] = []
+    pending: List[Dict[str, Any]] = []
+    known: List[Tuple[str, int]] = []
+    writer = BulkWriter(coll, "comments", background=background, queue_size=queue_size)
+    n_seen = 0
+    unchanged_before = delta.stats["unchanged"] if delta else 0
+
+    def flush_ops():
+        nonlocal ops, pending, known
+        fps = None
+        if pending:
+            delta_ops, fps = _delta_ops(delta, pending, schema)
+            ops.extend(delta_ops)
+        # fingerprints and seen comments are cached only once the batch is written
+        on_written = partial(_after_write, delta, fps, seen, known) if fps or (seen is not None and known) else None
+        writer.submit(ops, on_written=on_written)
+        ops, pending, known = [], [], []
 
-    flush_ops()
+    try:
+        for doc in docs_iter:
+            n_seen += 1
+            if delta is not None:
+                if not doc.get("_id"):
+                    logger.error("invalid comment doc skipped: %r", doc)
+                    continue
+                pending.append(doc)
+            else:
+                try:
+                    ops.append(build(doc))
+                except Exception:
+                    logger.exception("invalid comment doc skipped: %r", doc)
+                    continue
+            if seen is not None:
+                known.append((doc.get("_id") or doc.get("comment_id"), int(doc.get("score", 0))))
+            if len(ops) + len(pending) >= batch_size:
+                flush_ops()
+        flush_ops()
+    finally:
+        stats = {"seen": n_seen, **writer.close()}
+    if delta is not None:
+        stats["unchanged"] = delta.stats["unchanged"] - unchanged_before
     logger.info("comments upsert complete: %s", stats)
     return stats
+
+def migrate_comments(db, schema: str = "compact", batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Rewrite every stored comment in the `schema` layout, then record it as the current one.
+
+    Docs are read in either layout, expanded and replaced in place; running it again
+    (e.g. after an interruption) only rewrites what is still in the old layout.
+    Stop the collectors while it runs: a comment upserted in the old layout after
+    the switch would mix both. Indexes are not touched (see `indexes.create_indexes`).
+
+    Returns:
+        Stats: docs read and rewritten, target schema.
+    """
+    if schema not in SCHEMAS:
+        raise ValueError(f"schema must be one of {SCHEMAS}, got {schema!r}")
+    stats = {"schema": schema, "read": 0, "rewritten": 0}
+    ops: List[ReplaceOne] = []
+
+    def flush():
+        if ops and bulk_write_with_retry(db.comments, ops, "comments migration") is not None:
+            stats["rewritten"] += len(ops)
+        ops.clear()
+
+    for doc in db.comments.find({}):
+        stats["read"] += 1
+        full = expand_comment(doc)
+        new = compact_comment(full) if schema == "compact" else full
+        if new != doc:
+            ops.append(ReplaceOne({"_id": doc["_id"]}, new))
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+    db[STATE_COLLECTION].update_one(
+        {"_id": SCHEMA_STATE_ID}, {"$set": {"schema": schema, "updated_at": ts_now()}}, upsert=True,
+    )
+    logger.info("comments migration complete: %s", stats)
+    return stats
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+from pymongo.collection import Collection
+from ...utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# field stored on each document holding the fingerprint of its mutable fields
+FP_FIELD = "fp"
+
+
+def fingerprint(doc: Dict[str, Any], fields: Sequence[str]) -> str:
+    """Compact 16-hex digest of `fields` in `doc`."""
+    raw = repr(tuple(doc.get(f) for f in fields)).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+class DeltaFilter:
+    """
+    Splits a batch of docs into changed and unchanged ones by fingerprint.
+
+    Known fingerprints come from an in-process LRU cache, and cache misses are
+    resolved with one projected `$in` query per batch on the `fp` field of `coll`.
+    The fingerprint of a changed doc only enters the cache through `commit`, once its
+    write succeeded: a dropped batch leaves those docs "changed" for the next run.
+
+    Args:
+        coll: Collection the docs are upserted into.
+        fields: Mutable fields covered by the fingerprint.
+        cache_size: Max `_id -> fp` entries kept in memory.
+        touch_unchanged: Send a minimal `last_seen_at`/`$max` update for unchanged
+            docs if True, skip them if False (posts still get their `seen_in` listing).
+    """
+
+    def __init__(self, coll: Collection, fields: Sequence[str], cache_size: int = 100_000, touch_unchanged: bool = True):
+        self.coll = coll
+        self.fields = tuple(fields)
+        self.touch_unchanged = touch_unchanged
+        self._cache: LRUCache[str] = LRUCache(cache_size)
+        self.stats = {"changed": 0, "unchanged": 0, "lookups": 0}
+
+    def split(self, docs: List[Dict[str, Any]]) -> Tuple[List[Tuple[Dict[str, Any], str]], List[Dict[str, Any]]]:
+        """Return `([(doc, fp), ...] changed, [doc, ...] unchanged)`."""
+        fps = [fingerprint(doc, self.fields) for doc in docs]
+        known = {}
+        missing = []
+        for doc in docs:
+            cached = self._cache.get(doc["_id"])
+            if cached is None:
+                missing.append(doc["_id"])
+            else:
+                known[doc["_id"]] = cached
+        if missing:
+            self.stats["lookups"] += 1
+            try:
+                for row in self.coll.find({"_id": {"$in": missing}, FP_FIELD: {"$exists": True}}, {FP_FIELD: 1}):
+                    known[row["_id"]] = row[FP_FIELD]
+            except Exception:
+                logger.exception("fingerprint lookup failed; treating %d docs as changed", len(missing))
+
+        changed, unchanged = [], []
+        for doc, fp in zip(docs, fps):
+            if known.get(doc["_id"]) == fp:
+                unchanged.append(doc)
+                self._cache.put(doc["_id"], fp)   # already the stored fingerprint
+            else:
+                changed.append((doc, fp))
+        self.stats["changed"] += len(changed)
+        self.stats["unchanged"] += len(unchanged)
+        return changed, unchanged
+
+    def commit(self, written: Sequence[Tuple[str, str]]) -> None:
+        """Cache the `(_id, fp)` pairs of changed docs whose write succeeded."""
+        for _id, fp in written:
+            self._cache.put(_id, fp)
@@ -1,12 +1,21 @@
 import logging
-import time
+from functools import partial
 from pymongo import UpdateOne 
 from pymongo.collection import Collection
-from typing import Iterable, Dict, Any, List
+from typing import Callable, Iterable, Dict, Any, List, Sequence, Tuple
 from ...utils.common import ts_now
+from .bulk_writer import BulkWriter, bulk_write_with_retry
+from .fingerprints import DeltaFilter, FP_FIELD
+from ...utils.minhash import unpack
+from .snapshots_repo import create_timeseries_collection, snapshot_collection, snapshot_ops
 logger = logging.getLogger(__name__)
 
-def _build_update(doc : dict[str, Any]) -> UpdateOne :
+# fields whose change makes a re-collected post worth a full rewrite; the counters
+# (score, upvote_ratio, num_comments) move on nearly every re-collection and are
+# written by the touch update instead
+POST_FP_FIELDS = ("title", "selftext", "author")
+
+def _build_update(doc : dict[str, Any], fp: str | None = None) -> UpdateOne :
     _id = doc.get("_id")
     listing = doc.get("listing")
     elem= {
@@ -32,46 +41,239 @@ def _build_update(doc : dict[str, Any]) -> UpdateOne :
                   "num_comments_max": int(doc.get("num_comments", 0))
                 },
         }
+    if fp:
+        elem["$set"][FP_FIELD] = fp
+    if doc.get("cluster_id"):
+        # near-duplicate cluster (collectors/dedup.NearDuplicates)
+        elem["$set"].update(cluster_id=doc["cluster_id"], minhash=doc["minhash"], lsh=doc["lsh"])
     if listing:
         elem["$addToSet"] = {"seen_in": listing}
     return UpdateOne({"_id": _id}, elem, upsert=True)
 
-def upsert_posts(db, docs_iter: Iterable[Dict[str, Any]], batch_size: int = 500) -> Dict[str, int]:
-    coll: Collection = db.posts
+def _build_touch(doc: dict[str, Any]) -> UpdateOne:
+    """Minimal update for a post whose fingerprint did not change: counters and listing."""
+    listing = doc.get("listing")
+    elem = {
+        "$set": {"last_seen_at": ts_now(), "listing": listing,
+                 "score": int(doc.get("score", 0)),
+                 "upvote_ratio": float(doc.get("upvote_ratio", 0)),
+                 "num_comments": int(doc.get("num_comments", 0))},
+        "$max": {"score_max": int(doc.get("score", 0)),
+                 "num_comments_max": int(doc.get("num_comments", 0))},
+    }
+    if listing:
+        elem["$addToSet"] = {"seen_in": listing}
+    return UpdateOne({"_id": doc.get("_id")}, elem)
+
+def _build_listing(doc: dict[str, Any]) -> UpdateOne | None:
+    """Listing membership only (`touch_unchanged=False`); matches nothing once the post is in it."""
+    listing = doc.get("listing")
+    if not listing:
+        return None
+    return UpdateOne({"_id": doc.get("_id"), "seen_in": {"$ne": listing}}, {"$addToSet": {"seen_in": listing}})
+
+def posts_delta_filter(db, cache_size: int = 100_000, touch_unchanged: bool = True) -> DeltaFilter:
+    """DeltaFilter over `db.posts`; reuse one instance across runs to keep its cache warm."""
+    return DeltaFilter(db.posts, POST_FP_FIELDS, cache_size=cache_size, touch_unchanged=touch_unchanged)
+
+def _delta_ops(delta: DeltaFilter, docs: List[Dict[str, Any]]) -> Tuple[List[UpdateOne], List[UpdateOne], List[Tuple[str, str]]]:
+    """Rewrite ops of changed posts, touch ops of unchanged ones, and the `(_id, fp)` to commit once written."""
+    changed, unchanged = delta.split(docs)
     ops: List[UpdateOne] = []
-    stats = {"seen": 0, "batches": 0, "upserted": 0, "modified": 0, "matched": 0}
-    def flush_ops():
-        nonlocal ops, stats
-        if not ops:
-            return
-        try:
-            res = coll.bulk_write(ops, ordered=False)
-        except Exception:
-            logger.warning("bulk_write failed; retrying once after 0.5s (ops=%d)", len(ops))
-            time.sleep(0.5)
-            try:
-                res = coll.bulk_write(ops, ordered=False)
-            except Exception:
-                logger.exception("retry failed; dropping batch (ops=%d)", len(ops))
-                ops = []
-                return
-        stats["batches"] += 1
-        stats["matched"] += res.matched_count
-        stats["modified"] += res.modified_count
-        stats["upserted"] += len(res.upserted_ids or {})
-        logger.info("posts bulk_write: matched=%d modified=%d upserted=%d",
-                    res.matched_count, res.modified_count, len(res.upserted_ids or {}))
-        ops = []
-
-    for doc in docs_iter:
-        stats["seen"] += 1
+    fps: List[Tuple[str, str]] = []
+    for doc, fp in changed:
         try:
-            ops.append(_build_update(doc))
+            ops.append(_build_update(doc, fp))
         except Exception:
             logger.exception("invalid post doc skipped: %r", doc)
             continue
-        if len(ops) >= batch_size:
-            flush_ops()
-    flush_ops()
+        fps.append((doc["_id"], fp))
+    if delta.touch_unchanged:
+        touches = [_build_touch(doc) for doc in unchanged]
+    else:
+        # seen_in is still kept up to date: comment targets are picked by listing
+        touches = [op for op in map(_build_listing, unchanged) if op is not None]
+    return ops, touches, fps
+
+def upsert_posts(
+    db,
+    docs_iter: Iterable[Dict[str, Any]],
+    batch_size: int = 500,
+    background: bool = False,
+    queue_size: int = 4,
+    delta: DeltaFilter | None = None,
+    snapshots: str | None = None,
+    on_written: Callable[[List[Dict[str, Any]]], None] | None = None,
+) -> Dict[str, int]:
+    """
+    Upsert post docs in batches of `batch_size`.
+
+    With `background=True` batches are handed to a flusher thread through a bounded
+    queue of `queue_size` batches, so fetching and writing overlap.
+    With a `delta` filter (see `posts_delta_filter`), posts whose text is unchanged
+    only get their counters, `last_seen_at` and listing updated (`touch_unchanged`),
+    or just their `seen_in` listing membership. Those touch writes go through their
+    own writer and are reported as `touched`, apart from the `modified` rewrites.
+    With `snapshots` ("bucket" | "timeseries", see `snapshots_repo`), every post also
+    gets a `(ts, score, upvote_ratio, num_comments)` observation appended to its history.
+    `on_written(docs)` is called with the docs of every batch once it is written (e.g.
+    `HighWaterMarks.observe`); a dropped batch is counted in `stats["dropped"]` instead.
+    """
+    coll: Collection = db.posts
+    ops: List[UpdateOne] = []
+    pending: List[Dict[str, Any]] = []
+    observed: List[Dict[str, Any]] = []
+    batch: List[Dict[str, Any]] = []
+    writer = BulkWriter(coll, "posts", background=background, queue_size=queue_size)
+    touch_writer = BulkWriter(coll, "posts touch", background=background, queue_size=queue_size) if delta else None
+    snap_writer = None
+    if snapshots:
+        if snapshots == "timeseries":
+            create_timeseries_collection(db)
+        snap_writer = BulkWriter(snapshot_collection(db, snapshots), "snapshots", background=background, queue_size=queue_size)
+    seen = 0
+    unchanged_before = delta.stats["unchanged"] if delta else 0
+
+    def written(fps: List[Tuple[str, str]], docs: List[Dict[str, Any]]) -> None:
+        # fingerprints are cached only once the batch is written
+        if fps:
+            delta.commit(fps)
+        if on_written is not None:
+            on_written(docs)
+
+    def flush_ops():
+        nonlocal ops, pending, observed, batch
+        fps: List[Tuple[str, str]] = []
+        if pending:
+            delta_ops, touches, fps = _delta_ops(delta, pending)
+            ops.extend(delta_ops)
+            touch_writer.submit(touches)
+            if snap_writer is not None:
+                observed.extend(pending)
+            batch = pending
+        writer.submit(ops, on_written=partial(written, fps, batch))
+        if snap_writer is not None:
+            snap_writer.submit(snapshot_ops(observed, snapshots))
+        ops, pending, observed, batch = [], [], [], []
+
+    try:
+        for doc in docs_iter:
+            seen += 1
+            if delta is not None:
+                if not doc.get("_id"):
+                    logger.error("invalid post doc skipped: %r", doc)
+                    continue
+                pending.append(doc)
+            else:
+                try:
+                    ops.append(_build_update(doc))
+                except Exception:
+                    logger.exception("invalid post doc skipped: %r", doc)
+                    continue
+                batch.append(doc)
+                if snap_writer is not None:
+                    observed.append(doc)
+            if len(ops) + len(pending) >= batch_size:
+                flush_ops()
+        flush_ops()
+    finally:
+        stats = {"seen": seen, **writer.close()}
+        if touch_writer is not None:
+            touch = touch_writer.close()
+            stats["touched"] = touch["modified"]
+            stats["dropped"] += touch["dropped"]
+        if snap_writer is not None:
+            snap = snap_writer.close()
+            stats["snapshots"] = snap["upserted"] + snap["modified"] + snap["inserted"]
+    if delta is not None:
+        stats["unchanged"] = delta.stats["unchanged"] - unchanged_before
     logger.info("posts upsert complete: %s", stats)
-    return stats
\ No newline at end of file
+    return stats
+
+# comment targets: best posts first, busiest first among equal scores
+TARGET_SORT = {"score_max": -1, "num_comments_max": -1}
+
+def target_pipeline(subreddits: Sequence[str], seen_in: str, per_sub: int) -> List[Dict[str, Any]]:
+    """
+    Aggregation picking the top `per_sub` post ids of every subreddit at once.
+
+    The `$sort` (subreddit, then `TARGET_SORT`, then post_id) is the key order of the
+    `targets_by_listing` index after the `seen_in` equality, so the index scan
+    delivers it and `$firstN` only has to keep the first ids of each subreddit.
+    """
+    return [
+        {"$match": {"subreddit": {"$in": list(subreddits)}, "seen_in": seen_in}},
+        {"$sort": {"subreddit": 1, **TARGET_SORT, "post_id": 1}},
+        {"$group": {
+            "_id": "$subreddit",
+            "post_ids": {"$firstN": {"n": per_sub, "input": "$post_id"}},
+        }},
+    ]
+
+def select_targets(db, subreddits: Sequence[str], seen_in: str, per_sub: int) -> Dict[str, List[str]]:
+    """
+    Top `per_sub` posts per subreddit among those seen in listing `seen_in`,
+    by `score_max` then `num_comments_max`, in one aggregation (MongoDB >= 5.2).
+
+    Served by the `targets_by_listing` index (see `db/indexes.py`): the `$match`
+    and the `$sort` are one index scan in ranking order, with no blocking sort
+    (checked by `python -m scripts.bench --mongo-uri ...`).
+    """
+    found = {row["_id"]: row["post_ids"] for row in db.posts.aggregate(target_pipeline(subreddits, seen_in, per_sub))}
+    return {sub: found.get(sub, []) for sub in subreddits}
+
+def target_post_ids(db, groups: Dict[str, Sequence[str]], per_sub: Dict[str, int], seen_in: str) -> List[str]:
+    """Comment targets of several subreddit groups, one aggregation per group, in group/subreddit order."""
+    post_ids: List[str] = []
+    for group, subs in groups.items():
+        if group not in per_sub:
+            continue
+        for ids in select_targets(db, subs, seen_in, per_sub[group]).values():
+            post_ids.extend(ids)
+    return post_ids
+
+def warm_near_duplicates(db, dedup, subreddits: Sequence[str], window_days: float = 14) -> int:
+    """Load the clustered posts of the last `window_days` into a `NearDuplicates` index."""
+    since = ts_now().timestamp() - window_days * 86400
+    n = 0
+    for row in db.posts.find(
+        {"subreddit": {"$in": list(subreddits)}, "created_utc": {"$gte": since}, "cluster_id": {"$exists": True}},
+        {"cluster_id": 1, "minhash": 1, "lsh": 1},
+    ):
+        dedup.add(row["_id"], unpack(row["minhash"]), row["cluster_id"], row.get("lsh"))
+        n += 1
+    logger.info("Near-duplicate index warmed with %d posts", n)
+    return n
+
+def one_per_cluster(db, post_ids: Sequence[str]) -> List[str]:
+    """Drop posts whose near-duplicate cluster already has an earlier post in `post_ids`."""
+    clusters = {row["_id"]: row.get("cluster_id") for row in db.posts.find({"_id": {"$in": list(post_ids)}}, {"cluster_id": 1})}
+    kept, taken = [], set()
+    for pid in post_ids:
+        cluster = clusters.get(pid) or pid
+        if cluster in taken:
+            continue
+        taken.add(cluster)
+        kept.append(pid)
+    if len(kept) < len(post_ids):
+        logger.info("Comment targets: %d near-duplicate posts skipped (%d kept)", len(post_ids) - len(kept), len(kept))
+    return kept
+
+
+def mark_comments_harvested(db, harvested: Dict[str, Tuple[Any, int]]) -> int:
+    """
+    Record on each post when its comments were last harvested and its `num_comments`
+    at that time (`comments_harvested_at`, `comments_harvested_num`), for `plan_refresh`.
+
+    Args:
+        harvested: post_id -> (harvest datetime, num_comments seen).
+
+    Returns:
+        Posts matched (0 if the batch was dropped).
+    """
+    ops = [UpdateOne({"_id": pid}, {"$set": {"comments_harvested_at": at, "comments_harvested_num": int(num)}})
+           for pid, (at, num) in harvested.items()]
+    if not ops:
+        return 0
+    res = bulk_write_with_retry(db.posts, ops, "posts harvest marks")
+    return res.matched_count if res is not None else 0
@@ -0,0 +1,215 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Protocol
+from ...utils.common import ts_now
+from .comments_repo import upsert_comments
+from .posts_repo import upsert_posts
+
+logger = logging.getLogger(__name__)
+
+KINDS = {"posts", "comments"}
+
+# datetimes are written as ISO strings and parsed back on load
+DATETIME_FIELDS = ("ingested_at", "first_seen_at", "last_seen_at")
+# binary fields are written as hex strings
+BYTES_FIELDS = ("minhash",)
+
+
+class Sink(Protocol):
+    """Anything that consumes a collector generator and returns write stats."""
+
+    def write(self, docs_iter: Iterable[Dict[str, Any]]) -> Dict[str, int]: ...
+
+
+def _check_kind(kind: str) -> None:
+    if kind not in KINDS:
+        raise ValueError(f"Invalid kind '{kind}'. Expected one of {sorted(KINDS)}.")
+
+
+def capture_path(root: str, kind: str, fmt: str = "jsonl.gz") -> str:
+    """Timestamped file for one capture run: `<root>/<kind>/<YYYYmmddTHHMMSS>.<fmt>`."""
+    _check_kind(kind)
+    os.makedirs(os.path.join(root, kind), exist_ok=True)
+    return os.path.join(root, kind, f"{ts_now():%Y%m%dT%H%M%S}.{fmt}")
+
+
+class MongoSink:
+    """The usual path: `upsert_posts` / `upsert_comments` into `db`."""
+
+    def __init__(self, db, kind: str, **upsert_kwargs):
+        _check_kind(kind)
+        self.db = db
+        self.kind = kind
+        self.upsert_kwargs = upsert_kwargs
+
+    def write(self, docs_iter: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        upsert = upsert_posts if self.kind == "posts" else upsert_comments
+        return upsert(self.db, docs_iter, **self.upsert_kwargs)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+class JsonlSink:
+    """
+    Append-only JSON Lines writer, gzip-compressed when `path` ends with `.gz`.
+
+    Appending to an existing `.gz` file adds a new gzip member, which readers
+    (including `read_docs`) handle transparently.
+    """
+
+    def __init__(self, path: str, compresslevel: int = 6):
+        self.path = path
+        self.compresslevel = compresslevel
+
+    def write(self, docs_iter: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        stats = {"seen": 0, "written": 0, "bytes": 0}
+        if self.path.endswith(".gz"):
+            fh = gzip.open(self.path, "ab", compresslevel=self.compresslevel)
+        else:
+            fh = open(self.path, "ab")
+        with fh:
+            for doc in docs_iter:
+                stats["seen"] += 1
+                try:
+                    line = json.dumps(doc, default=_json_default, ensure_ascii=False).encode("utf-8") + b"\n"
+                except TypeError:
+                    logger.exception("unserializable doc skipped: %r", doc)
+                    continue
+                fh.write(line)
+                stats["written"] += 1
+                stats["bytes"] += len(line)
+        logger.info("jsonl capture complete (%s): %s", self.path, stats)
+        return stats
+
+
+def _arrow_schema(kind: str):
+    import pyarrow as pa
+
+    ts = pa.timestamp("us", tz="UTC")
+    common = [
+        ("_id", pa.string()), ("subreddit", pa.string()), ("author", pa.string()),
+        ("score", pa.int64()), ("permalink", pa.string()), ("created_utc", pa.int64()),
+        ("ingested_at", ts),
+    ]
+    if kind == "posts":
+        fields = common + [
+            ("post_id", pa.string()), ("title", pa.string()), ("selftext", pa.string()),
+            ("upvote_ratio", pa.float64()), ("num_comments", pa.int64()),
+            ("listing", pa.string()), ("time_filter", pa.string()),
+            # near-duplicate clustering (collectors/dedup.py), absent without a dedup index
+            ("cluster_id", pa.string()), ("minhash", pa.binary()), ("lsh", pa.list_(pa.int64())),
+        ]
+    else:
+        fields = common + [
+            ("comment_id", pa.string()), ("post_id", pa.string()), ("body", pa.string()),
+            ("is_top_level", pa.bool_()), ("parent_id", pa.string()), ("sort", pa.string()),
+        ]
+    return pa.schema(fields)
+
+
+class ParquetSink:
+    """
+    Columnar writer: docs are buffered and written as one row group per `row_group_size`.
+
+    Needs the optional `pyarrow` dependency. Each instance writes one file (use
+    `capture_path` for one file per run); fields outside the collector doc shape are dropped.
+    """
+
+    def __init__(self, path: str, kind: str, row_group_size: int = 10_000, compression: str = "zstd"):
+        _check_kind(kind)
+        self.path = path
+        self.kind = kind
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+    def write(self, docs_iter: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("ParquetSink needs pyarrow (pip install pyarrow)") from e
+
+        schema = _arrow_schema(self.kind)
+        names = schema.names
+        stats = {"seen": 0, "written": 0, "row_groups": 0, "bytes": 0}
+        rows: List[Dict[str, Any]] = []
+
+        with pq.ParquetWriter(self.path, schema, compression=self.compression) as writer:
+            def flush():
+                nonlocal rows
+                if not rows:
+                    return
+                table = pa.Table.from_pylist([{k: r.get(k) for k in names} for r in rows], schema=schema)
+                writer.write_table(table, row_group_size=len(rows))
+                stats["written"] += len(rows)
+                stats["row_groups"] += 1
+                rows = []
+
+            for doc in docs_iter:
+                stats["seen"] += 1
+                rows.append(doc)
+                if len(rows) >= self.row_group_size:
+                    flush()
+            flush()
+        stats["bytes"] = os.path.getsize(self.path)
+        logger.info("parquet capture complete (%s): %s", self.path, stats)
+        return stats
+
+
+def read_docs(path: str) -> Iterator[Dict[str, Any]]:
+    """Replay docs captured by `JsonlSink` or `ParquetSink`, with datetimes and bytes restored."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches():
+            for doc in batch.to_pylist():
+                # missing values come back as None; drop them so upsert defaults apply
+                yield {k: v for k, v in doc.items() if v is not None}
+        return
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as fh:
+        for n, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                doc = json.loads(line)
+            except ValueError:
+                logger.warning("corrupt line %d in %s skipped", n, path)
+                continue
+            for field in DATETIME_FIELDS:
+                if isinstance(doc.get(field), str):
+                    doc[field] = datetime.fromisoformat(doc[field])
+            for field in BYTES_FIELDS:
+                if isinstance(doc.get(field), str):
+                    doc[field] = bytes.fromhex(doc[field])
+            yield doc
+
+
+def load_into_mongo(db, kind: str, paths: Iterable[str], batch_size: int = 5000, **upsert_kwargs) -> Dict[str, int]:
+    """
+    Merge captured files into Mongo through the regular upsert path, in large batches.
+
+    Files are replayed in the given order, so later captures win on mutable fields.
+    """
+    _check_kind(kind)
+    paths = list(paths)
+
+    def all_docs():
+        for path in paths:
+            logger.info("loading %s into %s", path, kind)
+            yield from read_docs(path)
+
+    upsert_kwargs.setdefault("background", True)
+    stats = MongoSink(db, kind, batch_size=batch_size, **upsert_kwargs).write(all_docs())
+    stats["files"] = len(paths)
+    return stats
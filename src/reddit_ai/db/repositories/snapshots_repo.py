@@ -0,0 +1,159 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from pymongo import InsertOne, UpdateOne
+from ...utils.common import ts_now
+
+logger = logging.getLogger(__name__)
+
+# one document per post per UTC day; observations as [ts, score, upvote_ratio, num_comments]
+SNAPSHOT_COLLECTION = "post_snapshots"
+# or one document per observation in a Mongo time-series collection (MongoDB >= 5.0)
+TIMESERIES_COLLECTION = "post_snapshots_ts"
+
+MODES = ("bucket", "timeseries")
+
+Point = Tuple[datetime, int, float, int]
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def _observation(doc: Dict[str, Any]) -> Point:
+    return (
+        _aware(doc.get("ingested_at") or ts_now()),
+        int(doc.get("score", 0)),
+        float(doc.get("upvote_ratio", 0)),
+        int(doc.get("num_comments", 0)),
+    )
+
+
+def _build_snapshot(doc: Dict[str, Any]) -> UpdateOne:
+    """Append one observation to the post's bucket of the day, creating it if needed."""
+    ts, score, ratio, num_comments = _observation(doc)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return UpdateOne(
+        {"_id": f"{doc['_id']}:{day:%Y%m%d}"},
+        {
+            "$setOnInsert": {"post_id": doc["_id"], "subreddit": doc.get("subreddit"), "day": day},
+            "$push": {"obs": [ts, score, ratio, num_comments]},
+            "$inc": {"n": 1},
+            "$min": {"first_ts": ts},
+            "$max": {"last_ts": ts},
+        },
+        upsert=True,
+    )
+
+
+def _build_snapshot_ts(doc: Dict[str, Any]) -> InsertOne:
+    ts, score, ratio, num_comments = _observation(doc)
+    return InsertOne({
+        "ts": ts,
+        "post": {"post_id": doc["_id"], "subreddit": doc.get("subreddit")},
+        "score": score,
+        "upvote_ratio": ratio,
+        "num_comments": num_comments,
+    })
+
+
+def snapshot_collection(db, mode: str = "bucket"):
+    if mode not in MODES:
+        raise ValueError(f"snapshot mode must be one of {MODES}, got {mode!r}")
+    return db[TIMESERIES_COLLECTION] if mode == "timeseries" else db[SNAPSHOT_COLLECTION]
+
+
+def snapshot_ops(docs: Iterable[Dict[str, Any]], mode: str = "bucket") -> List[Any]:
+    build = _build_snapshot_ts if mode == "timeseries" else _build_snapshot
+    ops = []
+    for doc in docs:
+        try:
+            ops.append(build(doc))
+        except Exception:
+            logger.exception("invalid post doc skipped for snapshot: %r", doc)
+    return ops
+
+
+def create_timeseries_collection(db) -> None:
+    """Create `post_snapshots_ts` as a time-series collection (idempotent)."""
+    if TIMESERIES_COLLECTION in db.list_collection_names():
+        return
+    db.create_collection(
+        TIMESERIES_COLLECTION,
+        timeseries={"timeField": "ts", "metaField": "post", "granularity": "hours"},
+    )
+
+
+def post_histories(
+    db,
+    post_ids: Sequence[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    mode: str = "bucket",
+) -> Dict[str, List[Point]]:
+    """
+    Observations of several posts in one query, oldest first.
+
+    Returns:
+        post_id -> [(ts, score, upvote_ratio, num_comments), ...]; posts without
+        observations in the range are absent.
+    """
+    since = _aware(since) if since else None
+    until = _aware(until) if until else None
+    out: Dict[str, List[Point]] = {}
+    if mode == "timeseries":
+        flt: Dict[str, Any] = {"post.post_id": {"$in": list(post_ids)}}
+        if since or until:
+            flt["ts"] = {**({"$gte": since} if since else {}), **({"$lte": until} if until else {})}
+        for row in snapshot_collection(db, mode).find(flt, {"_id": 0}).sort("ts", 1):
+            out.setdefault(row["post"]["post_id"], []).append(
+                (_aware(row["ts"]), row["score"], row["upvote_ratio"], row["num_comments"]))
+        return out
+
+    flt = {"post_id": {"$in": list(post_ids)}}
+    if since or until:
+        # a bucket holds one day: widen the lower bound to the bucket of `since`
+        day_range = {}
+        if since:
+            day_range["$gte"] = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        if until:
+            day_range["$lte"] = until
+        flt["day"] = day_range
+    for row in snapshot_collection(db, mode).find(flt, {"post_id": 1, "obs": 1}).sort([("post_id", 1), ("day", 1)]):
+        points = out.setdefault(row["post_id"], [])
+        for ts, score, ratio, num_comments in row.get("obs", []):
+            ts = _aware(ts)
+            if (since and ts < since) or (until and ts > until):
+                continue
+            points.append((ts, score, ratio, num_comments))
+    for points in out.values():
+        points.sort(key=lambda p: p[0])
+    return {pid: points for pid, points in out.items() if points}
+
+
+def post_history(db, post_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 mode: str = "bucket") -> List[Point]:
+    """Observations of one post, oldest first."""
+    return post_histories(db, [post_id], since, until, mode).get(post_id, [])
+
+
+def growth(points: Sequence[Point], hours: Optional[float] = None) -> Dict[str, float]:
+    """
+    Score and comment growth rates over the last `hours` of a history (all of it if None).
+
+    Returns:
+        `score_per_h`, `comments_per_h`, `span_h` and the number of points `n` used.
+    """
+    if hours is not None and points:
+        start = points[-1][0] - timedelta(hours=hours)
+        points = [p for p in points if p[0] >= start]
+    if len(points) < 2:
+        return {"score_per_h": 0.0, "comments_per_h": 0.0, "span_h": 0.0, "n": len(points)}
+    (t0, s0, _, c0), (t1, s1, _, c1) = points[0], points[-1]
+    span_h = max((t1 - t0).total_seconds() / 3600.0, 1e-9)
+    return {
+        "score_per_h": round((s1 - s0) / span_h, 3),
+        "comments_per_h": round((c1 - c0) / span_h, 3),
+        "span_h": round(span_h, 3),
+        "n": len(points),
+    }
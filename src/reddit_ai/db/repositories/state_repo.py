@@ -0,0 +1,92 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Set
+from pymongo import UpdateOne
+from ...utils.common import ts_now
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "collector_state"
+
+
+class HighWaterMarks:
+    """
+    Per-subreddit "newest post already ingested" cursor for one listing.
+
+    Marks are keyed by lowercased subreddit name and persisted in the
+    `collector_state` collection as `{_id: "<listing>:<subreddit>", created_utc, post_id}`.
+    Collectors read them with `get` and report a subreddit whose listing was read to
+    the end with `finish`; the writer reports the docs of every batch it wrote with
+    `observe`. A mark only moves to the newest *written* post of a *finished*
+    subreddit, and `save` persists it once the upsert is over.
+    """
+
+    def __init__(self, listing: str, marks: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.listing = listing
+        self.marks = marks or {}
+        self._updates: Dict[str, Dict[str, Any]] = {}
+        self._finished: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, db, listing: str) -> "HighWaterMarks":
+        marks = {}
+        for row in db[STATE_COLLECTION].find({"listing": listing}, {"subreddit": 1, "created_utc": 1, "post_id": 1}):
+            marks[row["subreddit"]] = {"created_utc": row["created_utc"], "post_id": row["post_id"]}
+        logger.info("Loaded %d high-water marks for listing=%s", len(marks), listing)
+        return cls(listing, marks)
+
+    def get(self, subreddit: str) -> Optional[Dict[str, Any]]:
+        """Mark as of the last `load` or `save`; `observe` and `finish` do not move it until `save`."""
+        return self.marks.get(subreddit.lower())
+
+    def finish(self, subreddit: str) -> None:
+        """The listing of `subreddit` was read to the end (limit, window or mark reached)."""
+        with self._lock:
+            self._finished.add(subreddit.lower())
+
+    def observe(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Post docs of a batch that was written (`upsert_posts(..., on_written=...)`)."""
+        with self._lock:
+            for doc in docs:
+                key = (doc.get("subreddit") or "").lower()
+                created_utc = int(doc.get("created_utc") or 0)
+                current = self._updates.get(key) or self.marks.get(key)
+                if current is None or created_utc > current["created_utc"]:
+                    self._updates[key] = {"created_utc": created_utc, "post_id": doc["post_id"]}
+
+    def save(self, db) -> int:
+        """Persist the marks moved by written posts of finished subreddits; returns how many moved."""
+        with self._lock:
+            updates = {k: v for k, v in self._updates.items() if k in self._finished}
+            self._updates, self._finished = {}, set()
+        if not updates:
+            return 0
+        now = ts_now()
+        ops = [
+            UpdateOne(
+                {"_id": f"{self.listing}:{sub}"},
+                {"$set": {"listing": self.listing, "subreddit": sub, **mark, "updated_at": now}},
+                upsert=True,
+            )
+            for sub, mark in updates.items()
+        ]
+        db[STATE_COLLECTION].bulk_write(ops, ordered=False)
+        self.marks.update(updates)
+        logger.info("Saved %d high-water marks for listing=%s", len(ops), self.listing)
+        return len(ops)
+
+
+def load_checkpoint(db, name: str) -> Optional[Any]:
+    """Value saved by `save_checkpoint` under `name`, or None."""
+    row = db[STATE_COLLECTION].find_one({"_id": f"checkpoint:{name}"}, {"value": 1})
+    return row["value"] if row else None
+
+
+def save_checkpoint(db, name: str, value: Any) -> None:
+    """Persist a named cursor (e.g. the last `ingested_at` processed by a job)."""
+    db[STATE_COLLECTION].update_one(
+        {"_id": f"checkpoint:{name}"},
+        {"$set": {"checkpoint": name, "value": value, "updated_at": ts_now()}},
+        upsert=True,
+    )
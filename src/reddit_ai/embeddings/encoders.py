@@ -0,0 +1,87 @@
+import logging
+import math
+import re
+import zlib
+from typing import List, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+(?:[-']\w+)*")
+
+
+class HashingEncoder:
+    """
+    Model-free text encoder: signed feature hashing of words and word bigrams.
+
+    Each term is hashed (crc32, stable across processes) to one of `dim` buckets
+    with a +/-1 sign; counts are log-scaled and the vector is L2-normalised, so the
+    dot product is a TF-weighted cosine similarity. Vectors only depend on the text:
+    an unchanged text always gets the same vector.
+
+    Args:
+        dim: Vector size.
+        bigrams: Also hash adjacent word pairs.
+        max_chars: Only the first `max_chars` characters are encoded.
+    """
+
+    def __init__(self, dim: int = 384, bigrams: bool = True, max_chars: int = 5000):
+        self.dim = dim
+        self.bigrams = bigrams
+        self.max_chars = max_chars
+        self.name = f"hashing-{dim}{'-bi' if bigrams else ''}"
+
+    def _terms(self, text: str) -> List[str]:
+        words = _TOKEN.findall(text[:self.max_chars].lower())
+        if self.bigrams:
+            return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return words
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32 matrix of unit vectors (zero for empty texts)."""
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for term in self._terms(text or ""):
+                h = zlib.crc32(term.encode("utf-8"))
+                key = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+                counts[key] = counts.get(key, 0) + 1
+            for (col, sign), n in counts.items():
+                out[row, col] += sign * (1.0 + math.log(n))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceTransformerEncoder:
+    """
+    CPU sentence-embedding model (needs the optional `sentence-transformers` package).
+
+    Args:
+        model: Model name, e.g. "all-MiniLM-L6-v2" (384 dims).
+        batch_size: Texts per forward pass.
+    """
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2", batch_size: int = 64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("SentenceTransformerEncoder needs sentence-transformers "
+                              "(pip install sentence-transformers)") from e
+        self.model = SentenceTransformer(model, device="cpu")
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model}"
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+
+
+def get_encoder(name: str = "hashing", **kwargs):
+    """'hashing' (default, no model to download) or 'st' / 'st:<model>' for sentence-transformers."""
+    if name == "hashing":
+        return HashingEncoder(**kwargs)
+    if name == "st" or name.startswith("st:"):
+        return SentenceTransformerEncoder(name.partition(":")[2] or "all-MiniLM-L6-v2", **kwargs)
+    raise ValueError(f"unknown encoder {name!r}; expected 'hashing' or 'st[:<model>]'")
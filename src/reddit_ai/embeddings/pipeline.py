@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+from ..db.repositories.comments_repo import find_comments
+from .store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# text embedded per source collection
+SOURCES = {"posts": ("title", "selftext"), "comments": ("body",)}
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def doc_text(doc: Dict[str, Any], fields: Sequence[str]) -> str:
+    return "\n".join(doc.get(f) or "" for f in fields).strip()
+
+
+def text_fp(text: str) -> int:
+    """64-bit fingerprint of the embedded text (0 is never returned, it marks empty rows)."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def open_store(root: str, encoder, dtype: str = "float16") -> VectorStore:
+    """Open (or create) the store of `encoder`'s vectors."""
+    return VectorStore(root, dim=encoder.dim, dtype=dtype, encoder=encoder.name)
+
+
+def update_embeddings(
+    db,
+    store: VectorStore,
+    encoder,
+    sources: Sequence[str] = ("posts", "comments"),
+    *,
+    batch_size: int = 256,
+    overlap_s: float = 900,
+    min_chars: int = 20,
+    retrain_growth: float = 2.0,
+) -> Dict[str, Any]:
+    """
+    Embed the docs ingested since the last pass and add them to `store`.
+
+    Per source, docs with `ingested_at` past the store's checkpoint (minus
+    `overlap_s`) are read; a doc whose text fingerprint matches its stored row is
+    skipped, so re-scored or re-seen posts are never re-embedded. Texts are encoded
+    `batch_size` at a time. The IVF index is (re)trained once the store has grown
+    `retrain_growth` times since the last training; in between, new rows go to their
+    nearest existing list.
+
+    Args:
+        db: Mongo database handle.
+        store: Target store (see `open_store`).
+        encoder: `HashingEncoder`, `SentenceTransformerEncoder` or anything with `encode(texts)`.
+        sources: Collections to read, among `SOURCES`.
+        batch_size: Texts per `encode` call.
+        overlap_s: Seconds re-read before the checkpoint (late background writes).
+        min_chars: Shorter texts are not embedded.
+        retrain_growth: Growth factor triggering an IVF retraining.
+
+    Returns:
+        Per source: docs read, embedded, unchanged and too short; plus the embedding rate.
+    """
+    stats: Dict[str, Any] = {}
+    start = time.perf_counter()
+    embedded_total = 0
+    checkpoints = store.meta.setdefault("checkpoints", {})
+    for kind in sources:
+        fields = SOURCES[kind]
+        since = checkpoints.get(kind)
+        flt: Dict[str, Any] = {}
+        if since:
+            flt["ingested_at"] = {"$gt": datetime.fromisoformat(since) - timedelta(seconds=overlap_s)}
+        newest = datetime.fromisoformat(since) if since else None
+        kind_stats = {"read": 0, "embedded": 0, "unchanged": 0, "too_short": 0}
+        batch: List[Tuple[str, str, int]] = []
+
+        def flush() -> None:
+            if batch:
+                vectors = encoder.encode([text for _, text, _ in batch])
+                store.put([key for key, _, _ in batch], vectors, [fp for _, _, fp in batch])
+                kind_stats["embedded"] += len(batch)
+                batch.clear()
+
+        projection = {f: 1 for f in ("ingested_at", *fields)}
+        cursor = find_comments(db, flt, projection) if kind == "comments" else db[kind].find(flt, projection)
+        for doc in cursor:
+            kind_stats["read"] += 1
+            if doc.get("ingested_at") and (newest is None or _aware(doc["ingested_at"]) > newest):
+                newest = _aware(doc["ingested_at"])
+            text = doc_text(doc, fields)
+            if len(text) < min_chars:
+                kind_stats["too_short"] += 1
+                continue
+            key, fp = f"{kind}\t{doc['_id']}", text_fp(text)
+            if store.fingerprint(key) == fp:
+                kind_stats["unchanged"] += 1
+                continue
+            batch.append((key, text, fp))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        if newest is not None:
+            checkpoints[kind] = newest.isoformat()
+        store.flush()
+        embedded_total += kind_stats["embedded"]
+        stats[kind] = kind_stats
+
+    trained_at = store.meta.get("trained_at", 0)
+    if len(store) and (store.centroids is None or len(store) >= retrain_growth * max(trained_at, 1)):
+        store.train()
+    elapsed = time.perf_counter() - start
+    stats["docs_per_s"] = round(embedded_total / elapsed, 1) if elapsed > 0 else 0.0
+    logger.info("Embeddings updated (%s, %d vectors): %s", store.meta["encoder"], len(store), stats)
+    return stats
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ("float16", "int8")
+
+
+class VectorStore:
+    """
+    Append-mostly matrix of unit vectors on disk, memory-mapped, keyed back to Mongo `_id`s.
+
+    Layout of `root`:
+        meta.json      dim, dtype, count, encoder name, per-source checkpoints
+        vectors.bin    (capacity, dim) float16, or int8 with a float32 scale per row
+        scales.bin     int8 mode only
+        fps.bin        uint64 text fingerprint per row (unchanged text is not re-embedded)
+        lists.bin      int32 IVF list of each row (-1 = not assigned)
+        centroids.npy  IVF centroids
+        keys.txt       "<kind>\\t<_id>" per row, in row order
+
+    Nearest-neighbour search is an IVF index: rows are grouped by nearest k-means
+    centroid; a query scores the `nprobe` closest lists only, exactly, on the
+    memory-mapped rows. Without centroids (small stores) the search is exact.
+
+    Args:
+        root: Directory of the store (created if missing).
+        dim: Vector size (required when creating the store).
+        dtype: 'float16' | 'int8' (when creating the store).
+        encoder: Name of the encoder the vectors come from; a store refuses another one.
+    """
+
+    def __init__(self, root: str, dim: Optional[int] = None, dtype: str = "float16", encoder: Optional[str] = None):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as fh:
+                self.meta = json.load(fh)
+            if dim is not None and dim != self.meta["dim"]:
+                raise ValueError(f"store {root} has dim={self.meta['dim']}, not {dim}")
+            if encoder is not None and encoder != self.meta["encoder"]:
+                raise ValueError(f"store {root} holds {self.meta['encoder']} vectors, not {encoder}")
+        else:
+            if dim is None:
+                raise ValueError("dim is required to create a vector store")
+            if dtype not in DTYPES:
+                raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+            self.meta = {"dim": dim, "dtype": dtype, "count": 0, "capacity": 0, "encoder": encoder,
+                         "checkpoints": {}, "trained_at": 0}
+        self.dim = self.meta["dim"]
+        self.dtype = self.meta["dtype"]
+        self.keys: List[str] = []
+        keys_path = os.path.join(root, "keys.txt")
+        if os.path.exists(keys_path):
+            with open(keys_path) as fh:
+                self.keys = [line.rstrip("\n") for line in fh][: self.meta["count"]]
+        self.rows: Dict[str, int] = {key: i for i, key in enumerate(self.keys)}
+        self._new_keys: List[str] = []
+        centroids_path = os.path.join(root, "centroids.npy")
+        self.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        self._lists: Optional[Dict[int, np.ndarray]] = None
+        self._map(max(self.meta["capacity"], 1024))
+
+    # --- files ---
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _memmap(self, name: str, dtype, shape: Tuple[int, ...], fill=0) -> np.memmap:
+        path = self._path(name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        existing = os.path.getsize(path) if os.path.exists(path) else 0
+        if existing < size:
+            with open(path, "ab") as fh:
+                fh.write(np.full(((size - existing) // np.dtype(dtype).itemsize,), fill, dtype=dtype).tobytes())
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _map(self, capacity: int) -> None:
+        self.meta["capacity"] = capacity
+        self.vectors = self._memmap("vectors.bin", self.dtype, (capacity, self.dim))
+        self.scales = self._memmap("scales.bin", np.float32, (capacity,)) if self.dtype == "int8" else None
+        self.fps = self._memmap("fps.bin", np.uint64, (capacity,))
+        self.lists = self._memmap("lists.bin", np.int32, (capacity,), fill=-1)
+
+    def flush(self) -> None:
+        """Persist the mapped arrays, new keys and meta."""
+        for arr in (self.vectors, self.scales, self.fps, self.lists):
+            if arr is not None:
+                arr.flush()
+        if self._new_keys:
+            with open(self._path("keys.txt"), "a") as fh:
+                fh.writelines(key + "\n" for key in self._new_keys)
+            self._new_keys = []
+        self.meta["count"] = len(self.keys)
+        with open(self._path("meta.json.tmp"), "w") as fh:
+            json.dump(self.meta, fh)
+        os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # --- writes ---
+    def fingerprint(self, key: str) -> Optional[int]:
+        row = self.rows.get(key)
+        return int(self.fps[row]) if row is not None else None
+
+    def put(self, keys: Sequence[str], vectors: np.ndarray, fps: Sequence[int]) -> None:
+        """Insert or overwrite the rows of `keys` ("<kind>\\t<_id>")."""
+        rows = []
+        for key in keys:
+            row = self.rows.get(key)
+            if row is None:
+                row = len(self.keys)
+                self.keys.append(key)
+                self._new_keys.append(key)
+                self.rows[key] = row
+            rows.append(row)
+        if len(self.keys) > self.meta["capacity"]:
+            self._map(max(len(self.keys), 2 * self.meta["capacity"]))
+        rows_arr = np.asarray(rows)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dtype == "int8":
+            scale = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            self.vectors[rows_arr] = np.round(vectors / scale[:, None]).astype(np.int8)
+            self.scales[rows_arr] = scale
+        else:
+            self.vectors[rows_arr] = vectors.astype(np.float16)
+        self.fps[rows_arr] = np.asarray(fps, dtype=np.uint64)
+        self.lists[rows_arr] = self._assign(vectors) if self.centroids is not None else -1
+        self._lists = None
+
+    def matrix(self, rows=slice(None)) -> np.ndarray:
+        """Rows as float32 (all rows by default)."""
+        if isinstance(rows, slice):
+            rows = slice(*rows.indices(len(self.keys)))
+        out = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            out *= self.scales[rows][:, None]
+        return out
+
+    # --- IVF ---
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train(self, nlist: Optional[int] = None, sample: int = 50_000, iters: int = 10, seed: int = 0) -> int:
+        """
+        (Re)build the IVF: spherical k-means on a sample of rows, then assign every row.
+
+        `nlist` defaults to ~sqrt(count). Returns the number of lists.
+        """
+        n = len(self.keys)
+        if n == 0:
+            return 0
+        nlist = nlist or max(1, min(4096, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        data = self.matrix(np.sort(rng.choice(n, size=min(n, sample), replace=False)))
+        self.centroids = kmeans(data, nlist, iters=iters, rng=rng)
+        for start in range(0, n, 65_536):
+            stop = min(n, start + 65_536)
+            self.lists[start:stop] = self._assign(self.matrix(slice(start, stop)))
+        np.save(self._path("centroids.npy"), self.centroids)
+        self.meta["trained_at"] = n
+        self._lists = None
+        self.flush()
+        logger.info("IVF trained: %d lists over %d vectors", len(self.centroids), n)
+        return len(self.centroids)
+
+    def _inverted(self) -> Dict[int, np.ndarray]:
+        if self._lists is None:
+            lists = np.asarray(self.lists[: len(self.keys)])
+            order = np.argsort(lists, kind="stable")
+            bounds = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1))
+            self._lists = {i: order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))}
+        return self._lists
+
+    # --- reads ---
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 16,
+               exclude: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top-k `(key, cosine)` for a unit query vector."""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if self.centroids is None:
+            rows = np.arange(len(self.keys))
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            inverted = self._inverted()
+            rows = np.sort(np.concatenate([inverted[int(c)] for c in probe]))
+        if exclude is not None:
+            rows = rows[rows != exclude]
+        if len(rows) == 0:
+            return []
+        scores = self.matrix(rows) @ query
+        top = np.argsort(-scores)[:k]
+        return [(self.keys[rows[i]], float(scores[i])) for i in top]
+
+    def similar(self, key: str, k: int = 10, nprobe: int = 16) -> List[Tuple[str, float]]:
+        """Nearest neighbours of a stored row (itself excluded)."""
+        row = self.rows[key]
+        return self.search(self.matrix([row])[0], k=k, nprobe=nprobe, exclude=row)
+
+    def topics(self) -> Dict[int, List[str]]:
+        """IVF lists as topic clusters: centroid index -> keys."""
+        if self.centroids is None:
+            raise ValueError("no clusters yet: call train()")
+        return {c: [self.keys[r] for r in rows] for c, rows in self._inverted().items() if len(rows)}
+
+
+def kmeans(data: np.ndarray, k: int, iters: int = 10, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Spherical k-means (cosine) on unit rows; returns (k, dim) unit centroids."""
+    rng = rng or np.random.default_rng(0)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        empty = ~sums.any(axis=1)
+        # an empty cluster restarts on a random point
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+def split_key(key: str) -> Tuple[str, Any]:
+    """'posts\\tabc123' -> ('posts', 'abc123')."""
+    kind, _, _id = key.partition("\t")
+    return kind, _id
@@ -0,0 +1,238 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from ..collectors.archive import RECORDS, DumpSource, dump_subreddit
+from ..collectors.dedup import NearDuplicates
+from ..collectors.normalize import CommentNormalizer, PostNormalizer, normalize_stream
+from ..db.repositories.comments_repo import upsert_comments
+from ..db.repositories.posts_repo import upsert_posts
+from ..db.repositories.state_repo import load_checkpoint, save_checkpoint
+from ..utils.common import ts_now
+
+logger = logging.getLogger(__name__)
+
+UPSERTS = {"posts": upsert_posts, "comments": upsert_comments}
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def time_slices(start: datetime, end: datetime, slice_days: float = 7.0) -> List[Tuple[int, int]]:
+    """`[start, end)` cut into `(start_ts, end_ts)` epoch slices of `slice_days` (the last one may be shorter)."""
+    start, end = _aware(start), _aware(end)
+    step = timedelta(days=slice_days)
+    slices = []
+    while start < end:
+        stop = min(start + step, end)
+        slices.append((int(start.timestamp()), int(stop.timestamp())))
+        start = stop
+    return slices
+
+
+def slice_checkpoint(kind: str, start: int, end: int) -> str:
+    return f"backfill:{kind}:{start}-{end}"
+
+
+def file_checkpoint(kind: str, path: str, start: int, end: int) -> str:
+    return f"backfill:{kind}:file:{os.path.basename(path)}:{start}-{end}"
+
+
+def _new_only(db, kind: str, docs: Iterable[Dict[str, Any]], stats: Dict[str, int],
+              chunk: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Drop the docs already stored: live collection has fresher scores than the archive."""
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        stored = {row["_id"] for row in db[kind].find({"_id": {"$in": [d["_id"] for d in batch]}}, {"_id": 1})}
+        stats["existing"] += len(stored)
+        yield from (d for d in batch if d["_id"] not in stored)
+        batch.clear()
+
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= chunk:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def _load(db, kind: str, objs: Iterable[Dict[str, Any]], stats: Dict[str, Any], *, normalizer,
+          transform_workers: int, skip_existing: bool, dedup: Optional[NearDuplicates],
+          batch_size: int) -> Dict[str, int]:
+    """Archive objects -> normalize stage -> (dedup) -> (new docs only) -> batched upsert; returns its stats."""
+    to_record = RECORDS[kind]
+
+    def records():
+        for obj in objs:
+            stats["read"] += 1
+            yield to_record(obj)
+
+    def clustered(docs):
+        for doc in docs:
+            dedup.assign(doc)
+            yield doc
+
+    docs = normalize_stream(records(), normalizer, workers=transform_workers, stats=stats)
+    if dedup is not None and kind == "posts":
+        docs = clustered(docs)
+    if skip_existing:
+        docs = _new_only(db, kind, docs, stats)
+    return UPSERTS[kind](db, docs, batch_size=batch_size, background=True)
+
+
+def _complete(written: Dict[str, int]) -> bool:
+    # a dropped bulk_write leaves docs unwritten
+    return not written.get("dropped") and written["upserted"] + written["matched"] >= written["seen"]
+
+
+def backfill(
+    db,
+    source,
+    kind: str,
+    subreddits: Sequence[str],
+    start: datetime,
+    end: datetime,
+    *,
+    slice_days: float = 7.0,
+    max_workers: int = 4,
+    batch_size: int = 2000,
+    normalizer=None,
+    transform_workers: int = 0,
+    skip_existing: bool = True,
+    dedup: Optional[NearDuplicates] = None,
+    checkpoint_every: int = 50_000,
+) -> Dict[str, Any]:
+    """
+    Load the history of `subreddits` between `start` and `end` from an archive.
+
+    Every archive object goes through the normalize stage (same filters and doc shape
+    as the live collectors) into `upsert_posts`/`upsert_comments`, and progress is
+    checkpointed in `collector_state` with the subreddits done, so an interrupted
+    load resumes where it stopped and a longer subreddit list only loads what is new.
+
+    - `ArchiveSource` (HTTP): the range is cut into slices of `slice_days`, crawled
+      `max_workers` at a time; a slice is checkpointed once written
+      (`backfill:<kind>:<start>-<end>`) and skipped by the next runs.
+    - `DumpSource` (files): each file is read once for the whole range, `max_workers`
+      files at a time, and its objects are written in chunks of `checkpoint_every`;
+      after each chunk the line reached is checkpointed
+      (`backfill:<kind>:file:<name>:<start>-<end>`), and a resumed run skips the
+      lines already loaded instead of re-reading the file into Mongo.
+
+    Args:
+        db: Mongo database handle.
+        source: `archive.ArchiveSource` (or anything with `iter_slice(kind, subreddits,
+            start_ts, end_ts)` yielding archive objects) or `archive.DumpSource`.
+        kind: 'posts' | 'comments'.
+        subreddits: Subreddits to load.
+        start: Range start (naive = UTC).
+        end: Range end, excluded.
+        slice_days: Slice length of an HTTP crawl; smaller slices resume with less re-work.
+        max_workers: Slices (or dump files) loaded concurrently.
+        batch_size: Ops per bulk_write.
+        normalizer: Chunk transform (default: `PostNormalizer`/`CommentNormalizer` with the
+            live collectors' filters).
+        transform_workers: Processes of the normalize stage (0 = inline).
+        skip_existing: Do not overwrite docs already stored (the live collectors' scores
+            are more recent than the archive's).
+        dedup: Near-duplicate index for posts (see `collectors/dedup.py`).
+        checkpoint_every: Dump objects written between two file checkpoints.
+
+    Returns:
+        Totals: slices (or files) done/skipped/failed, archive objects read, docs
+        written, docs already stored, and the load rate.
+    """
+    if kind not in UPSERTS:
+        raise ValueError(f"Invalid kind '{kind}'. Expected one of {sorted(UPSERTS)}.")
+    normalizer = normalizer or (PostNormalizer() if kind == "posts" else CommentNormalizer())
+    load = partial(_load, db, kind, normalizer=normalizer, transform_workers=transform_workers,
+                   skip_existing=skip_existing, dedup=dedup, batch_size=batch_size)
+    t0 = time.perf_counter()
+
+    def run_slice(bounds: Tuple[int, int]) -> Dict[str, Any]:
+        lo, hi = bounds
+        name = slice_checkpoint(kind, lo, hi)
+        done = set((load_checkpoint(db, name) or {}).get("subreddits", ()))
+        todo = [s for s in subreddits if s.lower() not in done]
+        if not todo:
+            return {"status": "skipped"}
+        stats: Dict[str, Any] = {"read": 0, "existing": 0}
+        written = load(source.iter_slice(kind, todo, lo, hi), stats)
+        stats.update(written)
+        if not _complete(written):
+            logger.error("Backfill slice %s incomplete (%s); not checkpointed", name, written)
+            return {**stats, "status": "failed"}
+        save_checkpoint(db, name, {"subreddits": sorted(done | {s.lower() for s in todo}),
+                                   "start": lo, "end": hi, "docs": written["seen"], "done_at": ts_now()})
+        logger.info("Backfill slice %s done: %s", name, stats)
+        return {**stats, "status": "done"}
+
+    def run_file(path: str) -> Dict[str, Any]:
+        name = file_checkpoint(kind, path, lo, hi)
+        state = load_checkpoint(db, name) or {}
+        done = set(state.get("subreddits", ()))
+        wanted = {s.lower() for s in subreddits}
+        if dump_subreddit(path) is not None:   # a per-subreddit dump holds nothing else
+            wanted &= {dump_subreddit(path)}
+        todo = sorted(wanted - done)
+        if not todo:
+            return {"status": "skipped"}
+        # an interrupted pass over the same subreddits resumes after its last chunk
+        line = state.get("line", 0) if state.get("pass") == todo else 0
+        if line:
+            logger.info("Backfill of %s resumes after line %d", path, line)
+        stats: Dict[str, Any] = {"read": 0, "existing": 0, "seen": 0}
+        rows = source.iter_file(path, kind, todo, lo, hi, skip=line)
+        try:
+            while True:
+                chunk = list(islice(rows, checkpoint_every))
+                if not chunk:
+                    break
+                written = load((obj for _, obj in chunk), stats)
+                stats["seen"] += written["seen"]
+                if not _complete(written):
+                    logger.error("Backfill of %s incomplete after line %d (%s); resume point kept", path, line, written)
+                    return {**stats, "status": "failed"}
+                line = chunk[-1][0]
+                save_checkpoint(db, name, {**state, "pass": todo, "line": line})
+        finally:
+            rows.close()
+        save_checkpoint(db, name, {"subreddits": sorted(done | set(todo)), "start": lo, "end": hi,
+                                   "docs": stats["seen"], "done_at": ts_now()})
+        logger.info("Backfill of %s done: %s", path, stats)
+        return {**stats, "status": "done"}
+
+    if isinstance(source, DumpSource):
+        lo, hi = int(_aware(start).timestamp()), int(_aware(end).timestamp())
+        units, run_unit, unit, label = source.files(kind, subreddits, lo, hi), run_file, "files", str
+    else:
+        units, run_unit, unit = time_slices(start, end, slice_days), run_slice, "slices"
+        label = lambda bounds: slice_checkpoint(kind, *bounds)
+
+    totals: Dict[str, Any] = {unit: len(units), "done": 0, "skipped": 0, "failed": 0,
+                              "read": 0, "written": 0, "existing": 0}
+    logger.info("Backfill of %s for %d subreddits: %d %s, %d workers",
+                kind, len(subreddits), len(units), unit, max_workers)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(run_unit, u) for u in units]
+        for u, fut in zip(units, futures):
+            try:
+                res = fut.result()
+            except Exception:
+                logger.exception("Backfill of %s failed", label(u))
+                res = {"status": "failed"}
+            totals[res["status"]] += 1
+            totals["read"] += res.get("read", 0)
+            totals["written"] += res.get("seen", 0)
+            totals["existing"] += res.get("existing", 0)
+    elapsed = time.perf_counter() - t0
+    totals["elapsed_s"] = round(elapsed, 2)
+    totals["docs_per_s"] = round(totals["written"] / elapsed, 1) if elapsed > 0 else 0.0
+    logger.info("Backfill of %s complete: %s", kind, totals)
+    return totals
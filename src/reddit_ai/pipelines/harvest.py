@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, Tuple
+from ..collectors.comments import SeenComments, fetch_comments_details, prefetch_submissions
+from ..collectors.normalize import CommentNormalizer, normalize_stream
+from ..db.repositories.comments_repo import comments_schema, upsert_comments, warm_seen_comments
+from ..db.repositories.fingerprints import DeltaFilter
+from ..db.repositories.posts_repo import mark_comments_harvested
+from ..utils.common import ts_now
+from ..utils.concurrency import merge_generators
+from ..utils.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+def harvest_comments(
+    db,
+    reddit,
+    post_ids: Iterable[str],
+    *,
+    max_workers: int = 4,
+    batch_size: int = 500,
+    background: bool = True,
+    delta: DeltaFilter | None = None,
+    seen: SeenComments | None = None,
+    prefetch: bool = True,
+    limiter: RateLimiter | None = None,
+    queue_size: int = 2000,
+    transform_workers: int = 0,
+    chunk_size: int = 200,
+    ordered: bool = False,
+    **fetch_kwargs,
+) -> Dict[str, Any]:
+    """
+    Fetch comments for many posts on N workers and write them through one batched writer.
+
+    Post IDs are fanned out to `max_workers` threads running `fetch_comments_details`;
+    their docs are funnelled into a single `upsert_comments` call on the calling thread,
+    so Reddit latency overlaps with Mongo writes instead of adding up.
+
+    Args:
+        db: Mongo database handle.
+        reddit: Authenticated PRAW Reddit instance.
+        post_ids: IDs of the posts to harvest.
+        max_workers: Number of posts fetched concurrently.
+        batch_size: Ops per bulk_write in the shared writer.
+        background: Run the writer's bulk_writes on a flusher thread (see `upsert_comments`).
+        delta: Skip/shrink writes of unchanged comments (see `comments_delta_filter`).
+        seen: Known-comment cache, warmed from Mongo with one query per post; known,
+            unchanged comments never reach the writer, written ones are added to it.
+            Reuse it across harvests.
+        prefetch: Resolve all submissions up front via `prefetch_submissions` (100 per
+            call), skip removed or comment-less posts, and reuse the cached metadata.
+        limiter: Shared rate budget (one synced from `reddit` is created if None).
+        queue_size: Max docs buffered between fetch workers and the writer.
+        transform_workers: Processes of the normalize stage: the fetch threads only read raw
+            records, filtering and doc building run in `CommentNormalizer` chunks of
+            `chunk_size` (see `normalize.normalize_stream`). 0 = normalize in the fetch threads.
+        chunk_size: Records per normalize task.
+        ordered: Keep the fetch order through the normalize stage.
+        **fetch_kwargs: Forwarded to `fetch_comments_details` (sort, cap, limit, ...).
+
+    Each post fully fetched gets `comments_harvested_at` and the `num_comments` it had
+    (`posts_repo.mark_comments_harvested`) once its comments are written, also when
+    every comment was already known or filtered out; `plan_refresh` plans from these.
+    Nothing is marked if the writer dropped a batch.
+
+    Returns:
+        The `upsert_comments` stats, plus per-stage throughput (posts/s, comments/s),
+        the number of posts skipped after prefetch and marked as harvested, and, with a
+        normalize stage, its counts.
+    """
+    post_ids = list(post_ids)
+    if limiter is None:
+        limiter = RateLimiter.from_reddit(reddit)
+    lock = threading.Lock()
+    fetched = {"posts": 0, "comments": 0, "done_at": None}
+    harvested: Dict[str, Tuple[Any, int]] = {}
+    schema = comments_schema(db)   # stored layout, read once for the pre-warm queries and the writer
+    waited = 0.0
+    start = time.perf_counter()
+
+    def for_post(pid: str) -> Iterator[Dict[str, Any]]:
+        n = 0
+        if seen is not None:
+            warm_seen_comments(db, seen, pid, schema=schema)
+        # lazy, like fetch_comments_details would build it; kept to read num_comments afterwards
+        submission = prefetched.get(pid) or reddit.submission(id=pid)
+        docs = fetch_comments_details(reddit, pid, limiter=limiter, seen=seen,
+                                      submission=submission, **fetch_kwargs)
+        for doc in docs:
+            n += 1
+            yield doc
+        with lock:
+            fetched["posts"] += 1
+            fetched["comments"] += n
+            fetched["done_at"] = time.perf_counter()
+            harvested[pid] = (ts_now(), int(getattr(submission, "num_comments", 0) or 0))
+
+    def timed(docs: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        # time the writer spends blocked on the fetch stage
+        nonlocal waited
+        while True:
+            t0 = time.perf_counter()
+            try:
+                doc = next(docs)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - t0
+            yield doc
+
+    prefetched = prefetch_submissions(reddit, post_ids, limiter=limiter) if prefetch else {}
+    targets = []
+    for pid in post_ids:
+        submission = prefetched.get(pid)
+        if submission is not None and (
+            getattr(submission, "removed_by_category", None) is not None
+            or getattr(submission, "num_comments", 1) == 0
+        ):
+            continue
+        targets.append(pid)   # posts missing from the prefetch are fetched lazily
+
+    logger.info("Harvesting comments for %d posts | workers=%d | skipped after prefetch=%d",
+                len(targets), max_workers, len(post_ids) - len(targets))
+    normalizer = None
+    if transform_workers > 0:
+        normalizer = CommentNormalizer(**{k: fetch_kwargs.pop(k) for k in ("skip_bots", "english_only", "lang_filter")
+                                          if k in fetch_kwargs})
+        fetch_kwargs["raw"] = True
+    docs = merge_generators([partial(for_post, pid) for pid in targets], max_workers=max_workers, maxsize=queue_size)
+    normalized: Dict[str, int] = {}
+    if normalizer is not None:
+        docs = normalize_stream(docs, normalizer, workers=transform_workers, chunk_size=chunk_size,
+                                ordered=ordered, stats=normalized)
+    stats: Dict[str, Any] = upsert_comments(db, timed(docs), batch_size=batch_size,
+                                              background=background, delta=delta, schema=schema, seen=seen)
+    if stats["dropped"]:
+        logger.warning("%d comment batches dropped; %d posts not marked as harvested",
+                       stats["dropped"], len(harvested))
+        stats["marked_posts"] = 0
+    else:
+        stats["marked_posts"] = mark_comments_harvested(db, harvested)
+
+    elapsed = time.perf_counter() - start
+    fetch_elapsed = max((fetched["done_at"] or start) - start, 1e-9)
+    write_busy = max(elapsed - waited, 1e-9)
+    stats.update(
+        posts=fetched["posts"],
+        skipped_posts=len(post_ids) - len(targets),
+        elapsed_s=round(elapsed, 2),
+        fetch_posts_per_s=round(fetched["posts"] / fetch_elapsed, 2),
+        fetch_comments_per_s=round(fetched["comments"] / fetch_elapsed, 2),
+        write_comments_per_s=round(stats["seen"] / write_busy, 2),
+        rate_wait_s=round(limiter.stats["wait_s"], 2),   # cumulative for a shared limiter
+    )
+    if normalizer is not None:
+        stats["normalize"] = normalized
+    logger.info(
+        "Harvest done in %.2fs | fetch: %.2f posts/s, %.2f comments/s | write: %.2f comments/s",
+        stats["elapsed_s"], stats["fetch_posts_per_s"], stats["fetch_comments_per_s"], stats["write_comments_per_s"],
+    )
+    return stats
@@ -0,0 +1,234 @@
+import logging
+import time
+import praw
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from ..collectors.comments import SeenComments
+from ..collectors.dedup import NearDuplicates
+from ..collectors.posts import fetch_posts_concurrent
+from ..config import REDDIT
+from ..db.mongo import ensure_indexes, get_db
+from ..db.repositories.comments_repo import comments_delta_filter
+from ..db.repositories.posts_repo import (
+    one_per_cluster, posts_delta_filter, target_post_ids, upsert_posts, warm_near_duplicates,
+)
+from ..db.repositories.state_repo import HighWaterMarks
+from ..utils.ratelimit import RateLimiter
+from .harvest import harvest_comments
+from .refresh import plan_refresh
+
+logger = logging.getLogger(__name__)
+
+# The hourly cycle formerly run script by script (scripts/top_day.py, new.py, hot.py,
+# c_top.py, c_new.py, c_hot.py). Limits are per subreddit, by group.
+HOURLY: Dict[str, Any] = {
+    "groups": {
+        "FAST": ["DeepSeek", "ChatGPT", "claude", "Copilot"],
+        "CORE": ["artificial", "MachineLearning", "deeplearning"],
+        "CREATOR": ["LocalLLaMA", "StableDiffusion", "generativeAI"],
+    },
+    "posts": {
+        "top_day": {"listing": "top", "time_filter": "all", "window_days": 5000,
+                    "limits": {"FAST": 150, "CORE": 120, "CREATOR": 120}},
+        "new": {"listing": "new", "window_days": 14, "high_water": True,
+                "limits": {"FAST": 250, "CORE": 200, "CREATOR": 200}},
+        "hot": {"listing": "hot", "window_days": 14,
+                "limits": {"FAST": 80, "CORE": 60, "CREATOR": 60}},
+    },
+    "comments": {
+        # `after`: the posts task whose listing (seen_in) the targets are picked from;
+        # targets are the top `per_sub` posts by score, or, with `budget`, the posts with
+        # the most expected new comments per API call (pipelines/refresh.plan_refresh)
+        "c_top": {"after": "top_day", "seen_in": "top", "per_sub": {"FAST": 50, "CORE": 40, "CREATOR": 40},
+                  "sort": "top", "cap": 500, "limit": 200, "top_level_only": True},
+        "c_new": {"after": "new", "seen_in": "new", "budget": 300,
+                  "sort": "new", "cap": 400, "limit": 150, "top_level_only": True},
+        "c_hot": {"after": "hot", "seen_in": "hot", "budget": 250,
+                  "sort": "hot", "cap": 300, "limit": 120, "top_level_only": True},
+    },
+    "snapshots": "bucket",  # score/comment-count history of every changed post (snapshots_repo)
+    "dedup": True,          # cluster near-identical posts; comments are harvested once per cluster
+    "post_workers": 4,      # subreddits fetched concurrently, per posts task
+    "comment_workers": 4,   # posts harvested concurrently, per comments task
+    "transform_workers": 0, # >0: filter/normalize docs on that many processes (collectors/normalize.py)
+}
+
+
+class Task:
+    """A named unit of work that may start once every task in `after` succeeded."""
+
+    def __init__(self, name: str, fn: Callable[[], Any], after: Iterable[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.after = tuple(after)
+
+
+def run_dag(tasks: List[Task], max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run tasks on a thread pool as soon as their dependencies are done.
+
+    A failed task is logged and its dependents are skipped; independent tasks go on.
+
+    Returns:
+        Per task name: `status` (ok | failed | skipped), `elapsed_s` and the task's return value as `stats`.
+    """
+    by_name = {t.name: t for t in tasks}
+    for t in tasks:
+        missing = [d for d in t.after if d not in by_name]
+        if missing:
+            raise ValueError(f"Task {t.name!r} depends on unknown tasks {missing}")
+
+    def timed(task: Task) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            stats = task.fn()
+            status = "ok"
+        except Exception:
+            logger.exception("Task %s failed", task.name)
+            stats, status = None, "failed"
+        return {"status": status, "elapsed_s": round(time.perf_counter() - start, 2), "stats": stats}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    waiting = dict(by_name)
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as pool:
+        running: Dict[Any, Task] = {}
+
+        def launch_ready() -> None:
+            progressed = True
+            while progressed:
+                progressed = False
+                for task in list(waiting.values()):
+                    if not all(d in results for d in task.after):
+                        continue
+                    del waiting[task.name]
+                    progressed = True
+                    if any(results[d]["status"] != "ok" for d in task.after):
+                        logger.warning("Task %s skipped: a dependency did not succeed", task.name)
+                        results[task.name] = {"status": "skipped", "elapsed_s": 0.0, "stats": None}
+                        continue
+                    logger.info("Task %s started", task.name)
+                    running[pool.submit(timed, task)] = task
+
+        launch_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                task = running.pop(fut)
+                results[task.name] = fut.result()
+                logger.info("Task %s %s in %.2fs", task.name, results[task.name]["status"], results[task.name]["elapsed_s"])
+            launch_ready()
+
+    if waiting:
+        raise ValueError(f"Dependency cycle between tasks {sorted(waiting)}")
+    return results
+
+
+def _per_sub(groups: Dict[str, List[str]], by_group: Dict[str, int]) -> Dict[str, int]:
+    return {sub: by_group[group] for group, subs in groups.items() if group in by_group for sub in subs}
+
+
+def build_tasks(config: Dict[str, Any], reddit, db, limiter: RateLimiter, seen: SeenComments,
+                dedup: Optional[NearDuplicates] = None) -> List[Task]:
+    """One task per posts listing and per comments harvest, the latter after its listing."""
+    groups = config["groups"]
+    tasks = []
+
+    def posts_task(spec: Dict[str, Any]) -> Callable[[], Dict[str, Any]]:
+        def run() -> Dict[str, Any]:
+            limits = _per_sub(groups, spec["limits"])
+            marks = HighWaterMarks.load(db, spec["listing"]) if spec.get("high_water") else None
+            gen = fetch_posts_concurrent(
+                reddit, list(limits), limits,
+                max_workers=config.get("post_workers", 4), limiter=limiter,
+                listing=spec["listing"], time_filter=spec.get("time_filter", "day"),
+                window_days=spec.get("window_days", 14), since=marks,
+                english_only=True, skip_bots=True, include_nsfw=False, dedup=dedup,
+                transform_workers=config.get("transform_workers", 0),
+            )
+            stats = upsert_posts(db, gen, batch_size=500, background=True,
+                                 delta=posts_delta_filter(db), snapshots=config.get("snapshots"),
+                                 on_written=marks.observe if marks is not None else None)
+            if marks is not None:
+                # marks only move to written posts; a dropped batch would leave a gap behind them
+                if stats["dropped"]:
+                    logger.warning("%d post batches dropped; %s high-water marks not saved",
+                                   stats["dropped"], spec["listing"])
+                else:
+                    marks.save(db)
+            return stats
+        return run
+
+    def comments_task(spec: Dict[str, Any]) -> Callable[[], Dict[str, Any]]:
+        def run() -> Dict[str, Any]:
+            if spec.get("budget"):
+                subs = [sub for group in groups.values() for sub in group]
+                post_ids = [t["post_id"] for t in plan_refresh(db, subs, budget=spec["budget"], limit=spec["limit"],
+                                                               seen_in=spec.get("seen_in"), tree=spec.get("tree", False))]
+            else:
+                post_ids = target_post_ids(db, groups, spec["per_sub"], spec["seen_in"])
+                if config.get("dedup"):
+                    post_ids = one_per_cluster(db, post_ids)
+            return harvest_comments(
+                db, reddit, post_ids,
+                max_workers=config.get("comment_workers", 4), limiter=limiter, batch_size=500,
+                delta=comments_delta_filter(db), seen=seen,
+                sort=spec["sort"], cap=spec["cap"], limit=spec["limit"],
+                top_level_only=spec.get("top_level_only", True), tree=spec.get("tree", False),
+                skip_bots=True, english_only=True, debug_samples=2,
+                transform_workers=config.get("transform_workers", 0),
+            )
+        return run
+
+    for name, spec in config.get("posts", {}).items():
+        tasks.append(Task(name, posts_task(spec)))
+    for name, spec in config.get("comments", {}).items():
+        tasks.append(Task(name, comments_task(spec), after=[spec["after"]] if spec.get("after") else []))
+    return tasks
+
+
+def run_cycle(
+    config: Dict[str, Any] = HOURLY,
+    *,
+    reddit=None,
+    db=None,
+    only: Optional[Iterable[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run one collection cycle described by `config` as a task DAG.
+
+    Posts listings run concurrently; each comments harvest starts as soon as the
+    listing it depends on has been upserted. One Reddit client, one index check,
+    one rate budget, one known-comment cache and one near-duplicate index are
+    shared by every task.
+
+    Args:
+        config: Declarative cycle, shaped like `HOURLY`.
+        reddit: PRAW Reddit instance (built from config.REDDIT if None).
+        db: Mongo database handle (`get_db()` if None).
+        only: Restrict the run to these task names (dependencies must be included).
+
+    Returns:
+        The `run_dag` results per task.
+    """
+    reddit = reddit or praw.Reddit(**REDDIT)
+    db = get_db() if db is None else db
+    ensure_indexes(db)
+    limiter = RateLimiter.from_reddit(reddit)
+
+    dedup = None
+    if config.get("dedup"):
+        dedup = NearDuplicates()
+        # as far back as the widest posts window (top_day reads years of posts)
+        window_days = max((spec.get("window_days", 14) for spec in config.get("posts", {}).values()), default=14)
+        warm_near_duplicates(db, dedup, [sub for group in config["groups"].values() for sub in group],
+                             window_days=window_days)
+    tasks = build_tasks(config, reddit, db, limiter, SeenComments(), dedup)
+    if only is not None:
+        keep = set(only)
+        tasks = [t for t in tasks if t.name in keep]
+    start = time.perf_counter()
+    results = run_dag(tasks)
+    logger.info("Cycle done in %.2fs | %s", time.perf_counter() - start,
+                ", ".join(f"{name}={r['status']}({r['elapsed_s']}s)" for name, r in results.items()))
+    limiter.report()
+    return results
@@ -0,0 +1,161 @@
+import heapq
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reddit threads get most of their comments within hours; comment arrival is
+# modelled as decaying exponentially with post age.
+HALF_LIFE_H = 6.0
+
+# a submission fetch returns ~200 comments; each further "load more" call ~100
+INITIAL_COMMENTS = 200
+COMMENTS_PER_MORE = 100
+
+
+def _hours(seconds: float) -> float:
+    return max(seconds, 0.0) / 3600.0
+
+
+def _ts(value) -> Optional[float]:
+    """Epoch seconds of a Mongo datetime (naive = UTC) or a number."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def expected_new_comments(
+    num_comments: int,
+    age_seen_h: float,
+    age_now_h: float,
+    age_harvest_h: Optional[float],
+    half_life_h: float = HALF_LIFE_H,
+) -> float:
+    """
+    New comments expected since the last harvest.
+
+    The share of a thread's final comment count reached at age `a` is modelled as
+    F(a) = 1 - exp(-a / tau). The final count is extrapolated from `num_comments`
+    observed at `age_seen_h`; the yield is the growth between the last harvest and
+    now (the whole current count if never harvested).
+    """
+    tau = half_life_h / math.log(2)
+    share = lambda age: 1.0 - math.exp(-max(age, 0.0) / tau)
+    final = num_comments / max(share(age_seen_h), 0.05)
+    done = share(age_harvest_h) if age_harvest_h is not None else 0.0
+    return max(final * (share(age_now_h) - done), 0.0)
+
+
+def refresh_query(
+    subreddits: Sequence[str],
+    *,
+    seen_in: Optional[str] = None,
+    max_age_days: float = 7.0,
+    now: Optional[float] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """`(filter, projection)` of the posts `plan_refresh` scores."""
+    now = now if now is not None else datetime.now(timezone.utc).timestamp()
+    flt: Dict[str, Any] = {"subreddit": {"$in": list(subreddits)}, "created_utc": {"$gte": now - max_age_days * 86400}}
+    if seen_in:
+        flt["seen_in"] = seen_in
+    projection = {"post_id": 1, "subreddit": 1, "created_utc": 1, "first_seen_at": 1, "last_seen_at": 1,
+                  "num_comments_max": 1, "score_max": 1, "cluster_id": 1,
+                  "comments_harvested_at": 1, "comments_harvested_num": 1}
+    return flt, projection
+
+
+def plan_refresh(
+    db,
+    subreddits: Sequence[str],
+    *,
+    budget: int,
+    limit: int = 150,
+    seen_in: Optional[str] = None,
+    max_age_days: float = 7.0,
+    half_life_h: float = HALF_LIFE_H,
+    tree: bool = False,
+    min_yield: float = 1.0,
+    now: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Pick the posts whose comments are worth re-fetching, within an API-call budget.
+
+    For every recent post, comment velocity and expected new comments since the last
+    harvest are estimated from `created_utc`, `last_seen_at`, `num_comments_max` and
+    the harvest marks `harvest_comments` leaves on the post (`comments_harvested_at`,
+    `comments_harvested_num`: the comment count growth since then is a floor of the
+    estimate); posts are then taken by expected yield per API call until
+    `budget` calls are spent. Fast-growing new threads come first, saturated old
+    threads drop out, and only the best post of a near-duplicate cluster
+    (`cluster_id`, see `collectors/dedup.py`) is taken.
+
+    Args:
+        db: Mongo database handle.
+        subreddits: Subreddits to consider.
+        budget: API calls to spend (one per post, plus expansions in tree mode).
+        limit: Comments kept per post by the harvest; caps the yield of one post.
+        seen_in: Only posts seen in this listing.
+        max_age_days: Ignore posts older than this.
+        half_life_h: Half-life of a thread's comment activity.
+        tree: The harvest expands "load more" stubs; big yields cost more calls.
+        min_yield: Skip posts expected to bring fewer new comments.
+        now: Epoch seconds (default: current time).
+
+    Returns:
+        Targets by decreasing priority, with `post_id`, `subreddit`, `expected_new`,
+        `velocity` (comments/hour), `harvested_at` (epoch seconds of the last harvest or
+        None), `cost` (API calls), `priority` (yield per call) and `cluster_id`.
+    """
+    now = now if now is not None else datetime.now(timezone.utc).timestamp()
+    posts = list(db.posts.find(*refresh_query(subreddits, seen_in=seen_in, max_age_days=max_age_days, now=now)))
+
+    heap = []
+    for post in posts:
+        created = float(post.get("created_utc") or 0)
+        seen_at = _ts(post.get("last_seen_at")) or _ts(post.get("first_seen_at")) or now
+        num = int(post.get("num_comments_max") or 0)
+        harvested_at = _ts(post.get("comments_harvested_at"))
+        age_seen = _hours(seen_at - created)
+        expected = expected_new_comments(
+            num, age_seen, _hours(now - created),
+            _hours(harvested_at - created) if harvested_at is not None else None,
+            half_life_h,
+        )
+        if harvested_at is not None:
+            # comments already counted by the listings since the harvest
+            expected = max(expected, num - int(post.get("comments_harvested_num") or 0))
+        gain = min(expected, limit)
+        if gain < min_yield:
+            continue
+        cost = 1.0 + (max(0.0, gain - INITIAL_COMMENTS) / COMMENTS_PER_MORE if tree else 0.0)
+        # ties go to the higher-scoring post
+        heapq.heappush(heap, (-gain / cost, -int(post.get("score_max") or 0), post["post_id"], {
+            "post_id": post["post_id"],
+            "subreddit": post.get("subreddit"),
+            "expected_new": round(gain, 1),
+            "velocity": round(num / max(age_seen, 0.25), 2),
+            "harvested_at": harvested_at,
+            "cost": round(cost, 2),
+            "priority": round(gain / cost, 2),
+            "cluster_id": post.get("cluster_id") or post["post_id"],
+        }))
+
+    targets: List[Dict[str, Any]] = []
+    clusters = set()
+    spent = 0.0
+    while heap and spent < budget:
+        target = heapq.heappop(heap)[-1]
+        if spent + target["cost"] > budget or target["cluster_id"] in clusters:
+            continue
+        spent += target["cost"]
+        clusters.add(target["cluster_id"])
+        targets.append(target)
+    logger.info("Refresh plan: %d/%d posts | %.0f/%d calls | ~%.0f new comments expected",
+                len(targets), len(posts), spent, budget, sum(t["expected_new"] for t in targets))
+    return targets
@@ -0,0 +1,266 @@
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from ..db.repositories.comments_repo import find_comments
+
+logger = logging.getLogger(__name__)
+
+# text columns indexed per source collection: (title, body)
+SOURCES = {"posts": ("title", "selftext"), "comments": (None, "body")}
+
+# BM25 weights of the FTS columns: title, body, subreddit (filter only)
+WEIGHTS = (3.0, 1.0, 0.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    rowid INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    subreddit TEXT,
+    post_id TEXT,
+    created_utc INTEGER,
+    title TEXT,
+    body TEXT,
+    UNIQUE (kind, doc_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(
+    title, body, subreddit,
+    content='docs', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def _epoch(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(_aware(value).timestamp())
+    return int(value)
+
+
+def fts_query(text: str) -> str:
+    """
+    Plain keywords to an FTS5 query: every word must match, `word*` is a prefix,
+    `"a phrase"` is kept as a phrase. Punctuation such as "gpt-4o" cannot break the syntax.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase:
+            parts.append('"' + phrase.replace('"', '') + '"')
+        elif word:
+            prefix = word.endswith("*") and len(word) > 1
+            word = word.rstrip("*").replace('"', '')
+            if word:
+                parts.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(parts)
+
+
+class SearchIndex:
+    """
+    Local full-text index of the `posts` and `comments` collections (SQLite FTS5).
+
+    Text lives once in the `docs` table; `fts` is an external-content FTS5 index on it,
+    ranked with BM25 (titles weigh more than bodies). Subreddit is an FTS column so
+    a subreddit filter is part of the index lookup; the time range is checked on the
+    matching rows. Query time grows with the number of matching docs, not the index
+    size: selective keywords answer in a few ms over millions of comments.
+    `update` indexes only what was ingested since the last update, so the index
+    follows Mongo incrementally.
+
+    Args:
+        path: SQLite file (created if missing).
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._drop_legacy_schema()
+        self.conn.executescript(_SCHEMA)
+
+    def _drop_legacy_schema(self) -> None:
+        # early index files keyed docs on doc_id alone, so a post and a comment sharing
+        # a base36 id collided; their rows cannot be told apart, the index is rebuilt
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'docs'").fetchone()
+        if row is None or "UNIQUE (kind, doc_id)" in row[0]:
+            return
+        logger.warning("Search index %s keys docs on doc_id only; rebuilding it", self.path)
+        self.conn.executescript("DROP TABLE IF EXISTS fts; DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS meta;")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # --- state ---
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    # --- writes ---
+    def add(self, kind: str, docs: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Index or re-index docs of one source collection; returns inserted/updated counts."""
+        title_field, body_field = SOURCES[kind]
+        stats = {"inserted": 0, "updated": 0}
+        cur = self.conn.cursor()
+        for doc in docs:
+            title = (doc.get(title_field) or "") if title_field else ""
+            body = doc.get(body_field) or ""
+            sub = doc.get("subreddit") or ""
+            row = cur.execute("SELECT rowid, title, body, subreddit FROM docs WHERE kind = ? AND doc_id = ?",
+                              (kind, doc["_id"])).fetchone()
+            if row is not None:
+                if (row[1], row[2], row[3]) == (title, body, sub):
+                    continue
+                cur.execute("INSERT INTO fts (fts, rowid, title, body, subreddit) VALUES ('delete', ?, ?, ?, ?)", row)
+                cur.execute("UPDATE docs SET title = ?, body = ?, subreddit = ? WHERE rowid = ?",
+                            (title, body, sub, row[0]))
+                rowid = row[0]
+                stats["updated"] += 1
+            else:
+                cur.execute(
+                    "INSERT INTO docs (doc_id, kind, subreddit, post_id, created_utc, title, body)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc["_id"], kind, sub, doc.get("post_id") or (doc["_id"] if kind == "posts" else None),
+                     _epoch(doc.get("created_utc")), title, body),
+                )
+                rowid = cur.lastrowid
+                stats["inserted"] += 1
+            cur.execute("INSERT INTO fts (rowid, title, body, subreddit) VALUES (?, ?, ?, ?)",
+                        (rowid, title, body, sub))
+        return stats
+
+    def update(
+        self,
+        db,
+        sources: Sequence[str] = ("posts", "comments"),
+        batch_size: int = 5000,
+        overlap_s: float = 900,
+    ) -> Dict[str, Any]:
+        """
+        Index the docs ingested since the previous update (all docs the first time).
+
+        The checkpoint (newest `ingested_at` indexed, per source) is kept in the index
+        file itself, so deleting the file rebuilds from scratch. `overlap_s` seconds
+        before it are re-read for batches written late; unchanged docs are skipped.
+
+        Returns:
+            Per source: docs read, inserted and updated.
+        """
+        stats: Dict[str, Any] = {}
+        for kind in sources:
+            title_field, body_field = SOURCES[kind]
+            since = self._get_meta(f"checkpoint:{kind}")
+            flt: Dict[str, Any] = {}
+            if since:
+                flt["ingested_at"] = {"$gt": datetime.fromisoformat(since) - timedelta(seconds=overlap_s)}
+            fields = ("subreddit", "post_id", "created_utc", "ingested_at", body_field) + ((title_field,) if title_field else ())
+            newest = datetime.fromisoformat(since) if since else None
+            kind_stats = {"read": 0, "inserted": 0, "updated": 0}
+            batch: List[Dict[str, Any]] = []
+
+            def flush(final: bool = False) -> None:
+                for key, n in self.add(kind, batch).items():
+                    kind_stats[key] += n
+                # the cursor is unordered: the checkpoint only moves once every doc was read
+                if final and newest is not None:
+                    self._set_meta(f"checkpoint:{kind}", newest.isoformat())
+                self.conn.commit()
+                batch.clear()
+
+            projection = {f: 1 for f in fields}
+            cursor = find_comments(db, flt, projection) if kind == "comments" else db[kind].find(flt, projection)
+            for doc in cursor:
+                batch.append(doc)
+                kind_stats["read"] += 1
+                if doc.get("ingested_at") and (newest is None or _aware(doc["ingested_at"]) > newest):
+                    newest = _aware(doc["ingested_at"])
+                if len(batch) >= batch_size:
+                    flush()
+            flush(final=True)
+            stats[kind] = kind_stats
+        logger.info("Search index updated: %s", stats)
+        return stats
+
+    def optimize(self) -> None:
+        """Merge the FTS segments (after a large build)."""
+        self.conn.execute("INSERT INTO fts (fts) VALUES ('optimize')")
+        self.conn.commit()
+
+    # --- reads ---
+    def search(
+        self,
+        query: str,
+        *,
+        subreddits: Optional[Sequence[str]] = None,
+        since: Optional[datetime | int] = None,
+        until: Optional[datetime | int] = None,
+        kind: Optional[str] = None,
+        k: int = 20,
+        raw: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25-ranked keyword search.
+
+        Args:
+            query: Keywords (see `fts_query`), or an FTS5 expression if `raw`.
+            subreddits: Only these subreddits.
+            since: Only docs created at or after (datetime or epoch seconds).
+            until: Only docs created before.
+            kind: 'posts' | 'comments'.
+            k: Max results.
+            raw: Pass `query` to FTS5 unchanged (AND/OR/NOT, NEAR, column filters).
+
+        Returns:
+            Best first: `_id`, `kind`, `subreddit`, `post_id`, `created_utc`, `score`
+            (BM25, higher is better) and a `snippet` with matches in [brackets].
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        if subreddits:
+            subs = " OR ".join('"' + s.replace('"', "") + '"' for s in subreddits)
+            match = f"({match}) AND subreddit : ({subs})"
+        sql = [
+            "SELECT d.doc_id, d.kind, d.subreddit, d.post_id, d.created_utc,",
+            f" bm25(fts, {', '.join(map(str, WEIGHTS))}) AS rank,",
+            " snippet(fts, -1, '[', ']', '…', 12)",
+            " FROM fts JOIN docs d ON d.rowid = fts.rowid WHERE fts MATCH ?",
+        ]
+        params: List[Any] = [match]
+        if since is not None:
+            sql.append(" AND d.created_utc >= ?")
+            params.append(_epoch(since))
+        if until is not None:
+            sql.append(" AND d.created_utc < ?")
+            params.append(_epoch(until))
+        if kind:
+            sql.append(" AND d.kind = ?")
+            params.append(kind)
+        sql.append(" ORDER BY rank LIMIT ?")
+        params.append(k)
+
+        start = time.perf_counter()
+        rows = self.conn.execute("".join(sql), params).fetchall()
+        logger.debug("search %r: %d hits in %.1f ms", match, len(rows), (time.perf_counter() - start) * 1000)
+        return [
+            {"_id": r[0], "kind": r[1], "subreddit": r[2], "post_id": r[3], "created_utc": r[4],
+             "score": round(-r[5], 3), "snippet": r[6]}
+            for r in rows
+        ]
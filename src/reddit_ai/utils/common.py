@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from .lang import ascii_letter_ratio
 
 def is_englishish(text: str, min_len: int = 10, min_ascii_ratio: float = 0.6) -> bool:
     """Tiny heuristic: require minimal length and enough ASCII letters."""
@@ -7,7 +8,6 @@ def is_englishish(text: str, min_len: int = 10, min_ascii_ratio: float = 0.6) ->
     t = text.strip()
     if len(t) < min_len:
         return False
-    letters = sum(ch.isascii() and ch.isalpha() for ch in t)
-    return (letters / max(1, len(t))) >= min_ascii_ratio
+    return ascii_letter_ratio(t) >= min_ascii_ratio
 def ts_now():
-    return datetime.now(timezone.utc)
\ No newline at end of file
+    return datetime.now(timezone.utc)
@@ -0,0 +1,128 @@
+import logging
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+def merge_generators(
+    factories: Iterable[Callable[[], Iterable[T]]],
+    max_workers: int = 4,
+    maxsize: int = 1000,
+) -> Iterator[T]:
+    """
+    Run each generator factory on a bounded thread pool and yield their items as one stream.
+
+    Items are funnelled through a bounded queue, so slow consumers apply backpressure
+    to the workers. Closing the returned generator early stops the workers at their
+    next item.
+
+    Args:
+        factories: Zero-arg callables, each returning an iterable to drain in a worker.
+        max_workers: Size of the thread pool.
+        maxsize: Capacity of the queue between workers and the consumer.
+    """
+    factories = list(factories)
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(factory):
+        try:
+            for item in factory():
+                if not put(item):
+                    return
+        except Exception:
+            logger.exception("worker failed; its remaining items are lost")
+        finally:
+            put(_DONE)
+
+    if not factories:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for factory in factories:
+            pool.submit(worker, factory)
+        remaining = len(factories)
+        try:
+            while remaining:
+                item = q.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            stop.set()
+
+
+def process_chunks(
+    fn: Callable[[List[T]], R],
+    items: Iterable[T],
+    *,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    ordered: bool = True,
+    max_pending: Optional[int] = None,
+    start_method: str = "spawn",
+) -> Iterator[R]:
+    """
+    Apply `fn` to chunks of `items` on a process pool and yield `fn(chunk)` per chunk.
+
+    At most `max_pending` chunks are submitted and not yet consumed; past that, reading
+    `items` pauses until the oldest (`ordered`) or any (unordered) chunk is done, so the
+    producer is held back instead of piling records up in memory. `fn` and the items
+    must be picklable. Workers are started with `start_method` ('spawn' by default:
+    forking a process that runs fetch threads can copy held locks into the children).
+
+    Args:
+        fn: Chunk transform, a top-level function or picklable callable.
+        items: Input stream, read lazily on the calling thread.
+        workers: Pool size (default: CPU count).
+        chunk_size: Items per task; large enough to amortise the pickling round-trip.
+        ordered: Yield results in input order; otherwise as they complete.
+        max_pending: Chunks in flight (default: 2 per worker).
+        start_method: multiprocessing start method of the workers.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    max_pending = max_pending or 2 * workers
+    it = iter(items)
+    pending: deque = deque()
+
+    def ready(block: bool) -> Iterator[R]:
+        if ordered:
+            while pending and (block or pending[0].done()):
+                yield pending.popleft().result()
+                block = False
+        elif pending:
+            done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for fut in [f for f in pending if f in done]:
+                pending.remove(fut)
+                yield fut.result()
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method)) as pool:
+        try:
+            for chunk in iter(lambda: list(islice(it, chunk_size)), []):
+                pending.append(pool.submit(fn, chunk))
+                yield from ready(block=len(pending) >= max_pending)
+            while pending:
+                yield from ready(block=True)
+        finally:
+            for fut in pending:
+                fut.cancel()
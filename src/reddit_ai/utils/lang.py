@@ -0,0 +1,175 @@
+import json
+import re
+import string
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence
+
+ASCII_LETTERS = string.ascii_letters.encode()
+
+# any non-letter (digits, punctuation, whitespace, non-ASCII) becomes a word break
+_FOLD = bytes(b if chr(b) in string.ascii_letters else 0x20 for b in range(256)).lower()
+
+# frequent English character trigrams, word boundaries as spaces
+DEFAULT_PROFILE = frozenset("""
+ th|the|he | an|and|nd | in|ing|ng | to|to |ed |er | of|of |ion|at |is | a |on |re |es |hat|tha|ent|
+in |it |en |for|or |ou | be|as | re|you|ter|st | wa|was|his| is| ha|ere|her|e t|ati| co|tio|t t| fo|
+d t|s a|thi| it|ll |all|e a| on|s t| wh|ver| i |nt | yo|ly | ma|e s| so|ve | we|n t| he|ith|wit|are|
+ no|not|e i|ar |but| bu|out|ave|hav|ut | de|ons|com|con|e w|ome|ill|ust|one|ike|lik| li| me|ive|ee |
+ pe|use| us|ght| ju|jus| ca|can|an |le |ake|ld | if|if |eve|ear| ge|get|uld|oul|hin|ink|ese| ne|ess|
+ted| mo|ore|wha|our|me |ect| pr|pro|per| do|ow |now|ich|whi|bou|abo| ab| ar|e o|e b|d a|e c| sh|ey |
+hey|rea|ea |ts |ble|ch |rom| fr|fro|ry |so | wo|ork|wor|ime|tim| ti|ple|eop|peo|s i|s o|e m|mor| al|
+ant|nce
+""".replace("\n", "").split("|"))
+
+# trigrams typical of French/Spanish/Italian/German/Portuguese, counted against the English share
+FOREIGN_PROFILE = frozenset("""
+ ch| da| di| ei| el| es| il| la| le| mi| pa| po| qu| se| un| vo| zu|ada|ado|ais|ait|ato|auf|che|cht|
+cos|da |das|de |der|des|die|ein|eit|el |ell|est|eux|ie |il |ist|la |lla|los|mas|mit|mos|ndo|non|nte|
+os |ous|par|por|que|sch|sta|ue |und|ung|vou|zio|zu 
+""".replace("\n", "").split("|"))
+
+
+def ascii_letter_ratio(text: str) -> float:
+    """Share of ASCII letters in `text`, counted in C via encode/translate instead of per character."""
+    raw = text.encode("ascii", "ignore")
+    return (len(raw) - len(raw.translate(None, ASCII_LETTERS))) / max(1, len(text))
+
+
+# trigrams centred on a word break; all others lie inside one space-padded word
+_CROSS = re.compile(r"(?=([a-z] [a-z]))")
+
+
+def _fold(text: str) -> str:
+    return text.encode("ascii", "replace").translate(_FOLD).decode("ascii")
+
+
+def trigrams(text: str) -> List[str]:
+    """Lowercased letter trigrams of `text`, runs of non-letters folded to one space."""
+    folded = " " + " ".join(_fold(text).split()) + " "
+    return [folded[i:i + 3] for i in range(len(folded) - 2)]
+
+
+class _WordWeights(dict):
+    """Per-word sum of trigram weights, computed once per distinct word."""
+
+    def __init__(self, weights: dict, maxsize: int = 200_000):
+        super().__init__()
+        self.weights = weights
+        self.maxsize = maxsize
+
+    def __missing__(self, word: str) -> int:
+        if len(self) >= self.maxsize:
+            self.clear()
+        padded = f" {word} "
+        value = self[word] = sum(filter(None, map(self.weights.get, (padded[i:i + 3] for i in range(len(word))))))
+        return value
+
+
+def _weights(profile: frozenset, foreign: frozenset) -> dict:
+    weights = dict.fromkeys(foreign, -1)
+    weights.update(dict.fromkeys(profile, 1))
+    return weights
+
+
+def train_profile(texts: Iterable[str], top: int = 300) -> frozenset:
+    """Build an n-gram profile from known-English texts, e.g. a comment capture."""
+    counts: Counter = Counter()
+    for text in texts:
+        counts.update(trigrams(text))
+    return frozenset(g for g, _ in counts.most_common(top))
+
+
+class LanguageFilter:
+    """
+    Batched English filter for titles, selftexts and comment bodies.
+
+    Modes:
+        heuristic: Same rule and same results as `is_englishish` (minimal length and
+            enough ASCII letters), computed with byte-level operations.
+        ngram: The heuristic, then a character-trigram score must reach `min_ngram_score`:
+            share of trigrams in the English profile minus share in a profile of
+            other Latin-script languages. Rejects French/Spanish/German text that
+            the heuristic lets through.
+
+    Args:
+        mode: 'heuristic' | 'ngram'.
+        min_len: Minimal stripped length.
+        min_ascii_ratio: Minimal share of ASCII letters.
+        min_ngram_score: Minimal trigram score in 'ngram' mode.
+        profile: English trigram set (default: `DEFAULT_PROFILE`; see `train_profile`).
+        foreign: Trigram set counted against English (default: `FOREIGN_PROFILE`).
+        max_chars: Only the first `max_chars` characters are scored in 'ngram' mode.
+    """
+
+    MODES = ("heuristic", "ngram")
+
+    def __init__(
+        self,
+        mode: str = "heuristic",
+        *,
+        min_len: int = 10,
+        min_ascii_ratio: float = 0.6,
+        min_ngram_score: float = 0.18,
+        profile: Optional[frozenset] = None,
+        foreign: Optional[frozenset] = None,
+        max_chars: int = 2000,
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}, got {mode!r}")
+        self.mode = mode
+        self.min_len = min_len
+        self.min_ascii_ratio = min_ascii_ratio
+        self.min_ngram_score = min_ngram_score
+        self.profile = profile if profile is not None else DEFAULT_PROFILE
+        self.foreign = (foreign if foreign is not None else FOREIGN_PROFILE) - self.profile
+        self.max_chars = max_chars
+        self._weights = _weights(self.profile, self.foreign)
+        self._words = _WordWeights(self._weights)
+
+    @classmethod
+    def load_profile(cls, path: str, **kwargs) -> "LanguageFilter":
+        """N-gram filter using a profile saved by `save_profile`."""
+        with open(path) as fh:
+            return cls("ngram", profile=frozenset(json.load(fh)), **kwargs)
+
+    def save_profile(self, path: str) -> None:
+        with open(path, "w") as fh:
+            json.dump(sorted(self.profile), fh)
+
+    def score(self, text: str) -> float:
+        """English minus foreign share of the text's trigrams, in [-1, 1]."""
+        folded = _fold(text[:self.max_chars])
+        words = folded.split()
+        if not words:
+            return 0.0
+        # same total as summing over `trigrams(text)`, with the per-word part cached
+        n = sum(map(len, words)) + len(words) - 1
+        total = sum(map(self._words.__getitem__, words))
+        total += sum(filter(None, map(self._weights.get, _CROSS.findall(" ".join(words)))))
+        return total / n
+
+    def keep(self, text: str) -> bool:
+        if not text:
+            return False
+        t = text.strip()
+        if len(t) < self.min_len or ascii_letter_ratio(t) < self.min_ascii_ratio:
+            return False
+        return self.mode == "heuristic" or self.score(t) >= self.min_ngram_score
+
+    def mask(self, texts: Sequence[str]) -> List[bool]:
+        """Keep/drop flag per text, in input order."""
+        min_len, min_ratio, letters = self.min_len, self.min_ascii_ratio, ASCII_LETTERS
+        out = []
+        for text in texts:
+            if not text:
+                out.append(False)
+                continue
+            t = text.strip()
+            if len(t) < min_len:
+                out.append(False)
+                continue
+            raw = t.encode("ascii", "ignore")
+            out.append((len(raw) - len(raw.translate(None, letters))) / max(1, len(t)) >= min_ratio)
+        if self.mode == "ngram":
+            out = [ok and self.score(text.strip()) >= self.min_ngram_score for ok, text in zip(out, texts)]
+        return out
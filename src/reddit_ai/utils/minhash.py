@@ -0,0 +1,69 @@
+import hashlib
+import re
+import zlib
+from array import array
+from typing import List, Sequence, Set
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+NUM_PERM = 64
+_MASK = (1 << 64) - 1
+_EMPTY = 1 << 64
+# golden-ratio multiplier spreading crc32 values over 64 bits
+_MIX = 0x9E3779B97F4A7C15
+
+
+def shingles(text: str, k: int = 3, max_chars: int = 4000) -> Set[str]:
+    """Word k-grams of the lowercased text (the words themselves if fewer than k)."""
+    words = _WORD.findall(text[:max_chars].lower())
+    if len(words) < k:
+        return set(words)
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def signature(items: Set[str], num_perm: int = NUM_PERM) -> List[int]:
+    """
+    MinHash signature of a shingle set, by one-permutation hashing.
+
+    Each shingle is hashed once and falls into one of `num_perm` bins, which keep
+    their minimum; empty bins borrow the next non-empty bin's value (rotation
+    densification). Same collision probability as `num_perm` independent hash
+    functions, at the cost of one hash per shingle.
+    """
+    bins = [_EMPTY] * num_perm
+    for item in items:
+        h = (zlib.crc32(item.encode("utf-8")) * _MIX) & _MASK
+        b, v = h % num_perm, h // num_perm
+        if v < bins[b]:
+            bins[b] = v
+    filled = [i for i, v in enumerate(bins) if v != _EMPTY]
+    for i in range(num_perm if filled else 0):
+        if bins[i] == _EMPTY:
+            j = next((f for f in filled if f > i), filled[0])
+            bins[i] = bins[j] + ((j - i) % num_perm) * _MIX
+    # 32 bits per value: equal values of two signatures are still a ~1e-10 coincidence
+    return [v & 0xFFFFFFFF for v in bins]
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / max(1, len(a))
+
+
+def band_keys(sig: Sequence[int], bands: int) -> List[int]:
+    """One LSH bucket key per band of `len(sig) // bands` rows, as Mongo-safe 63-bit ints."""
+    rows = len(sig) // bands
+    keys = []
+    for b in range(bands):
+        raw = array("I", [b, *sig[b * rows:(b + 1) * rows]]).tobytes()
+        keys.append(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little") >> 1)
+    return keys
+
+
+def pack(sig: Sequence[int]) -> bytes:
+    """Signature as 4 bytes per value, for storage."""
+    return array("I", sig).tobytes()
+
+
+def unpack(raw: bytes) -> List[int]:
+    return array("I", bytes(raw)).tolist()
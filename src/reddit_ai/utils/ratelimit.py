@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from typing import Iterable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Reddit listings are served 100 items per request.
+PAGE_SIZE = 100
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every collector in a run.
+
+    With a `reddit` client, the refill rate follows the rate-limit state PRAW keeps
+    from the `X-Ratelimit-Remaining`/`Reset` headers (`reddit.auth.limits`): the
+    remaining calls are spread over the time left in the window, so the run goes
+    as fast as the API allows and slows down before it is throttled.
+
+    Args:
+        rate: Tokens (API calls) refilled per second until the first sync.
+        burst: Maximum number of tokens the bucket can hold.
+        reddit: PRAW client to sync from; None keeps a fixed `rate`.
+        sync_interval: Min seconds between two syncs from `reddit`.
+        headroom: Fraction of the remaining budget the bucket may use.
+        window: Seconds assumed until reset when PRAW does not expose it.
+    """
+
+    def __init__(
+        self,
+        rate: float = 100 / 60,
+        burst: int = 10,
+        reddit=None,
+        sync_interval: float = 5.0,
+        headroom: float = 0.9,
+        window: float = 600.0,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.reddit = reddit
+        self.sync_interval = sync_interval
+        self.headroom = headroom
+        self.window = window
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._synced = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waits": 0, "wait_s": 0.0, "syncs": 0}
+
+    @classmethod
+    def from_reddit(cls, reddit, **kwargs) -> "RateLimiter":
+        return cls(reddit=reddit, **kwargs)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def update(self, remaining: float, reset_in: float) -> None:
+        """Re-target the bucket: `remaining` calls allowed in the next `reset_in` seconds."""
+        reset_in = max(float(reset_in), 1.0)
+        with self._lock:
+            self._refill()
+            if remaining <= 0:
+                # budget spent: the next token arrives when the window resets
+                self._tokens = 0.0
+                self.rate = 1.0 / reset_in
+            else:
+                self.rate = max(remaining * self.headroom, 1.0) / reset_in
+                self._tokens = min(self._tokens, float(remaining))
+            self.stats["syncs"] += 1
+
+    def _sync(self) -> None:
+        if self.reddit is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # one thread per interval reads PRAW's state; `update` takes the lock again
+            if now - self._synced < self.sync_interval:
+                return
+            self._synced = now
+        try:
+            limits = self.reddit.auth.limits
+        except Exception:
+            logger.debug("rate-limit state unavailable", exc_info=True)
+            return
+        remaining = limits.get("remaining")
+        if remaining is None:
+            return   # no request made yet
+        reset_ts = limits.get("reset_timestamp")
+        reset_in = reset_ts - time.time() if reset_ts else self.window
+        self.update(remaining, reset_in)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until `tokens` are available; return the seconds spent waiting.
+
+        Raises:
+            ValueError: if `tokens` exceeds the bucket capacity (`burst`), which
+                could never be filled.
+        """
+        if tokens > self.capacity:
+            raise ValueError(f"cannot acquire {tokens} tokens from a bucket of {self.capacity:g}")
+        self._sync()
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.stats["acquired"] += 1
+                    if waited:
+                        self.stats["waits"] += 1
+                        self.stats["wait_s"] += waited
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def report(self) -> dict:
+        """Log and return the wait metrics."""
+        stats = {**self.stats, "wait_s": round(self.stats["wait_s"], 2), "rate": round(self.rate, 3)}
+        logger.info("rate limiter: acquired=%d waits=%d wait_s=%.2f syncs=%d rate=%.3f/s",
+                    stats["acquired"], stats["waits"], stats["wait_s"], stats["syncs"], stats["rate"])
+        return stats
+
+
+def paced(items: Iterable[T], limiter: RateLimiter, page_size: int = PAGE_SIZE) -> Iterator[T]:
+    """Draw one token from `limiter` before each page of a lazy PRAW listing is pulled."""
+    it = iter(items)
+    n = 0
+    while True:
+        if n % page_size == 0:
+            limiter.acquire()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        n += 1
+        yield item